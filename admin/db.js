@@ -166,12 +166,31 @@ async function doDbImport(file) {
       showToast('Ошибка импорта', 'error');
       return;
     }
-    const n = data.added_count || 0;
-    const names = data.added_names || [];
-    const errs = data.errors || [];
+    // Import runs as a background job: poll its status until it finishes
+    let job = { status: data.status || 'pending' };
+    while (job.status === 'pending' || job.status === 'running') {
+      await new Promise(r => setTimeout(r, 1500));
+      job = await api(`/api/jobs/${encodeURIComponent(data.job_id)}`);
+      const p = job.progress || {};
+      resultEl.textContent = job.status === 'running'
+        ? `Импорт выполняется... ${p.done ? `прочитано записей: ${p.done}` : ''}`
+        : 'Импорт в очереди...';
+    }
+    if (job.status !== 'done') {
+      resultEl.textContent = job.status === 'cancelled' ? 'Импорт отменён.' : (job.error || 'Ошибка импорта');
+      resultEl.classList.add('db-import-result--error');
+      showToast('Ошибка импорта', 'error');
+      return;
+    }
+    const result = job.result || {};
+    const n = result.added_count || 0;
+    const names = result.added_names || [];
+    const errs = result.errors || [];
     let msg = `Импорт выполнен. Добавлено: ${n}.`;
+    if (result.updated_count) msg += ` Обновлено: ${result.updated_count}.`;
     if (names.length) msg += ' ' + names.join(', ');
     if (errs.length) msg += ` Ошибки: ${errs.length}.`;
+    if (result.enrichment_job_id) msg += ' Данные из Jira подтягиваются в фоне.';
     resultEl.textContent = msg;
     resultEl.classList.remove('db-import-result--error');
     resultEl.classList.add('db-import-result--ok');
@@ -0,0 +1,64 @@
+"""
+Answer cache control (bot.answer_cache): purge generation and per-chat bypass.
+The cache itself lives in the bot process; the admin API changes this row and the bot polls it.
+"""
+import logging
+from typing import Any, Dict, Set
+
+from api.db import AnswerCacheControlModel, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_ROW_ID = 1
+
+
+def _parse_chat_ids(value: str) -> Set[int]:
+    out: Set[int] = set()
+    for part in (value or "").split(","):
+        part = part.strip()
+        if part.lstrip("-").isdigit():
+            out.add(int(part))
+    return out
+
+
+def _row(session) -> AnswerCacheControlModel:
+    row = session.get(AnswerCacheControlModel, _ROW_ID)
+    if row is None:
+        row = AnswerCacheControlModel(id=_ROW_ID, generation=0, bypass_chat_ids="")
+        session.add(row)
+        session.flush()
+    return row
+
+
+def get_answer_cache_control() -> Dict[str, Any]:
+    """{"generation": int, "bypass_chat_ids": sorted list of chat ids}."""
+    with SessionLocal() as session:
+        row = session.get(AnswerCacheControlModel, _ROW_ID)
+        if row is None:
+            return {"generation": 0, "bypass_chat_ids": []}
+        return {"generation": row.generation, "bypass_chat_ids": sorted(_parse_chat_ids(row.bypass_chat_ids))}
+
+
+def purge_answer_cache() -> int:
+    """Bump purge generation: the bot drops all cached answers on its next poll. Returns new generation."""
+    with SessionLocal() as session:
+        row = _row(session)
+        row.generation = (row.generation or 0) + 1
+        session.commit()
+        generation = row.generation
+    logger.info("Answer cache purge requested generation=%d", generation)
+    return generation
+
+
+def set_answer_cache_bypass(chat_id: int, bypass: bool) -> Dict[str, Any]:
+    """Enable/disable answer cache bypass for a chat (answers for it are neither served nor stored)."""
+    with SessionLocal() as session:
+        row = _row(session)
+        ids = _parse_chat_ids(row.bypass_chat_ids)
+        if bypass:
+            ids.add(chat_id)
+        else:
+            ids.discard(chat_id)
+        row.bypass_chat_ids = ",".join(str(i) for i in sorted(ids))
+        session.commit()
+    return get_answer_cache_control()
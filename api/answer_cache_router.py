@@ -0,0 +1,43 @@
+"""REST API for the bot answer cache (bot/answer_cache.py): state, purge, per-chat bypass."""
+import logging
+
+from fastapi import APIRouter
+
+from api.answer_cache_repository import (
+    get_answer_cache_control,
+    purge_answer_cache,
+    set_answer_cache_bypass,
+)
+from bot.answer_cache import ANSWER_CACHE_MODE, ANSWER_CACHE_POLL_SECONDS, ANSWER_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/answer-cache", tags=["answer-cache"])
+
+
+@router.get("")
+async def get_answer_cache_state():
+    """Mode, TTL, purge generation and chats that bypass the cache."""
+    return {
+        "mode": ANSWER_CACHE_MODE,
+        "ttl_seconds": ANSWER_CACHE_TTL,
+        "poll_seconds": ANSWER_CACHE_POLL_SECONDS,
+        **get_answer_cache_control(),
+    }
+
+
+@router.delete("")
+async def purge():
+    """Drop all cached answers (applied by the bot within poll_seconds)."""
+    return {"generation": purge_answer_cache()}
+
+
+@router.put("/bypass/{chat_id}")
+async def enable_bypass(chat_id: int):
+    """Answers in this chat always go to the LLM and are not stored."""
+    return set_answer_cache_bypass(chat_id, True)
+
+
+@router.delete("/bypass/{chat_id}")
+async def disable_bypass(chat_id: int):
+    return set_answer_cache_bypass(chat_id, False)
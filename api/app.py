@@ -51,7 +51,7 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize DB; load plugins and sync settings; start bot subprocess if active Telegram settings exist."""
+    """Initialize DB; load plugins and sync settings; start job workers; start bot subprocess if active Telegram settings exist."""
     init_db()
     try:
         from tools import load_all_plugins
@@ -64,10 +64,15 @@ async def lifespan(app: FastAPI):
         logger.info("Plugin settings synced with database")
     except Exception as e:
         logger.exception("Plugin loading failed: %s", e)
+    from api.jobs import start_job_workers, stop_job_workers
+    start_job_workers()
     if get_telegram_settings_decrypted():
         start_bot()
     yield
     stop_bot()
+    await stop_job_workers()
+    from tools.process_pool import shutdown_tool_process_pool
+    shutdown_tool_process_pool()
 
 
 app = FastAPI(title="LO_TG_BOT Admin API", lifespan=lifespan)
@@ -79,9 +84,13 @@ if _admin_dir.exists():
 from api.tools_router import router as tools_router
 from api.plugins_router import router as plugins_router
 from api.hr_router import router as hr_router
+from api.answer_cache_router import router as answer_cache_router
+from api.jobs_router import router as jobs_router
 app.include_router(tools_router)
 app.include_router(plugins_router)
 app.include_router(hr_router)
+app.include_router(answer_cache_router)
+app.include_router(jobs_router)
 
 
 @app.get("/api/settings")
@@ -133,6 +133,92 @@ class EmployeeModel(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utc_now, onupdate=_utc_now)
 
 
+class ChatMessageModel(Base):
+    """Bot conversation history: persistent (write-behind) tier of bot.history_store."""
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_chat_id_id", "chat_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    role: Mapped[str] = mapped_column(String(32), nullable=False)
+    content: Mapped[str] = mapped_column(Text, nullable=False, default="")
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utc_now)
+
+
+class ChatSummaryModel(Base):
+    """Rolling summary of compacted older turns of a chat (bot.summarizer)."""
+    __tablename__ = "chat_summaries"
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    summary: Mapped[str] = mapped_column(Text, nullable=False, default="")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utc_now, onupdate=_utc_now)
+
+
+class JobModel(Base):
+    """Background jobs (api/jobs.py): queued by API/bot, run by a worker pool, progress and result stored here."""
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_created", "status", "created_at"),)
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(64), nullable=False)
+    title: Mapped[str] = mapped_column(String(256), nullable=False, default="")
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="pending")
+    params: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    progress_done: Mapped[int] = mapped_column(default=0)
+    progress_total: Mapped[int] = mapped_column(default=0)
+    progress_message: Mapped[str] = mapped_column(String(512), nullable=False, default="")
+    chat_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    telegram_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    worker: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utc_now)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utc_now, onupdate=_utc_now)
+
+
+class AnswerCacheControlModel(Base):
+    """Single row: answer cache purge generation and per-chat bypass list (admin API -> bot process)."""
+    __tablename__ = "answer_cache_control"
+
+    id: Mapped[int] = mapped_column(primary_key=True, default=1)
+    generation: Mapped[int] = mapped_column(default=0)
+    bypass_chat_ids: Mapped[str] = mapped_column(Text, nullable=False, default="")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utc_now, onupdate=_utc_now)
+
+
+class ToolCacheControlModel(Base):
+    """Tool result cache generations: scope "*" (all), "plugin:<id>" or "tool:<name>" (admin API / bot -> all processes)."""
+    __tablename__ = "tool_cache_control"
+
+    scope: Mapped[str] = mapped_column(String(255), primary_key=True)
+    generation: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utc_now, onupdate=_utc_now)
+
+
+class ToolCacheStatsModel(Base):
+    """Tool result cache counters reported by each process (bot / API), read by the admin API."""
+    __tablename__ = "tool_cache_stats"
+
+    process: Mapped[str] = mapped_column(String(255), primary_key=True)  # host:pid
+    label: Mapped[str] = mapped_column(String(255), nullable=False, default="")
+    stats: Mapped[str] = mapped_column(Text, nullable=False, default="{}")  # JSON of ToolResultCache.stats()
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utc_now, onupdate=_utc_now)
+
+
+class EmployeeDirectoryVersionModel(Base):
+    """Single row: version of hr_employees, bumped by every write (in-memory snapshots in bot/API processes)."""
+    __tablename__ = "hr_directory_version"
+
+    id: Mapped[int] = mapped_column(primary_key=True, default=1)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utc_now, onupdate=_utc_now)
+
+
 def _sqlite_migrate_llm_azure_columns() -> None:
     """Add azure_endpoint, api_version, and project_id to llm_settings if missing (SQLite)."""
     if not DATABASE_URL.startswith("sqlite"):
@@ -169,4 +255,6 @@ def init_db() -> None:
             Path(path).parent.mkdir(parents=True, exist_ok=True)
     Base.metadata.create_all(bind=_engine)
     _sqlite_migrate_llm_azure_columns()  # Also migrates project_id
+    from api.employees_search import ensure_search_index
+    ensure_search_index()
     logger.debug("Database tables created or already exist")
@@ -2,11 +2,13 @@
 import logging
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
-from sqlalchemy import or_
+from sqlalchemy import insert, or_, update
 
 from api.db import EmployeeModel, SessionLocal, _utc_now
+from api.employees_search import search_employee_ids
+from api.employees_snapshot import bump_directory_version, get_employee_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +59,10 @@ def _parse_date(v: Any) -> Optional[date]:
 
 def get_employee_by_id(employee_id: int) -> Optional[dict]:
     """Get one employee by primary key. Returns dict or None."""
+    snapshot = get_employee_snapshot()
+    if snapshot is not None:
+        rec = snapshot.by_id.get(employee_id)
+        return rec.to_dict() if rec else None
     with SessionLocal() as session:
         row = session.query(EmployeeModel).filter(EmployeeModel.id == employee_id).first()
         return _row_to_dict(row) if row else None
@@ -64,6 +70,10 @@ def get_employee_by_id(employee_id: int) -> Optional[dict]:
 
 def get_employee_by_personal_number(personal_number: str) -> Optional[dict]:
     """Get one employee by personal_number. Returns dict or None."""
+    snapshot = get_employee_snapshot()
+    if snapshot is not None:
+        rec = snapshot.by_personal_number.get(str(personal_number).strip())
+        return rec.to_dict() if rec else None
     with SessionLocal() as session:
         row = session.query(EmployeeModel).filter(
             EmployeeModel.personal_number == str(personal_number).strip()
@@ -73,6 +83,10 @@ def get_employee_by_personal_number(personal_number: str) -> Optional[dict]:
 
 def get_employee_by_email(email: str) -> Optional[dict]:
     """Get one employee by email. Returns dict or None."""
+    snapshot = get_employee_snapshot()
+    if snapshot is not None:
+        rec = snapshot.by_email.get(str(email).strip())
+        return rec.to_dict() if rec else None
     with SessionLocal() as session:
         row = session.query(EmployeeModel).filter(
             EmployeeModel.email == str(email).strip()
@@ -80,11 +94,39 @@ def get_employee_by_email(email: str) -> Optional[dict]:
         return _row_to_dict(row) if row else None
 
 
-def find_employees_by_name(query: str) -> List[dict]:
-    """Find employees by full_name containing query (case-insensitive)."""
+def get_employee_by_jira_worker_id(jira_worker_id: str) -> Optional[dict]:
+    """Get one employee by Jira user key (JIRAUSER...). Returns dict or None."""
+    snapshot = get_employee_snapshot()
+    if snapshot is not None:
+        rec = snapshot.by_jira_worker_id.get(str(jira_worker_id).strip())
+        return rec.to_dict() if rec else None
+    with SessionLocal() as session:
+        row = session.query(EmployeeModel).filter(
+            EmployeeModel.jira_worker_id == str(jira_worker_id).strip()
+        ).first()
+        return _row_to_dict(row) if row else None
+
+
+def _rows_by_ids(ids: List[int]) -> List[dict]:
+    """Employees by ids, in the order of ids (search ranking)."""
+    if not ids:
+        return []
+    snapshot = get_employee_snapshot()
+    if snapshot is not None:
+        return [snapshot.by_id[i].to_dict() for i in ids if i in snapshot.by_id]
+    with SessionLocal() as session:
+        rows = {r.id: r for r in session.query(EmployeeModel).filter(EmployeeModel.id.in_(ids)).all()}
+        return [_row_to_dict(rows[i]) for i in ids if i in rows]
+
+
+def find_employees_by_name(query: str, limit: int = 100) -> List[dict]:
+    """Find employees by full_name words (prefix match via the search index, best first; ILIKE fallback)."""
     q = str(query).strip()
     if not q:
         return []
+    ids = search_employee_ids(q, limit=limit, name_only=True)
+    if ids is not None:
+        return _rows_by_ids(ids)
     with SessionLocal() as session:
         rows = session.query(EmployeeModel).filter(
             EmployeeModel.full_name.ilike(f"%{q}%")
@@ -137,6 +179,15 @@ def list_employees(
     """
     List employees with optional filters. view: all | supervisors | delivery_managers.
     """
+    snapshot = get_employee_snapshot()
+    if snapshot is not None:
+        records = snapshot.filter(
+            mvz=mvz,
+            team=team,
+            supervisors_only=view == "supervisors" or supervisors_only,
+            delivery_managers_only=view == "delivery_managers" or delivery_managers_only,
+        )
+        return [r.to_dict() for r in records[offset:offset + limit]]
     with SessionLocal() as session:
         q = session.query(EmployeeModel)
         if view == "supervisors" or supervisors_only:
@@ -156,10 +207,13 @@ def search_employees(
     query: str,
     limit: int = 50,
 ) -> List[dict]:
-    """Search by name, position, mvz, email (any field)."""
+    """Search by name, email, position, mvz, team (ranked full-text search; ILIKE fallback)."""
     q = str(query).strip()
     if not q:
         return []
+    ids = search_employee_ids(q, limit=limit)
+    if ids is not None:
+        return _rows_by_ids(ids)
     pattern = f"%{q}%"
     with SessionLocal() as session:
         rows = (
@@ -216,6 +270,7 @@ def update_employee(
             elif key in ("team", "mvz", "supervisor", "position", "mattermost_username", "jira_worker_id"):
                 setattr(row, key, str(value).strip() if value is not None and str(value).strip() else None)
         row.updated_at = _utc_now()
+        bump_directory_version(session)
         session.commit()
         session.refresh(row)
         return (_row_to_dict(row), "")
@@ -245,6 +300,7 @@ def create_employee(
             mattermost_username=(mattermost_username and str(mattermost_username).strip()) or (email and str(email).strip()) or None,
         )
         session.add(row)
+        bump_directory_version(session)
         session.commit()
         session.refresh(row)
         return _row_to_dict(row)
@@ -252,6 +308,9 @@ def create_employee(
 
 def employee_exists_by_personal_number(personal_number: str) -> bool:
     """Check if an employee with this personal_number already exists."""
+    snapshot = get_employee_snapshot()
+    if snapshot is not None:
+        return str(personal_number).strip() in snapshot.by_personal_number
     with SessionLocal() as session:
         return (
             session.query(EmployeeModel)
@@ -269,5 +328,212 @@ def set_employee_jira_worker_id(employee_id: int, jira_worker_id: str) -> bool:
             return False
         row.jira_worker_id = str(jira_worker_id).strip() or None
         row.updated_at = _utc_now()
+        bump_directory_version(session)
         session.commit()
         return True
+
+
+def get_employees_without_jira_id(employee_ids: Iterable[int], chunk_size: int = 500) -> List[tuple]:
+    """(id, email) of the given employees whose jira_worker_id is empty; one query per chunk of ids."""
+    ids = list(employee_ids)
+    out: List[tuple] = []
+    with SessionLocal() as session:
+        for i in range(0, len(ids), chunk_size):
+            out.extend(
+                session.query(EmployeeModel.id, EmployeeModel.email)
+                .filter(EmployeeModel.id.in_(ids[i:i + chunk_size]))
+                .filter(or_(EmployeeModel.jira_worker_id.is_(None), EmployeeModel.jira_worker_id == ""))
+                .order_by(EmployeeModel.id)
+                .all()
+            )
+    return [tuple(r) for r in out]
+
+
+def set_employees_jira_worker_ids(pairs: Iterable[tuple]) -> int:
+    """Bulk set jira_worker_id: pairs of (employee_id, jira_worker_id), one UPDATE executemany. Returns rows given."""
+    now = _utc_now()
+    params = [
+        {"id": emp_id, "jira_worker_id": str(key).strip() or None, "updated_at": now}
+        for emp_id, key in pairs
+    ]
+    if not params:
+        return 0
+    with SessionLocal() as session:
+        session.execute(update(EmployeeModel), params)
+        bump_directory_version(session)
+        session.commit()
+    return len(params)
+
+
+def delete_employees(personal_numbers: Iterable[str]) -> int:
+    """Delete employees by personal_number. Returns rows deleted."""
+    numbers = [str(pn).strip() for pn in personal_numbers if pn is not None and str(pn).strip()]
+    if not numbers:
+        return 0
+    with SessionLocal() as session:
+        count = (
+            session.query(EmployeeModel)
+            .filter(EmployeeModel.personal_number.in_(numbers))
+            .delete(synchronize_session=False)
+        )
+        bump_directory_version(session)
+        session.commit()
+    return count
+
+
+# Bulk import: rows per existence prefetch / INSERT statement (bound parameters stay well below DB limits)
+BULK_IMPORT_CHUNK_SIZE = 500
+# Fields taken from an import record; update_existing only overwrites them with non-empty changed values
+_IMPORT_FIELDS = ("full_name", "email", "position", "mvz", "supervisor", "hire_date")
+_BULK_NAMES_SAMPLE = 10
+
+
+def _clean(value: Any) -> Optional[str]:
+    return (value is not None and str(value).strip()) or None
+
+
+def _import_values(rec: dict) -> dict:
+    """Validated column values of an import record; raises ValueError for an invalid row."""
+    personal_number = _clean(rec.get("personal_number"))
+    full_name = _clean(rec.get("full_name"))
+    email = _clean(rec.get("email"))
+    if not personal_number:
+        raise ValueError("missing personal number")
+    if not email:
+        raise ValueError("missing email, skip insert")
+    values = {
+        "personal_number": personal_number,
+        "full_name": full_name or "",
+        "email": email,
+        "position": _clean(rec.get("position")),
+        "mvz": _clean(rec.get("mvz")),
+        "supervisor": _clean(rec.get("supervisor")),
+        "hire_date": _parse_date(rec.get("hire_date")),
+        "mattermost_username": _clean(rec.get("mattermost_username")) or email,
+    }
+    # Checked here, not by the DB: one too long value must not fail the whole batched INSERT
+    for key, value in values.items():
+        max_len = getattr(EmployeeModel.__table__.c[key].type, "length", None)
+        if max_len and isinstance(value, str) and len(value) > max_len:
+            raise ValueError(f"{key} longer than {max_len} characters")
+    return values
+
+
+def _chunks(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    chunk: List[dict] = []
+    for rec in records:
+        chunk.append(rec)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert_statement(session, rows: List[dict]):
+    """INSERT of new rows; ON CONFLICT (personal_number) DO NOTHING where the dialect supports it."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(EmployeeModel).values(rows)
+    return dialect_insert(EmployeeModel).values(rows).on_conflict_do_nothing(index_elements=["personal_number"])
+
+
+def bulk_import_employees(
+    records: Iterable[dict],
+    update_existing: bool = False,
+    chunk_size: int = BULK_IMPORT_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """
+    Import employee records in ONE transaction: per chunk one existence prefetch (personal_number IN (...))
+    and one batched INSERT ... ON CONFLICT DO NOTHING. records may be a generator (streamed import);
+    an exception raised by it rolls back everything. Rows are validated (required fields, column lengths)
+    before the INSERT, so invalid rows are reported in errors and the rest of the batch is imported.
+    update_existing: existing employees get changed non-empty fields (full_name, email, position, mvz,
+    supervisor, hire_date); otherwise they are skipped.
+    Returns {"inserted", "inserted_ids", "inserted_names" (first 10), "updated", "updated_ids", "skipped", "errors"}.
+    """
+    inserted_ids: List[int] = []
+    inserted_names: List[str] = []
+    updated_ids: List[int] = []
+    skipped = 0
+    errors: List[str] = []
+    with SessionLocal() as session:
+        try:
+            for chunk in _chunks(records, max(1, chunk_size)):
+                rows: Dict[str, dict] = {}
+                for rec in chunk:
+                    try:
+                        values = _import_values(rec)
+                    except ValueError as e:
+                        errors.append(
+                            f"Personal number {_clean(rec.get('personal_number')) or '?'} "
+                            f"({_clean(rec.get('full_name')) or ''}): {e!s}"
+                        )
+                        continue
+                    if values["personal_number"] in rows:
+                        errors.append(f"Personal number {values['personal_number']}: duplicate in import, skipped")
+                        continue
+                    rows[values["personal_number"]] = values
+                if not rows:
+                    continue
+                existing = {
+                    row.personal_number: row
+                    for row in session.query(EmployeeModel).filter(EmployeeModel.personal_number.in_(list(rows)))
+                }
+                for pn, row in existing.items():
+                    values = rows.pop(pn)
+                    changes = {
+                        k: values[k] for k in _IMPORT_FIELDS
+                        if values[k] not in (None, "") and values[k] != getattr(row, k)
+                    }
+                    if update_existing and changes:
+                        for k, v in changes.items():
+                            setattr(row, k, v)
+                        row.updated_at = _utc_now()
+                        updated_ids.append(row.id)
+                    else:
+                        skipped += 1
+                # Write this chunk's updates and drop its ORM objects: the session does not grow with the import
+                session.flush()
+                session.expunge_all()
+                if not rows:
+                    continue
+                now = _utc_now()
+                new_rows = [
+                    {**v, "fte": Decimal("1"), "is_supervisor": False, "is_delivery_manager": False,
+                     "created_at": now, "updated_at": now}
+                    for v in rows.values()
+                ]
+                created = session.execute(
+                    _insert_statement(session, new_rows).returning(
+                        EmployeeModel.id, EmployeeModel.personal_number, EmployeeModel.full_name,
+                    )
+                ).all()
+                skipped += len(new_rows) - len(created)
+                for emp_id, pn, full_name in created:
+                    inserted_ids.append(emp_id)
+                    if len(inserted_names) < _BULK_NAMES_SAMPLE:
+                        inserted_names.append(full_name or pn)
+            if inserted_ids or updated_ids:
+                bump_directory_version(session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+    logger.info(
+        "Bulk employee import: inserted=%d updated=%d skipped=%d errors=%d",
+        len(inserted_ids), len(updated_ids), skipped, len(errors),
+    )
+    return {
+        "inserted": len(inserted_ids),
+        "inserted_ids": inserted_ids,
+        "inserted_names": inserted_names,
+        "updated": len(updated_ids),
+        "updated_ids": updated_ids,
+        "skipped": skipped,
+        "errors": errors,
+    }
@@ -0,0 +1,194 @@
+"""
+Search index for hr_employees (replaces leading-wildcard ILIKE scans of search_employees / find_employees_by_name).
+
+SQLite: FTS5 table hr_employees_fts (rowid = employee id) over full_name, email, position, mvz, team,
+kept in sync by triggers on hr_employees, so ORM writes, bulk import and bulk UPDATEs all update it.
+ё is replaced by е in the triggers (the unicode61 tokenizer folds case but not ё); ranked by bm25 with
+full_name weighted highest.
+PostgreSQL: pg_trgm GIN index and a 'russian' tsvector GIN index on expressions over the same columns
+(maintained by Postgres itself); ranked by ts_rank + trigram similarity.
+
+Query words are lowercased, ё -> е, Cyrillic words lose one inflectional ending (light Russian stemming:
+"Ивановой" -> "иванов") and are matched as prefixes, all words required.
+If the index is not available (no FTS5 / no pg_trgm rights) the callers fall back to ILIKE.
+"""
+import logging
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from api.db import _engine
+
+logger = logging.getLogger(__name__)
+
+_FTS_TABLE = "hr_employees_fts"
+_COLUMNS = ("full_name", "email", "position", "mvz", "team")
+# bm25 weights per column (same order as _COLUMNS)
+_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 2.0)
+_MAX_TERMS = 8
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-я]")
+# Longest first; only one ending is removed and at least 3 letters stay
+_RU_ENDINGS = (
+    "ыми", "ими", "ого", "его", "ому", "ему", "ой", "ей", "ый", "ий", "ым", "им", "ом", "ем",
+    "ую", "юю", "ая", "яя", "ые", "ие", "ых", "их", "а", "я", "у", "ю", "ы", "и", "е", "ь", "й",
+)
+
+_available: Optional[bool] = None
+
+
+def normalize_search_text(value: str) -> str:
+    return (value or "").lower().replace("ё", "е")
+
+
+def stem_ru(word: str) -> str:
+    """Strip one Russian inflectional ending from a lowercased word (Latin words and short words unchanged)."""
+    if not _CYRILLIC_RE.search(word):
+        return word
+    for ending in _RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[: -len(ending)]
+    return word
+
+
+def query_terms(query: str) -> List[str]:
+    """Normalized, stemmed query words (prefix terms)."""
+    words = _WORD_RE.findall(normalize_search_text(query))
+    return [stem_ru(w) for w in words][:_MAX_TERMS]
+
+
+def _sql_norm(expr: str) -> str:
+    return f"replace(lower(coalesce({expr}, '')), 'ё', 'е')"
+
+
+def _ensure_sqlite(conn) -> None:
+    # SQLite lower() folds only ASCII: case is folded by the tokenizer, ё/Ё are replaced here
+    def norm(col: str) -> str:
+        return f"replace(replace(coalesce({col}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": _FTS_TABLE}
+    ).first()
+    cols = ", ".join(_COLUMNS)
+    new_values = ", ".join(norm(f"new.{c}") for c in _COLUMNS)
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} USING fts5({cols}, tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS hr_employees_fts_ai AFTER INSERT ON hr_employees BEGIN "
+        f"INSERT INTO {_FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS hr_employees_fts_ad AFTER DELETE ON hr_employees BEGIN "
+        f"DELETE FROM {_FTS_TABLE} WHERE rowid = old.id; END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS hr_employees_fts_au AFTER UPDATE OF {cols} ON hr_employees BEGIN "
+        f"DELETE FROM {_FTS_TABLE} WHERE rowid = old.id; "
+        f"INSERT INTO {_FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+    ))
+    if not exists:
+        # Index created for an existing directory: fill it once
+        values = ", ".join(norm(c) for c in _COLUMNS)
+        conn.execute(text(f"INSERT INTO {_FTS_TABLE}(rowid, {cols}) SELECT id, {values} FROM hr_employees"))
+        logger.info("Employee search index %s built", _FTS_TABLE)
+
+
+def _pg_document() -> str:
+    return " || ' ' || ".join(_sql_norm(c) for c in _COLUMNS)
+
+
+def _ensure_postgres(conn) -> None:
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    doc = _pg_document()
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS ix_hr_employees_search_trgm ON hr_employees USING gin (({doc}) gin_trgm_ops)"
+    ))
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS ix_hr_employees_name_trgm ON hr_employees "
+        f"USING gin (({_sql_norm('full_name')}) gin_trgm_ops)"
+    ))
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS ix_hr_employees_search_tsv ON hr_employees "
+        f"USING gin (to_tsvector('russian', {doc}))"
+    ))
+
+
+def ensure_search_index() -> bool:
+    """Create the index (and triggers / fill for SQLite) if missing. Called by init_db. Returns availability."""
+    global _available
+    dialect = _engine.dialect.name
+    try:
+        with _engine.begin() as conn:
+            if dialect == "sqlite":
+                _ensure_sqlite(conn)
+            elif dialect == "postgresql":
+                _ensure_postgres(conn)
+            else:
+                _available = False
+                return False
+        _available = True
+    except Exception as e:
+        logger.warning("Employee search index not available (%s), using ILIKE search: %s", dialect, e)
+        _available = False
+    return _available
+
+
+def rebuild_search_index() -> None:
+    """Refill the SQLite index from hr_employees (e.g. after writes made with triggers disabled)."""
+    if _engine.dialect.name != "sqlite":
+        return
+    with _engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {_FTS_TABLE}"))
+        _ensure_sqlite(conn)
+
+
+def _fts_match(terms: List[str], name_only: bool) -> str:
+    expr = " ".join('"' + t.replace('"', "") + '"*' for t in terms)
+    return f"full_name : ({expr})" if name_only else expr
+
+
+def search_employee_ids(query: str, limit: int = 50, name_only: bool = False) -> Optional[List[int]]:
+    """
+    Ids of matching employees, best first; name_only: match full_name only.
+    None if the index is not available (caller falls back to ILIKE).
+    """
+    if _available is None:
+        ensure_search_index()
+    if not _available:
+        return None
+    terms = [t for t in query_terms(query) if t]
+    if not terms:
+        return []
+    dialect = _engine.dialect.name
+    with _engine.connect() as conn:
+        if dialect == "sqlite":
+            weights = ", ".join(str(w) for w in _WEIGHTS)
+            rows = conn.execute(
+                text(
+                    f"SELECT rowid FROM {_FTS_TABLE} WHERE {_FTS_TABLE} MATCH :match "
+                    f"ORDER BY bm25({_FTS_TABLE}, {weights}) LIMIT :limit"
+                ),
+                {"match": _fts_match(terms, name_only), "limit": limit},
+            ).all()
+        else:
+            q = " ".join(terms)
+            params = {f"p{i}": f"%{t}%" for i, t in enumerate(terms)}
+            if name_only:
+                doc = _sql_norm("full_name")
+                likes = " AND ".join(f"{doc} LIKE :p{i}" for i in range(len(terms)))
+                sql = f"SELECT id FROM hr_employees WHERE {likes} ORDER BY similarity({doc}, :q) DESC, id LIMIT :limit"
+            else:
+                doc = _pg_document()
+                likes = " AND ".join(f"{doc} LIKE :p{i}" for i in range(len(terms)))
+                params["tsq"] = " & ".join(re.sub(r"\W", "", t) + ":*" for t in terms)
+                sql = (
+                    f"SELECT id FROM hr_employees "
+                    f"WHERE ({likes}) OR to_tsvector('russian', {doc}) @@ to_tsquery('russian', :tsq) "
+                    f"ORDER BY ts_rank(to_tsvector('russian', {doc}), to_tsquery('russian', :tsq)) "
+                    f"+ similarity({doc}, :q) DESC, id LIMIT :limit"
+                )
+            rows = conn.execute(text(sql), {**params, "q": q, "limit": limit}).all()
+    return [r[0] for r in rows]
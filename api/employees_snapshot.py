@@ -0,0 +1,175 @@
+"""
+In-memory read-through snapshot of hr_employees for hot HR reads (hr tool, worklog_checker, HR API).
+The directory changes rarely (imports, admin edits), so reads are served from compact __slots__ records
+and dictionaries keyed by id, personal_number, email, jira_worker_id, mvz and team.
+
+Invalidation: every write in api/employees_repository bumps hr_directory_version in the same transaction
+(bump_directory_version). The writing process drops its snapshot on commit; other processes (bot / API)
+read the version row at most every EMPLOYEE_SNAPSHOT_CHECK_SECONDS and reload when it changed.
+EMPLOYEE_SNAPSHOT_ENABLED=false: all reads go to the DB.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, update
+
+from api.db import EmployeeDirectoryVersionModel, EmployeeModel, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_SNAPSHOT_ENABLED = os.getenv("EMPLOYEE_SNAPSHOT_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+EMPLOYEE_SNAPSHOT_CHECK_SECONDS = float(os.getenv("EMPLOYEE_SNAPSHOT_CHECK_SECONDS", "2"))
+
+_VERSION_ROW_ID = 1
+
+# Same keys and order as api.employees_repository._row_to_dict
+_FIELDS = (
+    "id", "personal_number", "full_name", "email", "jira_worker_id", "position", "mvz", "supervisor",
+    "hire_date", "fte", "dismissal_date", "birth_date", "mattermost_username", "is_supervisor",
+    "is_delivery_manager", "team", "created_at", "updated_at",
+)
+
+
+class EmployeeRecord:
+    """Immutable-by-convention employee row; to_dict() gives a fresh dict in the repository format."""
+    __slots__ = _FIELDS
+
+    def __init__(self, values: dict) -> None:
+        for f in _FIELDS:
+            setattr(self, f, values.get(f))
+
+    def to_dict(self) -> dict:
+        return {f: getattr(self, f) for f in _FIELDS}
+
+
+def _group_key(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+class EmployeeSnapshot:
+    """All employees at one directory version, ordered by full_name, with lookup dictionaries."""
+
+    def __init__(self, version: int, rows: List[dict]) -> None:
+        self.version = version
+        self.records: List[EmployeeRecord] = [EmployeeRecord(r) for r in sorted(rows, key=lambda r: r["full_name"])]
+        self.by_id: Dict[int, EmployeeRecord] = {}
+        self.by_personal_number: Dict[str, EmployeeRecord] = {}
+        self.by_email: Dict[str, EmployeeRecord] = {}
+        self.by_jira_worker_id: Dict[str, EmployeeRecord] = {}
+        self.by_mvz: Dict[str, List[EmployeeRecord]] = {}
+        self.by_team: Dict[str, List[EmployeeRecord]] = {}
+        for rec in self.records:
+            self.by_id[rec.id] = rec
+            self.by_personal_number[rec.personal_number] = rec
+            self.by_email.setdefault(rec.email, rec)
+            if rec.jira_worker_id:
+                self.by_jira_worker_id.setdefault(rec.jira_worker_id, rec)
+            if rec.mvz:
+                self.by_mvz.setdefault(_group_key(rec.mvz), []).append(rec)
+            if rec.team:
+                self.by_team.setdefault(_group_key(rec.team), []).append(rec)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @staticmethod
+    def _matching_ids(groups: Dict[str, List[EmployeeRecord]], needle: str) -> set:
+        """Ids in groups whose key contains needle (case-insensitive, like the SQL ILIKE filter)."""
+        n = _group_key(needle)
+        return {rec.id for key, recs in groups.items() if n in key for rec in recs}
+
+    def filter(
+        self,
+        mvz: Optional[str] = None,
+        team: Optional[str] = None,
+        supervisors_only: bool = False,
+        delivery_managers_only: bool = False,
+    ) -> List[EmployeeRecord]:
+        ids = None
+        if mvz and mvz.strip():
+            ids = self._matching_ids(self.by_mvz, mvz)
+        if team and team.strip():
+            team_ids = self._matching_ids(self.by_team, team)
+            ids = team_ids if ids is None else ids & team_ids
+        out = []
+        for rec in self.records:
+            if ids is not None and rec.id not in ids:
+                continue
+            if supervisors_only and not rec.is_supervisor:
+                continue
+            if delivery_managers_only and not rec.is_delivery_manager:
+                continue
+            out.append(rec)
+        return out
+
+
+_snapshot: Optional[EmployeeSnapshot] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _read_version(session) -> int:
+    row = session.get(EmployeeDirectoryVersionModel, _VERSION_ROW_ID)
+    return row.version if row is not None else 0
+
+
+def get_directory_version() -> int:
+    """Directory version row (for caches kept without a snapshot, EMPLOYEE_SNAPSHOT_ENABLED=false)."""
+    with SessionLocal() as session:
+        return _read_version(session)
+
+
+def bump_directory_version(session) -> None:
+    """Increment the directory version inside the caller's write transaction; this process's snapshot is dropped on commit."""
+    bumped = session.execute(
+        update(EmployeeDirectoryVersionModel)
+        .where(EmployeeDirectoryVersionModel.id == _VERSION_ROW_ID)
+        .values(version=EmployeeDirectoryVersionModel.version + 1)
+    ).rowcount
+    if not bumped:
+        session.add(EmployeeDirectoryVersionModel(id=_VERSION_ROW_ID, version=1))
+    event.listen(session, "after_commit", lambda _s: invalidate_employee_snapshot(), once=True)
+
+
+def invalidate_employee_snapshot() -> None:
+    """Drop the snapshot of this process; the next read reloads it."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def _load() -> EmployeeSnapshot:
+    from api.employees_repository import _row_to_dict
+    started = time.monotonic()
+    with SessionLocal() as session:
+        version = _read_version(session)
+        rows = [_row_to_dict(r) for r in session.query(EmployeeModel).all()]
+    snapshot = EmployeeSnapshot(version, rows)
+    logger.info(
+        "Employee snapshot loaded: version=%s employees=%d in %.3fs", version, len(snapshot), time.monotonic() - started,
+    )
+    return snapshot
+
+
+def get_employee_snapshot() -> Optional[EmployeeSnapshot]:
+    """Current snapshot (reloaded if the directory version changed), or None if snapshots are disabled."""
+    global _snapshot, _checked_at
+    if not EMPLOYEE_SNAPSHOT_ENABLED:
+        return None
+    with _lock:
+        now = time.monotonic()
+        if _snapshot is not None and now - _checked_at < EMPLOYEE_SNAPSHOT_CHECK_SECONDS:
+            return _snapshot
+        if _snapshot is not None:
+            with SessionLocal() as session:
+                version = _read_version(session)
+            _checked_at = now
+            if version == _snapshot.version:
+                return _snapshot
+            logger.info("Employee directory changed (version %s -> %s)", _snapshot.version, version)
+        _snapshot = _load()
+        _checked_at = now
+        return _snapshot
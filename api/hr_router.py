@@ -1,21 +1,28 @@
 """REST API for admin «Работа с БД»: employees list, get, PATCH, import."""
 import logging
+import os
 import tempfile
 from pathlib import Path
 
 from fastapi import APIRouter, File, HTTPException, UploadFile
 
+from api.answer_cache_repository import purge_answer_cache
 from api.employees_repository import (
     get_employee_by_id,
     list_employees,
     update_employee,
 )
-from plugins.hr_service.import_excel import import_employees_from_file
+from api.jobs import enqueue_job, stage_job_file
+from tools.result_cache import invalidate_tool_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/hr", tags=["hr"])
 
+# Cached hr tool results (tools/result_cache.py) and bot answers built from them (bot/answer_cache.py)
+# are dropped after writes made through this API
+HR_PLUGIN_ID = "hr_service"
+
 
 @router.get("/employees")
 async def get_employees(view: str = "all"):
@@ -45,14 +52,18 @@ async def patch_employee(employee_id: int, body: dict):
     updated, err = update_employee(employee_id, body)
     if err:
         raise HTTPException(status_code=400, detail=err)
+    invalidate_tool_cache(plugin_id=HR_PLUGIN_ID)
+    purge_answer_cache()
     return updated
 
 
 @router.post("/import")
-async def hr_import(file: UploadFile = File(...)):
+async def hr_import(file: UploadFile = File(...), update_existing: bool = False):
     """
-    Import employees from Excel (.xlsx/.xls). Sheets ДДЖ and Инфоком.
-    Returns { added_count, added_names, errors, enrichment_errors }.
+    Queue import of employees from Excel (.xlsx/.xls). Sheets ДДЖ and Инфоком.
+    update_existing: also update changed fields of employees already in the DB.
+    Returns { job_id, status }: poll GET /api/jobs/{job_id}; its result is
+    { added_count, added_names, updated_count, errors, enrichment_job_id, summary }.
     """
     name = (file.filename or "").lower()
     if not name.endswith(".xlsx") and not name.endswith(".xls"):
@@ -68,10 +79,9 @@ async def hr_import(file: UploadFile = File(...)):
         content = await file.read()
         with open(tmp_path, "wb") as f:
             f.write(content)
-        result = import_employees_from_file(tmp_path)
-        if isinstance(result, str) and result.startswith("Error:"):
-            raise HTTPException(status_code=400, detail=result)
-        return result
+        job_file = stage_job_file(tmp_path)
+        job = enqueue_job("hr_import", {"file_path": job_file, "update_existing": update_existing})
+        return {"job_id": job["id"], "status": job["status"]}
     finally:
         if tmp_path and os.path.exists(tmp_path):
             try:
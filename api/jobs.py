@@ -0,0 +1,376 @@
+"""
+Background jobs: persistent queue (jobs table, api/jobs_repository.py) + asyncio worker pool.
+Long work (HR import, Jira enrichment, worklog reports) is queued with enqueue_job() from the API, the bot
+or a tool, and runs in the worker pool of the API process (or of a standalone bot, see bot.telegram_bot),
+so it neither blocks request handlers nor hits tool timeouts.
+
+A handler is registered per kind:  register_job_handler("hr_import", "Импорт сотрудников", handler)
+    async def handler(ctx: JobContext) -> dict   # result stored in the job; "summary" is sent to the chat
+It reports progress with ctx.report(...) (cheap, also from threads) and checks ctx.check_cancelled().
+An admin cancel cancels the handler's task; a handler whose work runs in a thread (which a task cancel does not
+stop) is registered with cooperative_cancel=True and only gets ctx.cancelled set, so it stops itself.
+Progress, heartbeat and cancellation requests are synced with the DB by the pool every poll interval;
+the requesting chat (job.chat_id) gets one Telegram message that is edited with progress and the result.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from api import jobs_repository as repo
+
+logger = logging.getLogger(__name__)
+
+# Concurrent jobs per process; 0 disables the worker pool
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# Running job without heartbeat for this long is considered dead (its process stopped)
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "300"))
+# Minimal interval between Telegram progress edits of one job
+JOB_NOTIFY_INTERVAL = float(os.getenv("JOB_NOTIFY_INTERVAL", "10"))
+# Uploaded files waiting for their job (deleted by the job)
+JOBS_DIR = os.getenv("JOBS_DIR", "./data/jobs")
+
+# Modules registering job handlers (imported when a pool starts)
+_HANDLER_MODULES = ("plugins.hr_service.jobs",)
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler (ctx.check_cancelled) when an admin cancelled the job."""
+
+
+class JobError(Exception):
+    """Handler failure with a message meant for the user (stored as job error, sent to the chat)."""
+
+
+class JobContext:
+    """Job state passed to the handler."""
+
+    def __init__(self, job: dict) -> None:
+        self.job_id: str = job["id"]
+        self.kind: str = job["kind"]
+        self.title: str = job.get("title") or job["kind"]
+        self.params: Dict[str, Any] = job.get("params") or {}
+        self.chat_id: Optional[int] = job.get("chat_id")
+        self.telegram_id: Optional[int] = job.get("telegram_id")
+        self.cancelled = False
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self._dirty = False
+
+    def report(self, done: Optional[int] = None, total: Optional[int] = None, message: Optional[str] = None) -> None:
+        """Update progress in memory; the pool writes it to the DB / chat. Safe to call from worker threads."""
+        if done is not None:
+            self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        self._dirty = True
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise JobCancelled()
+
+    def progress_text(self) -> str:
+        text = f"⏳ {self.title}"
+        if self.total:
+            text += f": {self.done}/{self.total} ({self.done * 100 // self.total}%)"
+        elif self.done:
+            text += f": {self.done}"
+        if self.message:
+            text += f" — {self.message}"
+        return text
+
+
+JobHandler = Callable[[JobContext], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class _Registered:
+    title: str
+    handler: JobHandler
+    cooperative_cancel: bool = False
+
+
+_handlers: Dict[str, _Registered] = {}
+
+
+def register_job_handler(kind: str, title: str, handler: JobHandler, cooperative_cancel: bool = False) -> None:
+    """
+    Register handler for a job kind (title: default human-readable name for lists and chat messages).
+    cooperative_cancel: an admin cancel only sets ctx.cancelled, the task is not cancelled (thread-backed handlers).
+    """
+    _handlers[kind] = _Registered(title=title, handler=handler, cooperative_cancel=cooperative_cancel)
+
+
+def _load_handler_modules() -> None:
+    import importlib
+    for name in _HANDLER_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning("Job handlers %s not loaded: %s", name, e)
+
+
+def stage_job_file(src_path: str) -> str:
+    """Copy a (temporary) file into JOBS_DIR, so it outlives the request; the job deletes it when done."""
+    Path(JOBS_DIR).mkdir(parents=True, exist_ok=True)
+    dst = Path(JOBS_DIR) / f"{uuid.uuid4().hex}{Path(src_path).suffix}"
+    shutil.copyfile(src_path, dst)
+    return str(dst.resolve())
+
+
+def enqueue_job(
+    kind: str,
+    params: Optional[Dict[str, Any]] = None,
+    title: str = "",
+    chat_id: Optional[int] = None,
+    telegram_id: Optional[int] = None,
+) -> dict:
+    """Queue a job; a worker pool of this process (if running) is woken up at once."""
+    if not title:
+        registered = _handlers.get(kind)
+        title = registered.title if registered else kind
+    job = repo.create_job(kind, params=params, title=title, chat_id=chat_id, telegram_id=telegram_id)
+    logger.info("Job queued id=%s kind=%s chat_id=%s", job["id"], kind, chat_id)
+    if _pool is not None:
+        _pool.wake()
+    return job
+
+
+class TelegramJobNotifier:
+    """Progress messages via Telegram Bot API (sendMessage / editMessageText) with a pooled httpx client."""
+
+    def __init__(self, get_credentials: Callable[[], Optional[Tuple[str, str]]]) -> None:
+        self._get_credentials = get_credentials
+        self._client = None
+
+    async def _call(self, method: str, payload: dict) -> Optional[dict]:
+        creds = self._get_credentials()
+        if not creds:
+            return None
+        token, base_url = creds
+        import httpx
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=15.0)
+        try:
+            r = await self._client.post(f"{base_url.rstrip('/')}/bot{token}/{method}", json=payload)
+            data = r.json()
+            return data.get("result") if data.get("ok") else None
+        except Exception as e:
+            logger.debug("Job notification %s failed: %s", method, e)
+            return None
+
+    async def send(self, chat_id: int, text: str) -> Optional[int]:
+        result = await self._call("sendMessage", {"chat_id": chat_id, "text": text[:4000]})
+        return result.get("message_id") if isinstance(result, dict) else None
+
+    async def edit(self, chat_id: int, message_id: int, text: str) -> None:
+        await self._call("editMessageText", {"chat_id": chat_id, "message_id": message_id, "text": text[:4000]})
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _telegram_credentials_from_settings() -> Optional[Tuple[str, str]]:
+    try:
+        from api.settings_repository import get_telegram_settings_decrypted
+        creds = get_telegram_settings_decrypted()
+    except Exception:
+        return None
+    if not creds or not creds.get("access_token"):
+        return None
+    return creds["access_token"], creds.get("base_url") or "https://api.telegram.org"
+
+
+@dataclass
+class _Running:
+    ctx: JobContext
+    task: "asyncio.Task"
+    message_id: Optional[int] = None
+    notified_at: float = 0.0
+
+
+class JobWorkerPool:
+    """N asyncio workers claiming pending jobs of registered kinds + a monitor syncing progress/cancel."""
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        poll_seconds: float = JOB_POLL_SECONDS,
+        notifier: Optional[TelegramJobNotifier] = None,
+    ) -> None:
+        self._workers = max(1, workers)
+        self._poll_seconds = poll_seconds
+        self._notifier = notifier
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, _Running] = {}
+
+    def wake(self) -> None:
+        """Wake idle workers (also from other threads, e.g. a job enqueued in asyncio.to_thread)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        _load_handler_modules()
+        self._tasks = [asyncio.create_task(self._worker_loop()) for _ in range(self._workers)]
+        self._tasks.append(asyncio.create_task(self._monitor_loop()))
+        logger.info("Job workers started: %d, kinds=%s", self._workers, sorted(_handlers))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for running in list(self._running.values()):
+            running.task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._notifier is not None:
+            await self._notifier.close()
+
+    async def _worker_loop(self) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(repo.claim_next_job, list(_handlers), self._worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Job claim failed: %s", e)
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self._poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _notify(self, running: _Running, text: str) -> None:
+        ctx = running.ctx
+        if self._notifier is None or ctx.chat_id is None:
+            return
+        running.notified_at = time.monotonic()
+        if running.message_id is None:
+            running.message_id = await self._notifier.send(ctx.chat_id, text)
+        else:
+            await self._notifier.edit(ctx.chat_id, running.message_id, text)
+
+    async def _run(self, job: dict) -> None:
+        ctx = JobContext(job)
+        registered = _handlers.get(ctx.kind)
+        if registered is None:
+            await asyncio.to_thread(repo.finish_job, ctx.job_id, repo.JOB_FAILED, None, f"Unknown job kind {ctx.kind}")
+            return
+        task = asyncio.create_task(registered.handler(ctx))
+        running = _Running(ctx=ctx, task=task)
+        self._running[ctx.job_id] = running
+        logger.info("Job started id=%s kind=%s", ctx.job_id, ctx.kind)
+        await self._notify(running, f"⏳ {ctx.title}: выполняется")
+        status, result, error = repo.JOB_DONE, None, None
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if not ctx.cancelled:
+                # Pool stopping (shutdown): record it, the job is not resumed. Shielded: the write finishes
+                # in its thread even if stop() cancels this task again while waiting
+                await asyncio.shield(asyncio.to_thread(
+                    repo.finish_job, ctx.job_id, repo.JOB_FAILED, None, "Interrupted: worker stopped",
+                ))
+                raise
+            status, error = repo.JOB_CANCELLED, "Cancelled by admin"
+        except JobCancelled:
+            status, error = repo.JOB_CANCELLED, "Cancelled by admin"
+        except JobError as e:
+            status, error = repo.JOB_FAILED, str(e)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed: %s", ctx.job_id, ctx.kind, e)
+            status, error = repo.JOB_FAILED, f"{type(e).__name__}: {e!s}"
+        finally:
+            self._running.pop(ctx.job_id, None)
+        if ctx._dirty:
+            await asyncio.to_thread(repo.update_job_progress, ctx.job_id, ctx.done, ctx.total, ctx.message)
+        await asyncio.to_thread(repo.finish_job, ctx.job_id, status, result, error)
+        logger.info("Job finished id=%s kind=%s status=%s", ctx.job_id, ctx.kind, status)
+        if status == repo.JOB_DONE:
+            text = (result or {}).get("summary") or f"✅ {ctx.title}: готово"
+        elif status == repo.JOB_CANCELLED:
+            text = f"⛔ {ctx.title}: отменено"
+        else:
+            text = f"❌ {ctx.title}: ошибка. {error or ''}".strip()
+        await self._notify(running, text)
+
+    async def _sync_running(self) -> None:
+        running = list(self._running.values())
+        for item in running:
+            ctx = item.ctx
+            # Progress write doubles as heartbeat, so a live long job is never taken for stale
+            await asyncio.to_thread(repo.update_job_progress, ctx.job_id, ctx.done, ctx.total, ctx.message)
+            if ctx._dirty and time.monotonic() - item.notified_at >= JOB_NOTIFY_INTERVAL:
+                ctx._dirty = False
+                await self._notify(item, ctx.progress_text())
+        if running:
+            cancel_ids = await asyncio.to_thread(repo.get_cancel_requested, [r.ctx.job_id for r in running])
+            for item in running:
+                if item.ctx.job_id in cancel_ids and not item.ctx.cancelled:
+                    logger.info("Job cancel requested id=%s", item.ctx.job_id)
+                    item.ctx.cancelled = True
+                    registered = _handlers.get(item.ctx.kind)
+                    if registered is None or not registered.cooperative_cancel:
+                        item.task.cancel()
+
+    async def _monitor_loop(self) -> None:
+        last_stale_check = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_stale_check >= JOB_STALE_SECONDS / 2:
+                    last_stale_check = time.monotonic()
+                    await asyncio.to_thread(repo.fail_stale_jobs, JOB_STALE_SECONDS)
+                await self._sync_running()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Job monitor: %s", e)
+            await asyncio.sleep(self._poll_seconds)
+
+
+_pool: Optional[JobWorkerPool] = None
+
+
+def start_job_workers(
+    get_credentials: Optional[Callable[[], Optional[Tuple[str, str]]]] = None,
+    workers: int = JOB_WORKERS,
+) -> Optional[JobWorkerPool]:
+    """
+    Start the worker pool in this process (call from a running event loop).
+    get_credentials: (bot token, Bot API base URL) for chat notifications; default: Telegram settings from DB.
+    """
+    global _pool
+    if workers <= 0 or _pool is not None:
+        return _pool
+    _pool = JobWorkerPool(
+        workers=workers,
+        notifier=TelegramJobNotifier(get_credentials or _telegram_credentials_from_settings),
+    )
+    _pool.start()
+    return _pool
+
+
+async def stop_job_workers() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.stop()
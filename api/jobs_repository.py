@@ -0,0 +1,209 @@
+"""CRUD for the jobs table (background jobs, see api/jobs.py)."""
+import json
+import logging
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import update
+
+from api.db import JobModel, SessionLocal, _utc_now
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_FINAL_STATUSES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+
+def _loads(value: Optional[str]) -> Any:
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _row_to_dict(row: JobModel) -> dict:
+    return {
+        "id": row.id,
+        "kind": row.kind,
+        "title": row.title,
+        "status": row.status,
+        "params": _loads(row.params) or {},
+        "result": _loads(row.result),
+        "error": row.error,
+        "progress": {
+            "done": row.progress_done,
+            "total": row.progress_total,
+            "message": row.progress_message,
+        },
+        "chat_id": row.chat_id,
+        "telegram_id": row.telegram_id,
+        "worker": row.worker,
+        "cancel_requested": bool(row.cancel_requested),
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "started_at": row.started_at.isoformat() if row.started_at else None,
+        "finished_at": row.finished_at.isoformat() if row.finished_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+    }
+
+
+def create_job(
+    kind: str,
+    params: Optional[Dict[str, Any]] = None,
+    title: str = "",
+    chat_id: Optional[int] = None,
+    telegram_id: Optional[int] = None,
+) -> dict:
+    """Queue a job (status pending). params must be JSON-serializable."""
+    with SessionLocal() as session:
+        row = JobModel(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            title=title or kind,
+            status=JOB_PENDING,
+            params=json.dumps(params or {}, ensure_ascii=False, default=str),
+            chat_id=chat_id,
+            telegram_id=telegram_id,
+        )
+        session.add(row)
+        session.commit()
+        session.refresh(row)
+        return _row_to_dict(row)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    with SessionLocal() as session:
+        row = session.get(JobModel, job_id)
+        return _row_to_dict(row) if row else None
+
+
+def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50) -> List[dict]:
+    """Latest jobs first, optionally filtered by status and kind."""
+    with SessionLocal() as session:
+        q = session.query(JobModel)
+        if status:
+            q = q.filter(JobModel.status == status)
+        if kind:
+            q = q.filter(JobModel.kind == kind)
+        rows = q.order_by(JobModel.created_at.desc()).limit(limit).all()
+        return [_row_to_dict(r) for r in rows]
+
+
+def claim_next_job(kinds: Iterable[str], worker: str) -> Optional[dict]:
+    """
+    Atomically take the oldest pending job of the given kinds (pending -> running).
+    The conditional UPDATE makes concurrent workers (also in other processes) never claim the same job.
+    """
+    kinds = list(kinds)
+    if not kinds:
+        return None
+    with SessionLocal() as session:
+        for _ in range(5):
+            job_id = (
+                session.query(JobModel.id)
+                .filter(JobModel.status == JOB_PENDING, JobModel.kind.in_(kinds))
+                .order_by(JobModel.created_at)
+                .limit(1)
+                .scalar()
+            )
+            if job_id is None:
+                return None
+            now = _utc_now()
+            claimed = session.execute(
+                update(JobModel)
+                .where(JobModel.id == job_id, JobModel.status == JOB_PENDING)
+                .values(status=JOB_RUNNING, worker=worker, started_at=now, updated_at=now)
+            ).rowcount
+            session.commit()
+            if claimed:
+                return _row_to_dict(session.get(JobModel, job_id))
+    return None
+
+
+def update_job_progress(
+    job_id: str,
+    done: Optional[int] = None,
+    total: Optional[int] = None,
+    message: Optional[str] = None,
+) -> None:
+    """Store progress; also serves as the heartbeat of a running job (updated_at)."""
+    values: Dict[str, Any] = {"updated_at": _utc_now()}
+    if done is not None:
+        values["progress_done"] = done
+    if total is not None:
+        values["progress_total"] = total
+    if message is not None:
+        values["progress_message"] = message[:512]
+    with SessionLocal() as session:
+        session.execute(update(JobModel).where(JobModel.id == job_id).values(**values))
+        session.commit()
+
+
+def finish_job(
+    job_id: str,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> None:
+    """Final status (done / failed / cancelled) with result or error."""
+    now = _utc_now()
+    with SessionLocal() as session:
+        session.execute(
+            update(JobModel)
+            .where(JobModel.id == job_id)
+            .values(
+                status=status,
+                result=json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                error=error,
+                finished_at=now,
+                updated_at=now,
+            )
+        )
+        session.commit()
+
+
+def request_job_cancel(job_id: str) -> Optional[dict]:
+    """Pending job: cancelled at once. Running job: cancel_requested, the worker stops it. None if not found."""
+    with SessionLocal() as session:
+        row = session.get(JobModel, job_id)
+        if row is None:
+            return None
+        if row.status == JOB_PENDING:
+            row.status = JOB_CANCELLED
+            row.finished_at = _utc_now()
+        elif row.status == JOB_RUNNING:
+            row.cancel_requested = True
+        session.commit()
+        session.refresh(row)
+        return _row_to_dict(row)
+
+
+def get_cancel_requested(job_ids: Iterable[str]) -> Set[str]:
+    """Ids among job_ids whose cancellation was requested."""
+    ids = list(job_ids)
+    if not ids:
+        return set()
+    with SessionLocal() as session:
+        rows = session.query(JobModel.id).filter(JobModel.id.in_(ids), JobModel.cancel_requested == True).all()
+        return {r[0] for r in rows}
+
+
+def fail_stale_jobs(stale_seconds: float) -> int:
+    """Running jobs without heartbeat for stale_seconds (worker process died) -> failed. Returns count."""
+    threshold = _utc_now() - timedelta(seconds=stale_seconds)
+    with SessionLocal() as session:
+        count = session.execute(
+            update(JobModel)
+            .where(JobModel.status == JOB_RUNNING, JobModel.updated_at < threshold)
+            .values(status=JOB_FAILED, error="Interrupted: worker stopped", finished_at=_utc_now())
+        ).rowcount
+        session.commit()
+    if count:
+        logger.warning("Marked %d stale running jobs as failed", count)
+    return count
@@ -0,0 +1,37 @@
+"""REST API for background jobs (api/jobs.py): list, status/progress, cancel."""
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from api.jobs_repository import JOB_FINAL_STATUSES, get_job, list_jobs, request_job_cancel
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("")
+async def get_jobs(status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50):
+    """Latest jobs first; filters: status (pending | running | done | failed | cancelled), kind."""
+    return list_jobs(status=status, kind=kind, limit=max(1, min(limit, 500)))
+
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: str):
+    """Job with status, progress {done, total, message}, result or error."""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Pending job is cancelled at once; a running one is stopped by its worker within a poll interval."""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in JOB_FINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    return request_job_cancel(job_id)
@@ -1,6 +1,10 @@
 """Load and save Telegram and LLM settings; mask secrets for API responses."""
+import logging
+import os
+import threading
+import time
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
@@ -13,9 +17,15 @@ from api.db import (
 )
 from api.encryption import decrypt_secret, encrypt_secret
 
+logger = logging.getLogger(__name__)
+
 MASK_TAIL_LEN = 5
 MASK_HEAD_LEN = 3
 TELEGRAM_DEFAULT_BASE_URL = "https://api.telegram.org"
+# How often the decrypted-settings cache re-checks the row version (id, updated_at) in DB.
+# Writes in this process invalidate immediately; this bounds staleness for writes from another process
+# (admin API -> bot subprocess).
+SETTINGS_CACHE_POLL_SECONDS = float(os.getenv("SETTINGS_CACHE_POLL_SECONDS", "5"))
 
 
 def mask_secret(value: Optional[str]) -> str:
@@ -46,6 +56,50 @@ def _llm_row(session: Session) -> Optional[LLMSettingsModel]:
     return session.execute(select(LLMSettingsModel).limit(1)).scalar_one_or_none()
 
 
+class _VersionedSettingsCache:
+    """
+    In-memory decrypted settings for one single-row table.
+    Serves from memory; at most every SETTINGS_CACHE_POLL_SECONDS reads only (id, updated_at)
+    and reloads + decrypts when that version changed.
+    """
+
+    def __init__(self, model: Any, loader: Callable[[], Optional[dict]]) -> None:
+        self._model = model
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value: Optional[dict] = None
+        self._version: Optional[tuple] = None
+        self._checked_at = 0.0
+
+    def _read_version(self) -> Optional[tuple]:
+        with SessionLocal() as session:
+            row = session.execute(
+                select(self._model.id, self._model.updated_at).limit(1)
+            ).first()
+            return tuple(row) if row else None
+
+    def get(self) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded and now - self._checked_at < SETTINGS_CACHE_POLL_SECONDS:
+                return dict(self._value) if self._value is not None else None
+            version = self._read_version()
+            if not self._loaded or version != self._version:
+                self._value = self._loader()
+                self._version = version
+                self._loaded = True
+                logger.debug("Settings cache reloaded table=%s version=%s", self._model.__tablename__, version)
+            self._checked_at = now
+            return dict(self._value) if self._value is not None else None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
+            self._value = None
+            self._version = None
+
+
 def get_telegram_settings() -> dict[str, Any]:
     """Return Telegram settings for API (masked token)."""
     with SessionLocal() as session:
@@ -75,7 +129,12 @@ def get_telegram_settings() -> dict[str, Any]:
 
 
 def get_telegram_settings_decrypted() -> Optional[dict]:
-    """Return Telegram settings with decrypted token for internal use (bot)."""
+    """Return Telegram settings with decrypted token for internal use (bot). Served from cache."""
+    return _telegram_cache.get()
+
+
+def _load_telegram_settings_decrypted() -> Optional[dict]:
+    """Read active Telegram settings from DB and decrypt token."""
     with SessionLocal() as session:
         row = _telegram_row(session)
         if not row or not row.is_active or not row.access_token_encrypted:
@@ -137,6 +196,7 @@ def save_telegram_settings(
             )
             session.add(row)
         session.commit()
+        _telegram_cache.invalidate()
         session.refresh(row)
 
     token_plain = decrypt_secret(row.access_token_encrypted) if row.access_token_encrypted else None
@@ -192,7 +252,12 @@ def get_llm_settings() -> dict[str, Any]:
 
 
 def get_llm_settings_decrypted() -> Optional[dict]:
-    """Return LLM settings with decrypted API key for internal use (get_reply)."""
+    """Return LLM settings with decrypted API key for internal use (get_reply). Served from cache."""
+    return _llm_cache.get()
+
+
+def _load_llm_settings_decrypted() -> Optional[dict]:
+    """Read active LLM settings from DB and decrypt API key."""
     with SessionLocal() as session:
         row = _llm_row(session)
         if not row or not row.is_active:
@@ -212,6 +277,37 @@ def get_llm_settings_decrypted() -> Optional[dict]:
         }
 
 
+def get_llm_system_prompt() -> Optional[str]:
+    """Return the saved LLM system prompt whether or not LLM settings are active. Served from cache."""
+    value = _llm_prompt_cache.get()
+    return value.get("system_prompt") if value else None
+
+
+def _load_llm_system_prompt() -> Optional[dict]:
+    """Read the system prompt from the LLM settings row (no active/key checks, nothing decrypted)."""
+    with SessionLocal() as session:
+        row = _llm_row(session)
+        if not row:
+            return None
+        return {"system_prompt": row.system_prompt or None}
+
+
+_telegram_cache = _VersionedSettingsCache(TelegramSettingsModel, _load_telegram_settings_decrypted)
+_llm_cache = _VersionedSettingsCache(LLMSettingsModel, _load_llm_settings_decrypted)
+_llm_prompt_cache = _VersionedSettingsCache(LLMSettingsModel, _load_llm_system_prompt)
+
+
+def _invalidate_llm_cache() -> None:
+    _llm_cache.invalidate()
+    _llm_prompt_cache.invalidate()
+
+
+def invalidate_settings_cache() -> None:
+    """Drop cached decrypted settings (both blocks); next read goes to DB."""
+    _telegram_cache.invalidate()
+    _invalidate_llm_cache()
+
+
 def get_llm_credentials_for_test() -> Optional[dict]:
     """Return saved LLM credentials for connection test (any saved, not only active)."""
     with SessionLocal() as session:
@@ -285,6 +381,7 @@ def save_llm_settings(
             )
             session.add(row)
         session.commit()
+        _invalidate_llm_cache()
         session.refresh(row)
 
     key_plain = decrypt_secret(row.api_key_encrypted) if row.api_key_encrypted else None
@@ -313,6 +410,7 @@ def update_telegram_connection_status(status: str, last_checked: Optional[dateti
             row.connection_status = status
             row.last_checked = last_checked or datetime.now(timezone.utc)
             session.commit()
+            _telegram_cache.invalidate()
 
 
 def update_llm_connection_status(status: str, last_checked: Optional[datetime] = None) -> None:
@@ -323,6 +421,7 @@ def update_llm_connection_status(status: str, last_checked: Optional[datetime] =
             row.connection_status = status
             row.last_checked = last_checked or datetime.now(timezone.utc)
             session.commit()
+            _invalidate_llm_cache()
 
 
 def update_llm_model_and_prompt(
@@ -353,6 +452,7 @@ def update_llm_model_and_prompt(
             row.project_id = (project_id or "").strip() or None
         row.updated_at = datetime.now(timezone.utc)
         session.commit()
+        _invalidate_llm_cache()
         return True
 
 
@@ -361,6 +461,7 @@ def clear_telegram_settings() -> None:
     with SessionLocal() as session:
         session.execute(delete(TelegramSettingsModel))
         session.commit()
+        _telegram_cache.invalidate()
 
 
 def clear_telegram_token() -> None:
@@ -375,6 +476,7 @@ def clear_telegram_token() -> None:
             row.last_checked = datetime.now(timezone.utc)
             row.updated_at = datetime.now(timezone.utc)
             session.commit()
+            _telegram_cache.invalidate()
 
 
 def clear_llm_settings() -> None:
@@ -382,6 +484,7 @@ def clear_llm_settings() -> None:
     with SessionLocal() as session:
         session.execute(delete(LLMSettingsModel))
         session.commit()
+        _invalidate_llm_cache()
 
 
 def clear_llm_token() -> None:
@@ -396,6 +499,7 @@ def clear_llm_token() -> None:
             row.last_checked = datetime.now(timezone.utc)
             row.updated_at = datetime.now(timezone.utc)
             session.commit()
+            _invalidate_llm_cache()
 
 
 def set_telegram_active(active: bool) -> None:
@@ -406,6 +510,7 @@ def set_telegram_active(active: bool) -> None:
             row.is_active = active
             row.last_activated_at = datetime.now(timezone.utc) if active else None
             session.commit()
+            _telegram_cache.invalidate()
 
 
 def set_llm_active(active: bool) -> None:
@@ -416,3 +521,4 @@ def set_llm_active(active: bool) -> None:
             row.is_active = active
             row.last_activated_at = datetime.now(timezone.utc) if active else None
             session.commit()
+            _invalidate_llm_cache()
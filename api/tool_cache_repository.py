@@ -0,0 +1,75 @@
+"""
+Tool result cache control (tools.result_cache): invalidation generations and per-process counters.
+Each process (bot / API) keeps its own cache; invalidations bump a generation row here and every process
+polls the rows, so an admin edit or an import in the API process also drops the bot's cached results.
+"""
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import update
+
+from api.db import SessionLocal, ToolCacheControlModel, ToolCacheStatsModel
+
+logger = logging.getLogger(__name__)
+
+SCOPE_ALL = "*"
+
+
+def cache_scope_key(tool_name: Optional[str] = None, plugin_id: Optional[str] = None) -> str:
+    """Generation row of an invalidation: one tool, one plugin, or everything."""
+    if tool_name:
+        return f"tool:{tool_name}"
+    if plugin_id:
+        return f"plugin:{plugin_id}"
+    return SCOPE_ALL
+
+
+def get_tool_cache_generations() -> Dict[str, int]:
+    """{scope: generation} of all invalidation rows."""
+    with SessionLocal() as session:
+        return {r.scope: r.generation for r in session.query(ToolCacheControlModel).all()}
+
+
+def bump_tool_cache_generation(scope: str) -> int:
+    """Increment the generation of scope (row created on first use). Returns the new generation."""
+    with SessionLocal() as session:
+        bumped = session.execute(
+            update(ToolCacheControlModel)
+            .where(ToolCacheControlModel.scope == scope)
+            .values(generation=ToolCacheControlModel.generation + 1)
+        ).rowcount
+        if not bumped:
+            session.add(ToolCacheControlModel(scope=scope, generation=1))
+        session.commit()
+        generation = session.get(ToolCacheControlModel, scope).generation
+    logger.info("Tool cache invalidation published scope=%s generation=%d", scope, generation)
+    return generation
+
+
+def save_tool_cache_stats(process: str, label: str, stats: Dict[str, Any]) -> None:
+    """Store the counters of one process (upsert)."""
+    with SessionLocal() as session:
+        row = session.get(ToolCacheStatsModel, process)
+        if row is None:
+            row = ToolCacheStatsModel(process=process)
+            session.add(row)
+        row.label = label
+        row.stats = json.dumps(stats, ensure_ascii=False)
+        row.updated_at = datetime.now(timezone.utc)
+        session.commit()
+
+
+def list_tool_cache_stats(max_age_seconds: float) -> List[Dict[str, Any]]:
+    """Counters of processes that reported within max_age_seconds, newest first."""
+    since = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+    with SessionLocal() as session:
+        rows = session.query(ToolCacheStatsModel).order_by(ToolCacheStatsModel.updated_at.desc()).all()
+        out = []
+        for r in rows:
+            updated = r.updated_at if r.updated_at.tzinfo else r.updated_at.replace(tzinfo=timezone.utc)
+            if updated < since:
+                continue
+            out.append({"process": r.process, "label": r.label, "updated_at": updated.isoformat(), **json.loads(r.stats)})
+        return out
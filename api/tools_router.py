@@ -1,6 +1,7 @@
 """REST API for tools: list, get, enable/disable, settings."""
+import asyncio
 import logging
-from typing import List
+from typing import List, Optional
 
 import httpx
 from fastapi import APIRouter, HTTPException
@@ -12,6 +13,8 @@ from api.tools_repository import (
     update_tool_enabled,
 )
 from tools import get_registry
+from api.tool_cache_repository import get_tool_cache_generations, list_tool_cache_stats
+from tools.result_cache import TOOL_CACHE_POLL_SECONDS, invalidate_tool_cache
 from tools.settings_manager import (
     get_plugin_settings,
     get_missing_settings,
@@ -52,6 +55,33 @@ async def list_tools():
     return {"tools": tools, "total": len(tools), "enabled_count": enabled_count}
 
 
+@router.get("/cache/stats")
+async def tool_cache_stats():
+    """Tool result cache of every process (bot / API) that reported recently: size and hit/miss counters."""
+    processes = await asyncio.to_thread(list_tool_cache_stats, max(60.0, 30 * TOOL_CACHE_POLL_SECONDS))
+    hits = sum(p.get("hits", 0) for p in processes)
+    misses = sum(p.get("misses", 0) for p in processes)
+    return {
+        "size": sum(p.get("size", 0) for p in processes),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "poll_seconds": TOOL_CACHE_POLL_SECONDS,
+        "processes": processes,
+    }
+
+
+@router.delete("/cache")
+async def clear_tool_cache(tool: Optional[str] = None, plugin_id: Optional[str] = None):
+    """Drop cached tool results (all, or of one tool / plugin) in every process; the bot applies it within poll_seconds."""
+    invalidated = await asyncio.to_thread(invalidate_tool_cache, tool, plugin_id)
+    return {
+        "invalidated": invalidated,
+        "generations": await asyncio.to_thread(get_tool_cache_generations),
+        "poll_seconds": TOOL_CACHE_POLL_SECONDS,
+    }
+
+
 @router.get("/{name}")
 async def get_tool(name: str):
     """Get full tool information."""
@@ -0,0 +1,276 @@
+"""
+Cache of LLM answers for repeated FAQ-style questions, checked before the LLM is called.
+Modes (ANSWER_CACHE_MODE):
+    off      - disabled (default)
+    exact    - key: scope + normalized last user message
+    similar  - exact first, then nearest cached question of the same scope by cosine similarity of
+               character trigram vectors (local index, no embedding API), at least ANSWER_CACHE_SIMILARITY
+Scope = hash of (effective system prompt, provider/model, tool schemas), so a prompt/model/tool change never
+serves old answers. A follow-up ("а у него?", "расскажи подробнее") also hashes the summary block and the last
+assistant turn, so it is only answered within the same conversation context; standalone questions share one
+scope across chats. Very short questions are never cached. Answers that used tools are stored only if every
+call was cacheable (tools.result_cache.is_cacheable) and expire with the shortest tool cache_ttl.
+Purge and per-chat bypass are set by the admin API (api.answer_cache_repository) and polled here.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from tools.models import ToolCall as ToolsToolCall
+from tools.registry import ToolRegistry, get_registry
+from tools.result_cache import CACHE_SCOPE_USER, is_cacheable
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_MODE_OFF = "off"
+ANSWER_CACHE_MODE_EXACT = "exact"
+ANSWER_CACHE_MODE_SIMILAR = "similar"
+
+ANSWER_CACHE_MODE = (os.getenv("ANSWER_CACHE_MODE") or ANSWER_CACHE_MODE_OFF).strip().lower()
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+# How often the bot re-reads purge generation / bypass chats written by the admin API, sec
+ANSWER_CACHE_POLL_SECONDS = float(os.getenv("ANSWER_CACHE_POLL_SECONDS", "5"))
+
+# Questions longer than this are conversation, not FAQ; shorter ones are follow-ups: never cached
+_MAX_QUESTION_CHARS = 500
+_MIN_QUESTION_CHARS = 10
+_SPACES_RE = re.compile(r"\s+")
+_TRAILING_PUNCT = " ?!.…"
+# A question that opens with a conjunction or refers back (pronouns, "подробнее") depends on the conversation
+_FOLLOW_UP_RE = re.compile(
+    r"^(а|и|но|тогда|еще|также|а если)\b"
+    r"|\b(он|она|оно|они|его|ему|него|ним|нем|нему|нее|ее|ей|ней|их|им|них|ними|этот|эта|это|этого|этой|этом|"
+    r"эти|этих|тот|та|то|того|там|туда|оттуда|подробнее|дальше)\b"
+)
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, ё→е, collapsed whitespace, no trailing ?!. (so "Кто мой руководитель?" == "кто мой руководитель")."""
+    text = _SPACES_RE.sub(" ", (text or "").lower().replace("ё", "е")).strip()
+    return text.rstrip(_TRAILING_PUNCT)
+
+
+def is_follow_up(text: str) -> bool:
+    """True if the question needs the preceding conversation to be understood."""
+    return bool(_FOLLOW_UP_RE.search(normalize_question(text)))
+
+
+def _trigram_vector(text: str) -> Dict[str, float]:
+    """L2-normalized character trigram counts (words padded with spaces)."""
+    counts: Counter = Counter()
+    for word in text.split():
+        padded = f" {word} "
+        counts.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {g: c / norm for g, c in counts.items()}
+
+
+def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(g, 0.0) for g, w in a.items())
+
+
+def answer_ttl_for_tools(
+    tool_calls: Iterable[ToolsToolCall],
+    ttl: int = ANSWER_CACHE_TTL,
+    registry: Optional[ToolRegistry] = None,
+) -> int:
+    """
+    TTL for an answer produced with these tool calls: min(ttl, tool cache_ttl) over the calls;
+    0 (do not cache) if any call is not cacheable or its result is per-user (cache_scope: user).
+    """
+    reg = registry or get_registry()
+    for tc in tool_calls:
+        tool = reg.get_tool(tc.name)
+        if tool is None or not is_cacheable(tool, tc.arguments) or tool.cache_scope == CACHE_SCOPE_USER:
+            return 0
+        ttl = min(ttl, tool.cache_ttl)
+    return max(0, ttl)
+
+
+@dataclass
+class _Entry:
+    scope: str
+    question: str
+    answer: str
+    expires_at: float
+    vector: Optional[Dict[str, float]] = None
+
+
+class AnswerCache:
+    """LRU + TTL answer cache; scope and question are keys, similarity lookup is brute force within a scope."""
+
+    def __init__(
+        self,
+        mode: str = ANSWER_CACHE_MODE,
+        ttl_seconds: int = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+        poll_seconds: float = ANSWER_CACHE_POLL_SECONDS,
+        control: bool = True,
+    ) -> None:
+        if mode not in (ANSWER_CACHE_MODE_OFF, ANSWER_CACHE_MODE_EXACT, ANSWER_CACHE_MODE_SIMILAR):
+            logger.warning("Unknown ANSWER_CACHE_MODE=%r, answer cache disabled", mode)
+            mode = ANSWER_CACHE_MODE_OFF
+        self._mode = mode
+        self._ttl = ttl_seconds
+        self._max_entries = max(1, max_entries)
+        self._similarity = similarity
+        self._poll_seconds = poll_seconds
+        self._control = control
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._bypass: FrozenSet[int] = frozenset()
+        self._polled_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._mode != ANSWER_CACHE_MODE_OFF and self._ttl > 0
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def scope(messages: List[dict], tools_hash: str = "") -> str:
+        """
+        Scope of a request: effective system prompt (settings DB override or first system message), model and tools;
+        for a follow-up question also the summary block and the last assistant turn (not the whole history, which
+        grows with every exchange and would make every scope unique).
+        """
+        from bot.llm import get_active_model
+
+        provider, model, system_prompt = get_active_model()
+        if not system_prompt:
+            system_prompt = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+        context = ""
+        question = messages[-1].get("content") if messages else ""
+        if isinstance(question, str) and is_follow_up(question):
+            start = 1 if messages and messages[0].get("role") == "system" else 0
+            summary = [m.get("content") for m in messages[start:-1] if m.get("role") == "system"]
+            replies = [m.get("content") for m in messages[start:-1] if m.get("role") == "assistant"]
+            last_reply = next((r for r in reversed(replies) if r), None)
+            context = json.dumps([summary, last_reply], ensure_ascii=False, default=str)
+        raw = "\x1f".join((provider, model, system_prompt, tools_hash, context))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    async def _sync_control(self) -> None:
+        """Apply purge generation and bypass list from the admin API (DB row), at most every poll_seconds."""
+        if not self._control:
+            return
+        now = time.monotonic()
+        if now - self._polled_at < self._poll_seconds:
+            return
+        self._polled_at = now
+        try:
+            from api.answer_cache_repository import get_answer_cache_control
+            control = await asyncio.to_thread(get_answer_cache_control)
+        except Exception as e:
+            logger.debug("Answer cache control not available: %s", e)
+            return
+        generation = control.get("generation", 0)
+        if self._generation is not None and generation != self._generation:
+            self.clear()
+            logger.info("Answer cache purged by admin (generation %s -> %s)", self._generation, generation)
+        self._generation = generation
+        self._bypass = frozenset(control.get("bypass_chat_ids") or ())
+
+    async def _usable(self, chat_id: Optional[int], question: str) -> bool:
+        if not self.enabled or not _MIN_QUESTION_CHARS <= len(question) <= _MAX_QUESTION_CHARS:
+            return False
+        await self._sync_control()
+        return chat_id not in self._bypass
+
+    async def get(self, chat_id: Optional[int], scope: str, text: str) -> Optional[str]:
+        """Cached answer for the user message, or None (miss, expired, disabled or bypassed chat)."""
+        question = normalize_question(text)
+        if not await self._usable(chat_id, question):
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((scope, question))
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[(scope, question)]
+                entry = None
+            if entry is None and self._mode == ANSWER_CACHE_MODE_SIMILAR:
+                entry = self._nearest(scope, question, now)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((entry.scope, entry.question))
+            self.hits += 1
+        logger.info("Answer cache hit chat_id=%s mode=%s", chat_id, self._mode)
+        return entry.answer
+
+    def _nearest(self, scope: str, question: str, now: float) -> Optional[_Entry]:
+        vector = _trigram_vector(question)
+        best, best_score = None, self._similarity
+        for entry in self._entries.values():
+            if entry.scope != scope or entry.expires_at <= now or entry.vector is None:
+                continue
+            score = _cosine(vector, entry.vector)
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is not None:
+            logger.debug("Answer cache similar match score=%.3f", best_score)
+        return best
+
+    async def put(self, chat_id: Optional[int], scope: str, text: str, answer: str, ttl: Optional[int] = None) -> None:
+        """Store answer for the user message; ttl (e.g. from answer_ttl_for_tools) caps the default TTL."""
+        question = normalize_question(text)
+        ttl = self._ttl if ttl is None else min(ttl, self._ttl)
+        if ttl <= 0 or not answer or not await self._usable(chat_id, question):
+            return
+        vector = _trigram_vector(question) if self._mode == ANSWER_CACHE_MODE_SIMILAR else None
+        with self._lock:
+            self._entries[(scope, question)] = _Entry(
+                scope=scope, question=question, answer=answer, expires_at=time.monotonic() + ttl, vector=vector,
+            )
+            self._entries.move_to_end((scope, question))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> int:
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "mode": self._mode,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_cache: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get global answer cache (bot process)."""
+    global _cache
+    if _cache is None:
+        _cache = AnswerCache()
+    return _cache
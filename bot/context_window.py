@@ -0,0 +1,152 @@
+"""
+Token-budgeted context window: system prompt + as much recent history as fits + new user message.
+Token counts come from tiktoken for OpenAI-compatible providers (if installed) or from a calibrated
+per-provider estimator (separate chars-per-token rates for ASCII and Cyrillic/other text).
+Per-message counts are memoized, so history is not re-measured every turn.
+"""
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Total prompt + completion budget per request (tokens); history gets what is left
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "8000"))
+# Memoized token counts (distinct (provider, text) pairs)
+CONTEXT_TOKEN_CACHE_SIZE = int(os.getenv("CONTEXT_TOKEN_CACHE_SIZE", "8192"))
+# Role/formatting overhead per chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+# Header of the rolling conversation summary block (bot.summarizer), placed right after the system prompt
+SUMMARY_HEADER = "Краткое содержание более ранней части диалога:\n"
+
+# Calibrated chars per token: (ASCII text, other text e.g. Cyrillic)
+_CHARS_PER_TOKEN = {
+    "openai": (4.0, 3.0),
+    "azure": (4.0, 3.0),
+    "openrouter": (4.0, 3.0),
+    "groq": (4.0, 3.0),
+    "deepseek": (4.0, 3.0),
+    "ollama": (3.5, 2.5),
+    "anthropic": (3.5, 2.0),
+    "google": (4.0, 3.0),
+    "yandex": (4.0, 4.0),
+}
+_DEFAULT_CHARS_PER_TOKEN = (3.5, 2.5)
+_TIKTOKEN_PROVIDERS = frozenset({"openai", "azure", "openrouter", "groq", "deepseek"})
+
+_tiktoken_encoding = None
+_tiktoken_checked = False
+
+
+def _get_tiktoken():
+    """o200k_base encoding if tiktoken is installed (optional dependency), else None."""
+    global _tiktoken_encoding, _tiktoken_checked
+    if not _tiktoken_checked:
+        _tiktoken_checked = True
+        try:
+            import tiktoken
+
+            _tiktoken_encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _tiktoken_encoding = None
+    return _tiktoken_encoding
+
+
+def estimate_text_tokens(text: str, provider: str = "") -> int:
+    """Calibrated estimate without a tokenizer (O(n), no allocations beyond one encode)."""
+    if not text:
+        return 0
+    chars = len(text)
+    # 2+ byte UTF-8 chars (Cyrillic etc.) tokenize noticeably worse than ASCII
+    other = min(chars, len(text.encode("utf-8")) - chars)
+    ascii_cpt, other_cpt = _CHARS_PER_TOKEN.get(provider, _DEFAULT_CHARS_PER_TOKEN)
+    return int((chars - other) / ascii_cpt + other / other_cpt) + 1
+
+
+@lru_cache(maxsize=CONTEXT_TOKEN_CACHE_SIZE)
+def count_text_tokens(text: str, provider: str = "") -> int:
+    """Tokens in text for provider (memoized)."""
+    if provider in _TIKTOKEN_PROVIDERS:
+        encoding = _get_tiktoken()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+    return estimate_text_tokens(text, provider)
+
+
+def count_message_tokens(message: dict, provider: str = "") -> int:
+    """Tokens of one chat message (content + role overhead)."""
+    content = message.get("content")
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False) if content is not None else ""
+    return count_text_tokens(content, provider) + MESSAGE_OVERHEAD_TOKENS
+
+
+def count_tools_tokens(tools: Any, provider: str = "") -> int:
+    """Tokens taken by tool schemas sent with the request (ToolSchemaSet or OpenAI-format list)."""
+    if not tools:
+        return 0
+    canonical = getattr(tools, "canonical_json", None)
+    if canonical is None:
+        canonical = json.dumps(list(tools), ensure_ascii=False, sort_keys=True)
+    return count_text_tokens(canonical, provider)
+
+
+def fit_history(history: List[dict], budget: int, provider: str = "") -> Tuple[List[dict], int]:
+    """
+    Newest messages of history that fit in budget tokens, oldest first, starting with a user message.
+    Returns (messages, tokens used).
+    """
+    used = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        cost = count_message_tokens(history[i], provider)
+        if used + cost > budget:
+            break
+        used += cost
+        start = i
+    # Do not begin the window with an orphaned assistant reply
+    while start < len(history) and history[start].get("role") != "user":
+        used -= count_message_tokens(history[start], provider)
+        start += 1
+    return history[start:], used
+
+
+def build_context(
+    system_prompt: str,
+    history: List[dict],
+    user_text: str,
+    provider: str = "",
+    max_tokens: int = CONTEXT_MAX_TOKENS,
+    completion_tokens: Optional[int] = None,
+    reserve_tokens: int = 0,
+    summary: str = "",
+) -> List[dict]:
+    """
+    Message list for the LLM: system + summary of older turns (if any) + fitted history + new user message.
+    completion_tokens (default: bot.llm.MAX_COMPLETION_TOKENS) and reserve_tokens (e.g. tool schemas)
+    are kept free; history gets the rest of max_tokens.
+    """
+    if completion_tokens is None:
+        from bot.llm import MAX_COMPLETION_TOKENS
+
+        completion_tokens = MAX_COMPLETION_TOKENS
+    head = [{"role": "system", "content": system_prompt}]
+    if summary:
+        head.append({"role": "system", "content": SUMMARY_HEADER + summary})
+    user = {"role": "user", "content": user_text}
+    fixed = sum(count_message_tokens(m, provider) for m in head) + count_message_tokens(user, provider)
+    budget = max_tokens - completion_tokens - reserve_tokens - fixed
+    if budget < 0:
+        logger.warning(
+            "context budget exceeded without history: fixed=%d reserve=%d completion=%d max=%d",
+            fixed, reserve_tokens, completion_tokens, max_tokens,
+        )
+    fitted, used = fit_history(history, max(0, budget), provider)
+    if len(fitted) < len(history):
+        logger.debug(
+            "context window: kept %d/%d history messages (%d tokens, budget %d)",
+            len(fitted), len(history), used, budget,
+        )
+    return [*head, *fitted, user]
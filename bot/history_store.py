@@ -0,0 +1,326 @@
+"""
+Bounded conversation-history store for the bot.
+Memory tier: O(1) LRU (OrderedDict) of at most HISTORY_MAX_CHATS chats, each capped to HISTORY_MAX_MESSAGES.
+Persistent tier (optional): write-behind to the chat_messages table (api.db, SQLite or Postgres);
+new messages are flushed in batches in a background task, evicted/restarted chats are read back on demand.
+Chats inactive longer than HISTORY_TTL_SECONDS are expired (0 = no TTL).
+Each chat also keeps a rolling summary of turns compacted out of the history (see bot.summarizer).
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Messages kept per chat (user + assistant); the prompt gets as many as fit CONTEXT_MAX_TOKENS (bot.context_window)
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "100"))
+# Chats kept in memory; least recently used chats are evicted (and re-read from DB when needed)
+HISTORY_MAX_CHATS = int(os.getenv("HISTORY_MAX_CHATS", "500"))
+# Chat history expires after this many seconds of inactivity (0 = never)
+HISTORY_TTL_SECONDS = int(os.getenv("HISTORY_TTL_SECONDS", "0"))
+# "db" — persist history to the settings DB (write-behind); "memory" — in-process only
+HISTORY_BACKEND = (os.getenv("HISTORY_BACKEND", "db") or "db").strip().lower()
+# Write-behind flush period, seconds
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "2.0"))
+
+
+@dataclass
+class _ChatEntry:
+    messages: List[dict] = field(default_factory=list)
+    summary: str = ""
+    touched_at: float = field(default_factory=time.time)
+
+
+class ChatHistoryStore:
+    """
+    Per-chat history with an LRU memory tier and an optional write-behind DB tier.
+    Methods are coroutines: DB access runs in a worker thread and never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        max_chats: int = HISTORY_MAX_CHATS,
+        max_messages: int = HISTORY_MAX_MESSAGES,
+        ttl_seconds: int = HISTORY_TTL_SECONDS,
+        persistent: bool = HISTORY_BACKEND == "db",
+        flush_interval: float = HISTORY_FLUSH_INTERVAL,
+    ) -> None:
+        self._max_chats = max(1, max_chats)
+        self._max_messages = max(2, max_messages)
+        self._ttl = max(0, ttl_seconds)
+        self._persistent = persistent
+        self._flush_interval = flush_interval
+        self._chats: "OrderedDict[int, _ChatEntry]" = OrderedDict()
+        # Write-behind queue: chat_id -> messages not yet written to DB
+        self._pending: Dict[int, List[dict]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._db_ready = False
+
+    @property
+    def max_messages(self) -> int:
+        """Messages kept per chat."""
+        return self._max_messages
+
+    @property
+    def persistent(self) -> bool:
+        """True if the DB tier is enabled (and initialized)."""
+        return self._persistent
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    def _expired(self, entry: _ChatEntry, now: float) -> bool:
+        return self._ttl > 0 and now - entry.touched_at > self._ttl
+
+    def _put(self, chat_id: int, entry: _ChatEntry) -> None:
+        """Insert as most recently used; evict the least recently used chat over the limit (O(1))."""
+        self._chats[chat_id] = entry
+        self._chats.move_to_end(chat_id)
+        while len(self._chats) > self._max_chats:
+            evicted, _ = self._chats.popitem(last=False)
+            logger.debug("evicted chat_id=%s from history memory (max %d chats)", evicted, self._max_chats)
+
+    async def _load(self, chat_id: int) -> Optional[_ChatEntry]:
+        """Entry of chat_id from memory, else from DB; None if the chat has no history."""
+        now = time.time()
+        entry = self._chats.get(chat_id)
+        if entry is not None:
+            if not self._expired(entry, now):
+                self._chats.move_to_end(chat_id)
+                return entry
+            # Expiry evicts the memory tier only; the DB read below applies the same TTL to persisted rows
+            del self._chats[chat_id]
+        if not self._persistent:
+            return None
+        if chat_id in self._pending:
+            await self.flush()
+        loaded = await self._db_call(self._db_load, chat_id)
+        if not loaded or not (loaded[0] or loaded[1]):
+            return None
+        entry = _ChatEntry(messages=loaded[0], summary=loaded[1], touched_at=now)
+        self._put(chat_id, entry)
+        return entry
+
+    async def get(self, chat_id: int) -> List[dict]:
+        """History of chat_id (oldest first); a copy, safe to extend."""
+        entry = await self._load(chat_id)
+        return list(entry.messages) if entry is not None else []
+
+    async def get_summary(self, chat_id: int) -> str:
+        """Rolling summary of compacted older turns ("" if none)."""
+        entry = await self._load(chat_id)
+        return entry.summary if entry is not None else ""
+
+    async def append(self, chat_id: int, messages: List[dict]) -> None:
+        """Append messages (dicts with role/content) and keep the last max_messages."""
+        if not messages:
+            return
+        entry = await self._load(chat_id)
+        history = (entry.messages if entry is not None else []) + list(messages)
+        summary = entry.summary if entry is not None else ""
+        self._put(chat_id, _ChatEntry(messages=history[-self._max_messages:], summary=summary))
+        if self._persistent:
+            self._pending.setdefault(chat_id, []).extend(messages)
+            self._ensure_flusher()
+
+    @staticmethod
+    def _summarized_prefix(messages: List[dict], summarized: List[dict]) -> int:
+        """
+        How many leading messages are the tail of summarized. Messages appended meanwhile may have pushed
+        some summarized ones out over the cap, so the count is matched against the current history.
+        """
+        for k in range(min(len(messages), len(summarized)), 0, -1):
+            if messages[:k] == summarized[-k:]:
+                return k
+        return 0
+
+    async def compact(self, chat_id: int, summary: str, summarized: List[dict]) -> None:
+        """Replace the summarized oldest messages of chat_id (those still in the history) with summary."""
+        entry = await self._load(chat_id)
+        if entry is None:
+            return
+        drop = self._summarized_prefix(entry.messages, summarized)
+        entry.messages = entry.messages[drop:]
+        entry.summary = summary
+        if self._persistent:
+            await self.flush()
+            await self._db_call(self._db_compact, chat_id, summary, drop)
+
+    async def clear(self, chat_id: int) -> None:
+        """Forget chat history in both tiers."""
+        self._chats.pop(chat_id, None)
+        self._pending.pop(chat_id, None)
+        if self._persistent:
+            await self._db_call(self._db_clear, chat_id)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and not self._flusher.done():
+            return
+        self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write pending messages to DB in one transaction (no-op for the memory backend)."""
+        if not self._persistent or not self._pending:
+            return
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            if batch and await self._db_call(self._db_write, batch) is None:
+                # DB unavailable: keep messages for the next attempt (ahead of newer ones)
+                for chat_id, messages in batch.items():
+                    self._pending[chat_id] = messages + self._pending.get(chat_id, [])
+
+    async def close(self) -> None:
+        """Stop the background flusher and write what is left. Call on shutdown."""
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None and not flusher.done():
+            flusher.cancel()
+            try:
+                await flusher
+            except (asyncio.CancelledError, Exception):
+                pass
+        await self.flush()
+        self._flush_lock = None
+
+    async def _db_call(self, fn, *args):
+        """Run DB function in a thread; on error log and return None (history degrades to memory)."""
+        try:
+            return await asyncio.to_thread(fn, *args)
+        except Exception as e:
+            logger.warning("History DB %s failed: %s", fn.__name__, e)
+            return None
+
+    def _ensure_db(self) -> None:
+        if not self._db_ready:
+            from api.db import init_db
+
+            init_db()
+            self._db_ready = True
+
+    def _cutoff(self) -> Optional[datetime]:
+        if self._ttl <= 0:
+            return None
+        return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self._ttl)
+
+    def _db_load(self, chat_id: int) -> Tuple[List[dict], str]:
+        from api.db import ChatMessageModel, ChatSummaryModel, SessionLocal
+
+        self._ensure_db()
+        with SessionLocal() as session:
+            query = session.query(ChatMessageModel).filter(ChatMessageModel.chat_id == chat_id)
+            cutoff = self._cutoff()
+            if cutoff is not None:
+                query = query.filter(ChatMessageModel.created_at >= cutoff)
+            rows = query.order_by(ChatMessageModel.id.desc()).limit(self._max_messages).all()
+            summary_row = session.get(ChatSummaryModel, chat_id)
+            summary = summary_row.summary if summary_row is not None else ""
+            if summary and cutoff is not None and summary_row.updated_at < cutoff:
+                summary = ""
+        return [{"role": r.role, "content": r.content} for r in reversed(rows)], summary
+
+    def _db_write(self, batch: Dict[int, List[dict]]) -> bool:
+        from api.db import ChatMessageModel, SessionLocal
+
+        self._ensure_db()
+        with SessionLocal() as session:
+            session.add_all(
+                ChatMessageModel(chat_id=chat_id, role=m.get("role") or "", content=m.get("content") or "")
+                for chat_id, messages in batch.items()
+                for m in messages
+            )
+            session.flush()
+            for chat_id in batch:
+                self._db_trim(session, chat_id)
+            session.commit()
+        return True
+
+    def _db_trim(self, session, chat_id: int) -> None:
+        """Delete rows of chat_id older than the newest max_messages (and older than TTL)."""
+        from api.db import ChatMessageModel
+
+        boundary = (
+            session.query(ChatMessageModel.id)
+            .filter(ChatMessageModel.chat_id == chat_id)
+            .order_by(ChatMessageModel.id.desc())
+            .offset(self._max_messages - 1)
+            .limit(1)
+            .scalar()
+        )
+        query = session.query(ChatMessageModel).filter(ChatMessageModel.chat_id == chat_id)
+        if boundary is not None:
+            query.filter(ChatMessageModel.id < boundary).delete(synchronize_session=False)
+        cutoff = self._cutoff()
+        if cutoff is not None:
+            query.filter(ChatMessageModel.created_at < cutoff).delete(synchronize_session=False)
+
+    def _db_compact(self, chat_id: int, summary: str, drop: int) -> bool:
+        from api.db import ChatMessageModel, ChatSummaryModel, SessionLocal
+
+        self._ensure_db()
+        with SessionLocal() as session:
+            if drop > 0:
+                ids = [
+                    row_id
+                    for (row_id,) in session.query(ChatMessageModel.id)
+                    .filter(ChatMessageModel.chat_id == chat_id)
+                    .order_by(ChatMessageModel.id)
+                    .limit(drop)
+                ]
+                if ids:
+                    session.query(ChatMessageModel).filter(ChatMessageModel.id.in_(ids)).delete(
+                        synchronize_session=False
+                    )
+            row = session.get(ChatSummaryModel, chat_id)
+            if row is None:
+                session.add(ChatSummaryModel(chat_id=chat_id, summary=summary))
+            else:
+                row.summary = summary
+            session.commit()
+        return True
+
+    def _db_clear(self, chat_id: int) -> bool:
+        from api.db import ChatMessageModel, ChatSummaryModel, SessionLocal
+
+        self._ensure_db()
+        with SessionLocal() as session:
+            session.query(ChatMessageModel).filter(ChatMessageModel.chat_id == chat_id).delete(
+                synchronize_session=False
+            )
+            session.query(ChatSummaryModel).filter(ChatSummaryModel.chat_id == chat_id).delete(
+                synchronize_session=False
+            )
+            session.commit()
+        return True
+
+
+_store: Optional[ChatHistoryStore] = None
+
+
+def get_history_store() -> ChatHistoryStore:
+    """Get global history store (shared by both bot entry points)."""
+    global _store
+    if _store is None:
+        _store = ChatHistoryStore()
+        logger.info(
+            "History store backend=%s max_chats=%d max_messages=%d ttl=%ds",
+            "db" if _store.persistent else "memory", HISTORY_MAX_CHATS, HISTORY_MAX_MESSAGES, HISTORY_TTL_SECONDS,
+        )
+    return _store
+
+
+async def close_history_store() -> None:
+    """Flush pending history writes. Call on shutdown."""
+    if _store is not None:
+        await _store.close()
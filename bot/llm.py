@@ -3,12 +3,24 @@ import json
 import logging
 import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 from bot.config import get_active_llm
+from bot.llm_clients import get_client_manager
+from tools.schemas import ToolSchemaSet, as_schema_set
 
 logger = logging.getLogger(__name__)
 
+# Completion limit for every provider (context window reserves it, see bot.context_window)
+MAX_COMPLETION_TOKENS = 1024
+
+# Provider prompt caching: Anthropic cache_control breakpoints on tools/system/last message
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+_CACHE_CONTROL = {"type": "ephemeral"}
+
+# Streaming: async callback receiving each text delta as it arrives
+DeltaCallback = Callable[[str], Awaitable[None]]
+
 
 @dataclass
 class ToolCall:
@@ -21,7 +33,7 @@ class ToolCall:
 def _get_llm_from_settings_db() -> Optional[tuple]:
     """
     Return (provider, model, kwargs, system_prompt) from active LLM settings in DB, or None.
-    system_prompt may be None. Single DB read to avoid duplicate get_llm_settings_decrypted.
+    system_prompt may be None. Settings come from the in-memory cache (no DB read/decrypt per message).
     """
     try:
         from api.settings_repository import get_llm_settings_decrypted
@@ -50,9 +62,98 @@ def _get_llm_from_settings_db() -> Optional[tuple]:
     system_prompt = (settings.get("system_prompt") or "").strip() or None
     return (provider, model, kwargs, system_prompt)
 
-# Lazy clients per provider (anthropic, google — config-driven; openai-compatible built per-call for hot-swap)
-_anthropic_client: Optional[object] = None
-_google_model = None
+
+def _order_system_messages(messages: List[dict], system_prompt: Optional[str] = None) -> List[dict]:
+    """
+    Cache-friendly layout: system messages first, the stable prompt (replaced by system_prompt from
+    settings DB if set) before per-chat blocks such as the conversation summary, then the dialog.
+    """
+    systems = [m.get("content") or "" for m in messages if m.get("role") == "system"]
+    if system_prompt:
+        systems = [system_prompt] + systems[1:]
+    head = [{"role": "system", "content": content} for content in systems if content]
+    return head + [m for m in messages if m.get("role") != "system"]
+
+
+def _joined_system(messages: List[dict]) -> str:
+    """All system blocks as one text (providers with a single system field)."""
+    return "\n\n".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+
+
+@dataclass
+class PromptCacheStats:
+    """Prompt token usage per provider; cached_tokens are prompt tokens served from the provider cache."""
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+_prompt_cache_stats: Dict[str, PromptCacheStats] = {}
+
+
+def _record_usage(provider: str, prompt_tokens: int, cached_tokens: int = 0, cache_write_tokens: int = 0) -> None:
+    """Account prompt/cache tokens reported by the provider."""
+    stats = _prompt_cache_stats.setdefault(provider, PromptCacheStats())
+    stats.requests += 1
+    stats.prompt_tokens += prompt_tokens or 0
+    stats.cached_tokens += cached_tokens or 0
+    stats.cache_write_tokens += cache_write_tokens or 0
+    logger.info(
+        "LLM usage provider=%s prompt_tokens=%d cached_tokens=%d cache_write_tokens=%d",
+        provider, prompt_tokens or 0, cached_tokens or 0, cache_write_tokens or 0,
+    )
+
+
+def _record_openai_usage(provider: str, usage) -> None:
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    _record_usage(provider, getattr(usage, "prompt_tokens", 0) or 0, getattr(details, "cached_tokens", 0) or 0)
+
+
+def get_prompt_cache_stats() -> Dict[str, dict]:
+    """Accumulated prompt-cache usage per provider (since process start)."""
+    return {
+        provider: {
+            "requests": st.requests,
+            "prompt_tokens": st.prompt_tokens,
+            "cached_tokens": st.cached_tokens,
+            "cache_write_tokens": st.cache_write_tokens,
+            "hit_ratio": round(st.hit_ratio, 4),
+        }
+        for provider, st in _prompt_cache_stats.items()
+    }
+
+
+def get_active_provider() -> str:
+    """Provider of the active LLM (settings DB first, then .env); empty string if none is configured."""
+    from_db = _get_llm_from_settings_db()
+    if from_db:
+        return from_db[0]
+    try:
+        return get_active_llm()[0]
+    except ValueError:
+        return ""
+
+
+def get_active_model() -> Tuple[str, str, Optional[str]]:
+    """(provider, model, system prompt from settings DB or None) of the active LLM; empty strings if none."""
+    from_db = _get_llm_from_settings_db()
+    if from_db:
+        return from_db[0], from_db[1], from_db[3]
+    try:
+        provider, model, _ = get_active_llm()
+    except ValueError:
+        return "", "", None
+    return provider, model, None
+
+
+# Clients (openai-compatible, azure, anthropic, yandex) are pooled in bot.llm_clients, keyed by settings for hot-swap
 
 
 def _needs_max_completion_tokens(model: str) -> bool:
@@ -98,155 +199,173 @@ def _parse_openai_tool_calls(message) -> List[ToolCall]:
     return result
 
 
-async def _reply_openai(
-    messages: List[dict], model: str, kwargs: dict,
-    tools: Optional[List[dict]] = None, tool_choice: str = "auto",
-) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+def _openai_create_kw(model: str, tools: Optional[ToolSchemaSet], tool_choice: str) -> dict:
     """
-    OpenAI: always create client from kwargs so DB/config hot-swap uses current api_key and base_url.
+    chat.completions kwargs shared by all OpenAI-compatible calls.
     For new models (gpt-5, o3, o4) uses max_completion_tokens; older models use max_tokens.
-    With tools: returns (content, tool_calls or None).
     """
-    from openai import AsyncOpenAI
-
-    base_url = kwargs.get("base_url")
-    api_key = kwargs.get("api_key") or ""
-    timeout = kwargs.get("timeout")
-    client_kw: dict = {}
-    if timeout is not None:
-        client_kw["timeout"] = float(timeout)
-    if base_url:
-        client = AsyncOpenAI(api_key=api_key, base_url=base_url, **client_kw)
-    else:
-        client = AsyncOpenAI(api_key=api_key, **client_kw)
-
     create_kw: dict = {}
     if _needs_max_completion_tokens(model):
-        create_kw["max_completion_tokens"] = 1024
+        create_kw["max_completion_tokens"] = MAX_COMPLETION_TOKENS
     else:
-        create_kw["max_tokens"] = 1024
+        create_kw["max_tokens"] = MAX_COMPLETION_TOKENS
     if tools:
-        create_kw["tools"] = tools
+        create_kw["tools"] = list(tools.openai)
         create_kw["tool_choice"] = tool_choice
+    return create_kw
 
-    resp = await client.chat.completions.create(
-        model=model, messages=messages, **create_kw
-    )
+
+def _openai_compatible_client(provider: str, kwargs: dict):
+    """Pooled client for an OpenAI-compatible provider (azure uses AsyncAzureOpenAI, openrouter defaults to 120s)."""
+    manager = get_client_manager()
+    if provider == "azure":
+        return manager.get_azure(kwargs)
+    if provider == "openrouter":
+        return manager.get_openai(provider, {**kwargs, "timeout": kwargs.get("timeout", 120.0)})
+    return manager.get_openai(provider, kwargs)
+
+
+async def _openai_chat_completion(
+    client, messages: List[dict], model: str,
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto", provider: str = "openai",
+) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+    """Shared chat.completions call for OpenAI-compatible clients."""
+    create_kw = _openai_create_kw(model, tools, tool_choice)
+    resp = await client.chat.completions.create(model=model, messages=messages, **create_kw)
+    _record_openai_usage(provider, getattr(resp, "usage", None))
     msg = resp.choices[0].message
     content = (msg.content or "").strip() or None
     parsed = _parse_openai_tool_calls(msg)
     if parsed:
         return (content, parsed)
-    return (content if content else None, None)
+    return (content, None)
 
 
-async def _reply_groq(
-    messages: List[dict], model: str, kwargs: dict,
-    tools: Optional[List[dict]] = None, tool_choice: str = "auto",
+async def _openai_chat_completion_stream(
+    client, messages: List[dict], model: str, on_delta: DeltaCallback,
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
+    provider: str = "openai", include_usage: bool = False,
 ) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
-    """Groq: OpenAI-compatible API; supports tools like OpenAI."""
-    from openai import AsyncOpenAI
-
-    client = AsyncOpenAI(api_key=kwargs["api_key"], base_url=kwargs["base_url"])
-    create_kw: dict = {}
-    if _needs_max_completion_tokens(model):
-        create_kw["max_completion_tokens"] = 1024
-    else:
-        create_kw["max_tokens"] = 1024
-    if tools:
-        create_kw["tools"] = tools
-        create_kw["tool_choice"] = tool_choice
-    resp = await client.chat.completions.create(model=model, messages=messages, **create_kw)
-    msg = resp.choices[0].message
-    content = (msg.content or "").strip() or None
-    parsed = _parse_openai_tool_calls(msg)
+    """
+    Streaming chat.completions: text deltas go to on_delta; tool_call deltas are accumulated by index
+    and parsed when the stream ends. Returns the same (content, tool_calls) as the non-streaming call.
+    include_usage asks for the final usage chunk (OpenAI API; not every compatible server accepts it).
+    """
+    create_kw = _openai_create_kw(model, tools, tool_choice)
+    if include_usage:
+        create_kw["stream_options"] = {"include_usage": True}
+    stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **create_kw)
+    text_parts: List[str] = []
+    calls: Dict[int, dict] = {}
+    async for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            _record_openai_usage(provider, chunk.usage)
+        if not getattr(chunk, "choices", None):
+            continue
+        delta = chunk.choices[0].delta
+        if delta is None:
+            continue
+        if delta.content:
+            text_parts.append(delta.content)
+            await on_delta(delta.content)
+        for tc in getattr(delta, "tool_calls", None) or []:
+            slot = calls.setdefault(tc.index or 0, {"id": "", "name": "", "arguments": ""})
+            if tc.id:
+                slot["id"] = tc.id
+            fn = getattr(tc, "function", None)
+            if fn is not None:
+                slot["name"] += fn.name or ""
+                slot["arguments"] += fn.arguments or ""
+    content = "".join(text_parts).strip() or None
+    parsed = []
+    for idx in sorted(calls):
+        slot = calls[idx]
+        try:
+            args = json.loads(slot["arguments"]) if slot["arguments"] else {}
+        except json.JSONDecodeError:
+            args = {}
+        parsed.append(ToolCall(id=slot["id"], name=slot["name"], arguments=args))
     if parsed:
         return (content, parsed)
     return (content, None)
 
 
+async def _reply_openai(
+    messages: List[dict], model: str, kwargs: dict,
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
+) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+    """
+    OpenAI (and perplexity, xai, deepseek, custom): pooled client keyed by api_key/base_url,
+    so DB/config hot-swap still uses current settings. With tools: returns (content, tool_calls or None).
+    """
+    client = _openai_compatible_client("openai", kwargs)
+    return await _openai_chat_completion(
+        client, messages, model, tools=tools, tool_choice=tool_choice, provider="openai",
+    )
+
+
+async def _reply_groq(
+    messages: List[dict], model: str, kwargs: dict,
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
+) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+    """Groq: OpenAI-compatible API; supports tools like OpenAI."""
+    client = _openai_compatible_client("groq", kwargs)
+    return await _openai_chat_completion(
+        client, messages, model, tools=tools, tool_choice=tool_choice, provider="groq",
+    )
+
+
 async def _reply_openrouter(
     messages: List[dict], model: str, kwargs: dict,
-    tools: Optional[List[dict]] = None, tool_choice: str = "auto",
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
 ) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
     """OpenRouter: OpenAI-compatible API; supports tools like OpenAI."""
-    from openai import AsyncOpenAI
-
-    timeout = kwargs.get("timeout", 120.0)
-    client = AsyncOpenAI(
-        api_key=kwargs["api_key"], base_url=kwargs["base_url"], timeout=timeout,
+    client = _openai_compatible_client("openrouter", kwargs)
+    return await _openai_chat_completion(
+        client, messages, model, tools=tools, tool_choice=tool_choice, provider="openrouter",
     )
-    create_kw: dict = {}
-    if _needs_max_completion_tokens(model):
-        create_kw["max_completion_tokens"] = 1024
-    else:
-        create_kw["max_tokens"] = 1024
-    if tools:
-        create_kw["tools"] = tools
-        create_kw["tool_choice"] = tool_choice
-    resp = await client.chat.completions.create(model=model, messages=messages, **create_kw)
-    msg = resp.choices[0].message
-    content = (msg.content or "").strip() or None
-    parsed = _parse_openai_tool_calls(msg)
-    if parsed:
-        return (content, parsed)
-    return (content, None)
 
 
 async def _reply_ollama(
     messages: List[dict], model: str, kwargs: dict,
-    tools: Optional[List[dict]] = None, tool_choice: str = "auto",
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
 ) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
     """Ollama: OpenAI-compatible; supports tools when provided."""
-    from openai import AsyncOpenAI
-
-    client = AsyncOpenAI(api_key=kwargs["api_key"], base_url=kwargs["base_url"])
-    create_kw: dict = {}
-    if _needs_max_completion_tokens(model):
-        create_kw["max_completion_tokens"] = 1024
-    else:
-        create_kw["max_tokens"] = 1024
-    if tools:
-        create_kw["tools"] = tools
-        create_kw["tool_choice"] = tool_choice
-    resp = await client.chat.completions.create(model=model, messages=messages, **create_kw)
-    msg = resp.choices[0].message
-    content = (msg.content or "").strip() or None
-    parsed = _parse_openai_tool_calls(msg)
-    if parsed:
-        return (content, parsed)
-    return (content, None)
+    client = _openai_compatible_client("ollama", kwargs)
+    return await _openai_chat_completion(
+        client, messages, model, tools=tools, tool_choice=tool_choice, provider="ollama",
+    )
 
 
 async def _reply_azure(
     messages: List[dict], model: str, kwargs: dict,
-    tools: Optional[List[dict]] = None, tool_choice: str = "auto",
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
 ) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
     """Azure OpenAI: OpenAI-compatible; supports tools like OpenAI."""
-    from openai import AsyncAzureOpenAI
-
-    endpoint = kwargs.get("azure_endpoint") or (kwargs.get("base_url") or "").rstrip("/")
-    version = kwargs.get("api_version") or "2024-02-15-preview"
-    client = AsyncAzureOpenAI(
-        api_key=kwargs.get("api_key") or "",
-        azure_endpoint=endpoint,
-        api_version=version,
+    client = _openai_compatible_client("azure", kwargs)
+    return await _openai_chat_completion(
+        client, messages, model, tools=tools, tool_choice=tool_choice, provider="azure",
     )
-    create_kw: dict = {}
-    if _needs_max_completion_tokens(model):
-        create_kw["max_completion_tokens"] = 1024
-    else:
-        create_kw["max_tokens"] = 1024
-    if tools:
-        create_kw["tools"] = tools
-        create_kw["tool_choice"] = tool_choice
-    resp = await client.chat.completions.create(model=model, messages=messages, **create_kw)
-    msg = resp.choices[0].message
-    content = (msg.content or "").strip() or None
-    parsed = _parse_openai_tool_calls(msg)
-    if parsed:
-        return (content, parsed)
-    return (content, None)
+
+
+def _is_openai_api(provider: str, kwargs: dict) -> bool:
+    """True for api.openai.com itself (supports stream_options), not for other compatible servers."""
+    base_url = (kwargs.get("base_url") or "").strip()
+    return provider == "openai" and (not base_url or "api.openai.com" in base_url)
+
+
+def _openai_stream_handler(client_provider: str):
+    """Build streaming handler for an OpenAI-compatible provider (same client pool as _reply_*)."""
+    async def _stream(
+        messages: List[dict], model: str, kwargs: dict, on_delta: DeltaCallback,
+        tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
+    ) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+        client = _openai_compatible_client(client_provider, kwargs)
+        return await _openai_chat_completion_stream(
+            client, messages, model, on_delta, tools=tools, tool_choice=tool_choice,
+            provider=client_provider, include_usage=_is_openai_api(client_provider, kwargs),
+        )
+    return _stream
 
 
 def _parse_anthropic_tool_calls(content_blocks) -> List[ToolCall]:
@@ -269,36 +388,52 @@ def _parse_anthropic_tool_calls(content_blocks) -> List[ToolCall]:
     return result
 
 
-async def _reply_anthropic(
-    messages: List[dict], model: str, kwargs: dict,
-    tools: Optional[List[dict]] = None, tool_choice: str = "auto",
-) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+def _anthropic_create_kw(
+    messages: List[dict], model: str,
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
+) -> dict:
     """
-    Anthropic Claude: uses max_tokens. With tools, passes tools in request and parses tool_use blocks.
+    messages.create kwargs: system blocks split out, OpenAI-style tools converted to input_schema.
+    With PROMPT_CACHE_ENABLED, cache_control breakpoints go on the last tool (tool schemas), the first
+    system block (stable prompt; per-chat blocks like the summary follow it) and the last message
+    (conversation prefix reused by the next tool-calling iteration).
     """
-    import anthropic
-
-    client = anthropic.AsyncAnthropic(api_key=kwargs["api_key"])
-    system = next((m["content"] for m in messages if m.get("role") == "system"), "") or ""
+    system_blocks = [
+        {"type": "text", "text": m["content"]}
+        for m in messages
+        if m.get("role") == "system" and m.get("content")
+    ]
     msgs = [
         {"role": "user" if m["role"] == "user" else "assistant", "content": m["content"]}
         for m in messages
         if m.get("role") != "system"
     ]
-    create_kw: dict = {"model": model, "max_tokens": 1024, "system": system, "messages": msgs}
+    if PROMPT_CACHE_ENABLED:
+        if system_blocks:
+            system_blocks[0]["cache_control"] = _CACHE_CONTROL
+        if msgs and isinstance(msgs[-1]["content"], str) and msgs[-1]["content"]:
+            msgs[-1] = {
+                "role": msgs[-1]["role"],
+                "content": [{"type": "text", "text": msgs[-1]["content"], "cache_control": _CACHE_CONTROL}],
+            }
+    create_kw: dict = {"model": model, "max_tokens": MAX_COMPLETION_TOKENS, "system": system_blocks, "messages": msgs}
     if tools:
-        # Anthropic format: list of {"name", "description", "input_schema"}
-        anthropic_tools = []
-        for t in tools:
-            fn = t.get("function") or {}
-            anthropic_tools.append({
-                "name": fn.get("name", ""),
-                "description": fn.get("description") or "",
-                "input_schema": fn.get("parameters") or {"type": "object", "properties": {}},
-            })
+        # Anthropic format (converted once per registry version): {"name", "description", "input_schema"}
+        anthropic_tools = list(tools.anthropic())
+        if PROMPT_CACHE_ENABLED and anthropic_tools:
+            anthropic_tools[-1] = {**anthropic_tools[-1], "cache_control": _CACHE_CONTROL}
         create_kw["tools"] = anthropic_tools
         create_kw["tool_choice"] = "auto" if tool_choice == "auto" else tool_choice
-    resp = await client.messages.create(**create_kw)
+    return create_kw
+
+
+def _anthropic_result(resp) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+    """Extract (text, tool_calls) from an Anthropic Message; records prompt-cache usage."""
+    usage = getattr(resp, "usage", None)
+    if usage is not None:
+        read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        written = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        _record_usage("anthropic", (getattr(usage, "input_tokens", 0) or 0) + read + written, read, written)
     text_part = ""
     for block in (resp.content or []):
         if getattr(block, "type", None) == "text":
@@ -310,6 +445,32 @@ async def _reply_anthropic(
     return (content, None)
 
 
+async def _reply_anthropic(
+    messages: List[dict], model: str, kwargs: dict,
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
+) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+    """
+    Anthropic Claude: uses max_tokens. With tools, passes tools in request and parses tool_use blocks.
+    """
+    client = get_client_manager().get_anthropic(kwargs)
+    resp = await client.messages.create(**_anthropic_create_kw(messages, model, tools, tool_choice))
+    return _anthropic_result(resp)
+
+
+async def _stream_anthropic(
+    messages: List[dict], model: str, kwargs: dict, on_delta: DeltaCallback,
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
+) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+    """Anthropic streaming: text deltas to on_delta; tool_use blocks taken from the final message."""
+    client = get_client_manager().get_anthropic(kwargs)
+    async with client.messages.stream(**_anthropic_create_kw(messages, model, tools, tool_choice)) as stream:
+        async for text in stream.text_stream:
+            if text:
+                await on_delta(text)
+        resp = await stream.get_final_message()
+    return _anthropic_result(resp)
+
+
 def _parse_google_tool_calls(candidates) -> List[ToolCall]:
     """Parse Gemini response candidates for function_call parts into List[ToolCall]."""
     result = []
@@ -332,33 +493,22 @@ def _parse_google_tool_calls(candidates) -> List[ToolCall]:
     return result
 
 
-async def _reply_google(
-    messages: List[dict], model: str, kwargs: dict,
-    tools: Optional[List[dict]] = None, tool_choice: str = "auto",
-) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
-    """
-    Google Gemini: uses max_output_tokens. With tools, uses generate_content with tools and parses function_call.
-    """
+def _google_model_and_prompt(
+    messages: List[dict], model: str, kwargs: dict, tools: Optional[ToolSchemaSet] = None,
+):
+    """Configure genai, build GenerativeModel (with function declarations if tools) and flat prompt."""
     import google.generativeai as genai
 
     genai.configure(api_key=kwargs["api_key"])
-    config = {"max_output_tokens": 1024}
+    config = {"max_output_tokens": MAX_COMPLETION_TOKENS}
     if tools:
-        # Convert OpenAI-style tools to Gemini function declarations
-        from google.generativeai.types import Tool, FunctionDeclaration
-        declarations = []
-        for t in tools:
-            fn = t.get("function") or {}
-            name = fn.get("name", "")
-            desc = fn.get("description") or ""
-            params = fn.get("parameters") or {}
-            declarations.append(FunctionDeclaration(name=name, description=desc, parameters=params))
-        tool = Tool(function_declarations=declarations)
+        # Gemini function declarations (converted once per registry version)
+        tool = tools.google()
         # Gemini 2.x generate_content with tools returns response with function_call in parts
         model_obj = genai.GenerativeModel(model, generation_config=config, tools=[tool])
     else:
         model_obj = genai.GenerativeModel(model, generation_config=config)
-    system = next((m["content"] for m in messages if m.get("role") == "system"), None)
+    system = _joined_system(messages)
     parts = []
     if system:
         parts.append(system)
@@ -367,8 +517,31 @@ async def _reply_google(
             continue
         parts.append(f"{m['role']}: {m['content']}")
     parts.append("assistant:")
-    prompt = "\n\n".join(parts)
+    return model_obj, "\n\n".join(parts)
+
+
+def _record_google_usage(resp) -> None:
+    """Gemini usage_metadata: cached_content_token_count is the implicit/explicit cache hit."""
+    meta = getattr(resp, "usage_metadata", None)
+    if meta is None:
+        return
+    _record_usage(
+        "google",
+        getattr(meta, "prompt_token_count", 0) or 0,
+        getattr(meta, "cached_content_token_count", 0) or 0,
+    )
+
+
+async def _reply_google(
+    messages: List[dict], model: str, kwargs: dict,
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
+) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+    """
+    Google Gemini: uses max_output_tokens. With tools, uses generate_content with tools and parses function_call.
+    """
+    model_obj, prompt = _google_model_and_prompt(messages, model, kwargs, tools)
     resp = await model_obj.generate_content_async(prompt)
+    _record_google_usage(resp)
     text_part = (resp.text or "").strip() or None
     tool_calls = _parse_google_tool_calls(getattr(resp, "candidates", None))
     if tool_calls:
@@ -376,16 +549,45 @@ async def _reply_google(
     return (text_part, None)
 
 
+async def _stream_google(
+    messages: List[dict], model: str, kwargs: dict, on_delta: DeltaCallback,
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
+) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
+    """Gemini streaming (stream=True): text parts to on_delta, function_call parts collected per chunk."""
+    model_obj, prompt = _google_model_and_prompt(messages, model, kwargs, tools)
+    resp = await model_obj.generate_content_async(prompt, stream=True)
+    text_parts: List[str] = []
+    tool_calls: List[ToolCall] = []
+    usage_chunk = None
+    async for chunk in resp:
+        if getattr(chunk, "usage_metadata", None) is not None:
+            usage_chunk = chunk
+        candidates = getattr(chunk, "candidates", None)
+        for cand in candidates or []:
+            content = getattr(cand, "content", None)
+            for part in getattr(content, "parts", []) or []:
+                text = getattr(part, "text", None)
+                if text:
+                    text_parts.append(text)
+                    await on_delta(text)
+        for tc in _parse_google_tool_calls(candidates):
+            tool_calls.append(ToolCall(id=f"gc_{tc.name}_{len(tool_calls)}", name=tc.name, arguments=tc.arguments))
+    if usage_chunk is not None:
+        _record_google_usage(usage_chunk)
+    content = "".join(text_parts).strip() or None
+    if tool_calls:
+        return (content, tool_calls)
+    return (content, None)
+
+
 async def _reply_yandex(
     messages: List[dict], model: str, kwargs: dict,
-    tools: Optional[List[dict]] = None, tool_choice: str = "auto",
+    tools: Optional[ToolSchemaSet] = None, tool_choice: str = "auto",
 ) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
     """
     Yandex GPT: uses maxTokens in completionOptions (not max_tokens).
     POST .../completion with modelUri (gpt://folder_id/model/latest). Folder from YANDEX_FOLDER_ID.
     """
-    import httpx
-
     base = (kwargs.get("base_url") or "").strip().rstrip("/")
     api_key = (kwargs.get("api_key") or "").strip()
     if not base or not api_key:
@@ -410,14 +612,14 @@ async def _reply_yandex(
     payload = {
         "modelUri": model_uri,
         "messages": yandex_messages,
-        "completionOptions": {"maxTokens": 1024},
+        "completionOptions": {"maxTokens": MAX_COMPLETION_TOKENS},
     }
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        r = await client.post(
-            f"{base}/completion",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json=payload,
-        )
+    client = get_client_manager().get_http("yandex", base, api_key, timeout=30.0)
+    r = await client.post(
+        f"{base}/completion",
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        json=payload,
+    )
     if r.status_code != 200:
         try:
             err = r.json()
@@ -449,36 +651,61 @@ _HANDLERS: Dict[str, object] = {
     "custom": _reply_openai,
 }
 
+# Streaming handlers (same signature plus on_delta). Providers missing here (yandex) fall back to
+# the non-streaming handler and deliver the whole answer as a single delta.
+_STREAM_HANDLERS: Dict[str, object] = {
+    "openai": _openai_stream_handler("openai"),
+    "groq": _openai_stream_handler("groq"),
+    "openrouter": _openai_stream_handler("openrouter"),
+    "ollama": _openai_stream_handler("ollama"),
+    "azure": _openai_stream_handler("azure"),
+    "anthropic": _stream_anthropic,
+    "google": _stream_google,
+    "perplexity": _openai_stream_handler("openai"),
+    "xai": _openai_stream_handler("openai"),
+    "deepseek": _openai_stream_handler("openai"),
+    "custom": _openai_stream_handler("openai"),
+}
+
 
 async def get_reply(
     messages: List[dict],
-    tools: Optional[List[dict]] = None,
+    tools: Optional[Union[ToolSchemaSet, List[dict]]] = None,
     tool_choice: str = "auto",
+    on_delta: Optional[DeltaCallback] = None,
 ) -> Tuple[Optional[str], Optional[List[ToolCall]]]:
     """
     Use active LLM from settings DB if present, else from config (.env).
     Returns (content, tool_calls). When tools=None, always (content, None). When tools provided,
     returns (content, None) for text reply or (None, tool_calls) when LLM requested tool use.
+    tools: registry snapshot (ToolRegistry.get_tool_schemas) or a list in OpenAI format.
+    on_delta: if set, the response is streamed and each text delta is awaited with on_delta(text);
+    the return value is the same as without streaming.
     """
     from_db = _get_llm_from_settings_db()
     if from_db:
         provider, model, kwargs, system_prompt = from_db
-        if system_prompt:
-            new_messages = [{"role": "system", "content": system_prompt}]
-            for m in messages:
-                if m.get("role") != "system":
-                    new_messages.append(m)
-            messages = new_messages
     else:
         provider, model, kwargs = get_active_llm()
+        system_prompt = None
+    messages = _order_system_messages(messages, system_prompt)
+    tools = as_schema_set(tools)
     logger.info(
-        "LLM request provider=%s model=%s messages=%d tools=%s",
-        provider, model, len(messages), bool(tools),
+        "LLM request provider=%s model=%s messages=%d tools=%s stream=%s",
+        provider, model, len(messages), bool(tools), on_delta is not None,
     )
     handler = _HANDLERS.get(provider)
     if not handler:
         raise ValueError(f"Unknown LLM provider: {provider}")
-    content, tool_calls = await handler(messages, model, kwargs, tools=tools, tool_choice=tool_choice)
+    stream_handler = _STREAM_HANDLERS.get(provider) if on_delta is not None else None
+    if stream_handler:
+        content, tool_calls = await stream_handler(
+            messages, model, kwargs, on_delta, tools=tools, tool_choice=tool_choice,
+        )
+    else:
+        content, tool_calls = await handler(messages, model, kwargs, tools=tools, tool_choice=tool_choice)
+        if on_delta is not None and content:
+            await on_delta(content)
     if content:
         logger.info("LLM response len=%d", len(content))
         logger.debug("LLM response preview=%s", (content[:150] + "..." if len(content) > 150 else content))
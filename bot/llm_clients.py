@@ -0,0 +1,241 @@
+"""
+Pooled, long-lived LLM clients: one client per (provider, base_url, api_key hash, timeout).
+Reuses TCP/TLS connections (keep-alive, HTTP/2 when h2 is installed) across messages and tool-calling iterations.
+Hot-swap: a new api_key/base_url from settings gives a new key; stale clients of that provider are retired
+and closed only after a grace period (their request timeout), so calls and streams still running on them finish.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Connection pool per client
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 60.0
+CONNECT_TIMEOUT = 10.0
+# SDK default (openai/anthropic) when provider kwargs have no timeout
+DEFAULT_TIMEOUT = 600.0
+
+ClientKey = Tuple[str, str, str, Optional[float], str]
+
+
+def _api_key_hash(api_key: Optional[str]) -> str:
+    """Short hash of api_key: keys differ on key rotation without storing the secret in the key."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _make_key(
+    provider: str,
+    base_url: Optional[str],
+    api_key: Optional[str],
+    timeout: Optional[float],
+    extra: str = "",
+) -> ClientKey:
+    return (
+        provider,
+        (base_url or "").strip().rstrip("/"),
+        _api_key_hash(api_key),
+        float(timeout) if timeout is not None else None,
+        extra,
+    )
+
+
+def _build_http_client(timeout: Optional[float]) -> httpx.AsyncClient:
+    """httpx.AsyncClient with keep-alive pool and HTTP/2 (if h2 is available)."""
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(timeout if timeout is not None else DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        follow_redirects=True,
+    )
+
+
+class LLMClientManager:
+    """
+    Cache of SDK clients (AsyncOpenAI, AsyncAzureOpenAI, AsyncAnthropic) and raw httpx clients.
+    Clients are bound to the event loop they were created in; a new loop (e.g. bot restart) drops the cache.
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[ClientKey, Any] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Background close tasks of retired clients -> client
+        self._closing: Dict[asyncio.Task, Any] = {}
+
+    def _check_loop(self) -> None:
+        """Drop clients created in another (closed) event loop — their connections cannot be reused."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is not loop:
+            if self._clients:
+                logger.debug("Event loop changed, dropping %d LLM clients", len(self._clients))
+            self._clients.clear()
+            self._loop = loop
+
+    def _get_or_create(self, key: ClientKey, factory) -> Any:
+        self._check_loop()
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        # Settings for this provider changed (hot-swap): close clients built with old settings
+        self.invalidate(provider=key[0])
+        client = factory()
+        self._clients[key] = client
+        logger.info("LLM client created provider=%s base_url=%s http2=%s", key[0], key[1] or "-", HTTP2_AVAILABLE)
+        return client
+
+    def get_openai(self, provider: str, kwargs: dict) -> Any:
+        """AsyncOpenAI for OpenAI-compatible providers (openai, groq, openrouter, ollama, deepseek, ...)."""
+        from openai import AsyncOpenAI
+
+        base_url = kwargs.get("base_url") or None
+        api_key = kwargs.get("api_key") or ""
+        timeout = kwargs.get("timeout")
+        key = _make_key(provider, base_url, api_key, timeout)
+
+        def factory():
+            client_kw: dict = {"api_key": api_key, "http_client": _build_http_client(timeout)}
+            if base_url:
+                client_kw["base_url"] = base_url
+            if timeout is not None:
+                client_kw["timeout"] = float(timeout)
+            return AsyncOpenAI(**client_kw)
+
+        return self._get_or_create(key, factory)
+
+    def get_azure(self, kwargs: dict) -> Any:
+        """AsyncAzureOpenAI; api_version is part of the key."""
+        from openai import AsyncAzureOpenAI
+
+        endpoint = kwargs.get("azure_endpoint") or (kwargs.get("base_url") or "").rstrip("/")
+        version = kwargs.get("api_version") or "2024-02-15-preview"
+        api_key = kwargs.get("api_key") or ""
+        timeout = kwargs.get("timeout")
+        key = _make_key("azure", endpoint, api_key, timeout, extra=version)
+
+        def factory():
+            return AsyncAzureOpenAI(
+                api_key=api_key,
+                azure_endpoint=endpoint,
+                api_version=version,
+                http_client=_build_http_client(timeout),
+            )
+
+        return self._get_or_create(key, factory)
+
+    def get_anthropic(self, kwargs: dict) -> Any:
+        """AsyncAnthropic with pooled http client."""
+        import anthropic
+
+        api_key = kwargs.get("api_key") or ""
+        timeout = kwargs.get("timeout")
+        key = _make_key("anthropic", kwargs.get("base_url"), api_key, timeout)
+
+        def factory():
+            return anthropic.AsyncAnthropic(api_key=api_key, http_client=_build_http_client(timeout))
+
+        return self._get_or_create(key, factory)
+
+    def get_http(self, provider: str, base_url: Optional[str], api_key: Optional[str], timeout: float) -> httpx.AsyncClient:
+        """Raw httpx.AsyncClient for providers without SDK (yandex)."""
+        key = _make_key(provider, base_url, api_key, timeout, extra="http")
+        return self._get_or_create(key, lambda: _build_http_client(timeout))
+
+    def invalidate(self, provider: Optional[str] = None) -> None:
+        """
+        Drop cached clients (all or one provider). New calls get new clients; the dropped ones are closed in the
+        background once calls already running on them are over (after their request timeout).
+        """
+        keys = [k for k in self._clients if provider is None or k[0] == provider]
+        for k in keys:
+            grace = k[3] if k[3] is not None else DEFAULT_TIMEOUT
+            self._schedule_close(self._clients.pop(k), grace)
+
+    def _schedule_close(self, client: Any, delay: float = 0.0) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if loop is not self._loop:
+            return
+        task = loop.create_task(_close_client_later(client, delay))
+        self._closing[task] = client
+        task.add_done_callback(lambda t: self._closing.pop(t, None))
+
+    async def aclose(self) -> None:
+        """Close all clients (bot shutdown)."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        same_loop = True
+        try:
+            same_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            pass
+        if same_loop:
+            for client in clients:
+                await _close_client(client)
+            if self._closing:
+                # Shutdown: retired clients are closed now instead of after their grace period
+                retired, self._closing = self._closing, {}
+                for task in retired:
+                    task.cancel()
+                await asyncio.gather(*retired, return_exceptions=True)
+                for client in retired.values():
+                    await _close_client(client)
+        logger.debug("Closed %d LLM clients", len(clients))
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+async def _close_client(client: Any) -> None:
+    """Close SDK client (close()) or httpx client (aclose())."""
+    try:
+        if isinstance(client, httpx.AsyncClient):
+            await client.aclose()
+        else:
+            await client.close()
+    except Exception as e:
+        logger.debug("Close LLM client: %s", e)
+
+
+async def _close_client_later(client: Any, delay: float) -> None:
+    """Close client after delay (the manager closes it itself if this task is cancelled on shutdown)."""
+    await asyncio.sleep(delay)
+    await _close_client(client)
+
+
+_manager: Optional[LLMClientManager] = None
+
+
+def get_client_manager() -> LLMClientManager:
+    """Get global client manager instance."""
+    global _manager
+    if _manager is None:
+        _manager = LLMClientManager()
+    return _manager
+
+
+def invalidate_llm_clients(provider: Optional[str] = None) -> None:
+    """Drop cached clients, e.g. after LLM settings changed."""
+    get_client_manager().invalidate(provider=provider)
+
+
+async def close_llm_clients() -> None:
+    """Close all pooled clients. Call on shutdown."""
+    if _manager is not None:
+        await _manager.aclose()
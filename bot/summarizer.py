@@ -0,0 +1,134 @@
+"""
+Incremental conversation summarization, off the hot path.
+After a reply is sent, a background task checks whether the chat history has grown beyond the verbatim
+window (SUMMARY_KEEP_TOKENS); older turns are condensed together with the previous summary into a new
+rolling summary, stored next to the history (bot.history_store) and removed from it. The prompt then has
+constant size: system + summary + recent turns.
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+from bot.context_window import CONTEXT_MAX_TOKENS, fit_history
+from bot.history_store import ChatHistoryStore, get_history_store
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+# Recent history kept verbatim (tokens); older turns are summarized
+SUMMARY_KEEP_TOKENS = int(os.getenv("SUMMARY_KEEP_TOKENS", str(CONTEXT_MAX_TOKENS // 2)))
+# Summarize only when at least this many messages fell out of the verbatim window (batches LLM calls)
+SUMMARY_MIN_MESSAGES = int(os.getenv("SUMMARY_MIN_MESSAGES", "6"))
+# Hard cap on summary length (chars)
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "3000"))
+
+SUMMARY_PROMPT = (
+    "Ты сжимаешь историю переписки пользователя с ассистентом. "
+    "Объедини прежнее краткое содержание и новые сообщения в одно обновлённое краткое содержание: "
+    "факты о пользователе, его задачи, принятые решения, важные данные (имена, числа, ссылки) и открытые вопросы. "
+    "Пиши сжато, на языке диалога, без вступлений, не длиннее {max_chars} символов."
+)
+
+
+def _format_turns(messages: List[dict]) -> str:
+    lines = []
+    for m in messages:
+        who = "Пользователь" if m.get("role") == "user" else "Ассистент"
+        lines.append(f"{who}: {m.get('content') or ''}")
+    return "\n".join(lines)
+
+
+class ConversationSummarizer:
+    """Schedules at most one summarization task per chat; tasks never block replies."""
+
+    def __init__(
+        self,
+        store: Optional[ChatHistoryStore] = None,
+        keep_tokens: int = SUMMARY_KEEP_TOKENS,
+        min_messages: int = SUMMARY_MIN_MESSAGES,
+        max_chars: int = SUMMARY_MAX_CHARS,
+    ) -> None:
+        self._store = store
+        self._keep_tokens = keep_tokens
+        self._min_messages = max(2, min_messages)
+        self._max_chars = max_chars
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    @property
+    def store(self) -> ChatHistoryStore:
+        return self._store if self._store is not None else get_history_store()
+
+    def schedule(self, chat_id: int, provider: str = "") -> Optional[asyncio.Task]:
+        """Start background summarization for chat_id unless one is already running."""
+        running = self._tasks.get(chat_id)
+        if running is not None and not running.done():
+            return None
+        task = asyncio.get_running_loop().create_task(self._run(chat_id, provider))
+        self._tasks[chat_id] = task
+        task.add_done_callback(lambda t, c=chat_id: self._tasks.pop(c, None) if self._tasks.get(c) is t else None)
+        return task
+
+    async def _run(self, chat_id: int, provider: str) -> None:
+        try:
+            await self.summarize(chat_id, provider)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("summarize chat_id=%s failed: %s", chat_id, e)
+
+    async def summarize(self, chat_id: int, provider: str = "") -> bool:
+        """Condense turns older than the verbatim window into the rolling summary. True if compacted."""
+        store = self.store
+        history = await store.get(chat_id)
+        # Window never exceeds half of the store cap, so the cap does not drop turns before they are summarized
+        recent, _ = fit_history(history[-(store.max_messages // 2):], self._keep_tokens, provider)
+        old = history[: len(history) - len(recent)]
+        if len(old) < self._min_messages:
+            return False
+        previous = await store.get_summary(chat_id)
+        summary = await self._condense(previous, old)
+        if not summary:
+            return False
+        await store.compact(chat_id, summary[: self._max_chars], old)
+        logger.info(
+            "summarized chat_id=%s messages=%d summary_len=%d", chat_id, len(old), len(summary),
+        )
+        return True
+
+    async def _condense(self, previous: str, messages: List[dict]) -> str:
+        from bot.llm import get_reply
+
+        # Instructions go in the user message: a system prompt from settings DB replaces ours in get_reply
+        parts = [SUMMARY_PROMPT.format(max_chars=self._max_chars)]
+        if previous:
+            parts.append(f"Прежнее краткое содержание:\n{previous}")
+        parts.append(f"Новые сообщения:\n{_format_turns(messages)}")
+        content, _ = await get_reply([{"role": "user", "content": "\n\n".join(parts)}])
+        return (content or "").strip()
+
+    async def close(self) -> None:
+        """Cancel running summarizations (shutdown); history stays intact and is summarized next time."""
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_summarizer: Optional[ConversationSummarizer] = None
+
+
+def get_summarizer() -> ConversationSummarizer:
+    """Get global summarizer instance."""
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = ConversationSummarizer()
+    return _summarizer
+
+
+async def close_summarizer() -> None:
+    """Cancel pending summarizations. Call on shutdown."""
+    if _summarizer is not None:
+        await _summarizer.close()
@@ -3,9 +3,8 @@ import asyncio
 import logging
 import os
 import tempfile
-from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List
+from typing import List
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +12,12 @@ logger = logging.getLogger(__name__)
 HR_IMPORT_MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 
 ENABLE_TOOL_CALLING = os.getenv("ENABLE_TOOL_CALLING", "").strip().lower() in ("1", "true", "yes")
+# Stream LLM answers: placeholder message + progressive edits (bot/telegram_stream.py)
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "").strip().lower() in ("1", "true", "yes")
+# Updates of different chats processed concurrently (1 = sequential); one chat is always in order
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "8"))
+# Max updates of one chat running or waiting; further messages of a burst are dropped
+CHAT_QUEUE_LIMIT = int(os.getenv("CHAT_QUEUE_LIMIT", "3"))
 
 
 def _llm_error_message(exc: Exception) -> str:
@@ -68,17 +73,19 @@ from telegram import Update
 from telegram.error import Conflict
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 
+from bot.answer_cache import answer_ttl_for_tools, get_answer_cache
 from bot.config import BOT_TOKEN, validate_config
-from bot.llm import get_reply
-from bot.tool_calling import get_reply_with_tools, get_system_prompt_for_tools
-from tools import execute_tool, load_all_plugins
+from bot.context_window import build_context, count_tools_tokens
+from bot.llm import get_active_provider, get_reply
+from bot.history_store import close_history_store, get_history_store
+from bot.llm_clients import close_llm_clients
+from bot.summarizer import SUMMARY_ENABLED, close_summarizer, get_summarizer
+from bot.telegram_stream import StreamingReply
+from bot.update_processor import PerChatUpdateProcessor
+from bot.tool_calling import ToolLoopOutcome, get_reply_with_tools, get_system_prompt_for_tools
+from tools import execute_tool, get_registry, load_all_plugins
 from tools.models import ToolCall as ToolsToolCall
-
-# Per-chat conversation history for LLM context (last N messages)
-MAX_HISTORY_MESSAGES = 20
-# Cap total chats to avoid unbounded memory growth
-MAX_CHATS_IN_MEMORY = 500
-_chat_history: Dict[int, List[dict]] = defaultdict(list)
+from tools.process_pool import shutdown_tool_process_pool
 
 SYSTEM_PROMPT = (
     "Ты дружелюбный помощник в чате Telegram. "
@@ -86,28 +93,26 @@ SYSTEM_PROMPT = (
 )
 
 
-def _get_messages(chat_id: int, user_text: str, use_tools: bool = False) -> List[dict]:
-    """Build message list for API: system + history + new user message."""
-    history = _chat_history[chat_id]
+async def _get_messages(chat_id: int, user_text: str, use_tools: bool = False) -> List[dict]:
+    """Build message list for API: system + summary + history fitted to the token budget + new user message."""
+    store = get_history_store()
+    history = await store.get(chat_id)
+    summary = await store.get_summary(chat_id)
     system = get_system_prompt_for_tools() if use_tools else SYSTEM_PROMPT
-    messages = [{"role": "system", "content": system}]
-    messages.extend(history)
-    messages.append({"role": "user", "content": user_text})
-    return messages
-
-
-def _append_to_history(chat_id: int, user_content: str, assistant_content: str) -> None:
-    """Keep last MAX_HISTORY_MESSAGES in history. Evict oldest chat if over MAX_CHATS_IN_MEMORY."""
-    if len(_chat_history) >= MAX_CHATS_IN_MEMORY and chat_id not in _chat_history:
-        # Remove one of the oldest (smallest history) chats to make room
-        oldest_key = min(_chat_history.keys(), key=lambda k: len(_chat_history[k]))
-        del _chat_history[oldest_key]
-        logger.debug("evicted chat_id=%s from history (max %d chats)", oldest_key, MAX_CHATS_IN_MEMORY)
-    history = _chat_history[chat_id]
-    history.append({"role": "user", "content": user_content})
-    history.append({"role": "assistant", "content": assistant_content})
-    if len(history) > MAX_HISTORY_MESSAGES:
-        _chat_history[chat_id] = history[-MAX_HISTORY_MESSAGES:]
+    provider = get_active_provider()
+    reserve = count_tools_tokens(get_registry().get_tool_schemas(), provider) if use_tools else 0
+    return build_context(system, history, user_text, provider=provider, reserve_tokens=reserve, summary=summary)
+
+
+async def _append_to_history(chat_id: int, user_content: str, assistant_content: str) -> None:
+    """Store user message and reply in the history store (bounded, persisted write-behind)."""
+    await get_history_store().append(
+        chat_id,
+        [
+            {"role": "user", "content": user_content},
+            {"role": "assistant", "content": assistant_content},
+        ],
+    )
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -153,22 +158,19 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             name="hr",
             arguments={"action": "import_employees", "file_path": tmp_path},
         )
-        result = await execute_tool(tc, telegram_id=user_id)
+        result = await execute_tool(
+            tc, telegram_id=user_id, chat_id=chat_id, request_id=f"{chat_id}:{update.update_id}",
+        )
         if result.success:
             text = result.content
             if isinstance(text, str) and text.startswith("{"):
                 import json
                 try:
                     data = json.loads(text)
-                    added = data.get("added_count", 0)
-                    names = data.get("added_names", [])
-                    errs = data.get("errors", [])
-                    msg = f"Импорт выполнен. Добавлено сотрудников: {added}."
-                    if names:
-                        msg += " Фамилии: " + ", ".join(names[:10])
-                    if errs:
-                        msg += f" Ошибки при обработке: {len(errs)}."
-                    text = msg
+                    text = (
+                        f"Импорт поставлен в очередь (задача {data['job_id'][:8]}). "
+                        "Сообщу о ходе выполнения и результате."
+                    )
                 except Exception:
                     pass
             await update.message.reply_text(text[:4000] if len(text) > 4000 else text)
@@ -195,7 +197,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not user_text:
         return
 
-    history_len = len(_chat_history[chat_id])
+    use_tools = ENABLE_TOOL_CALLING
+    messages = await _get_messages(chat_id, user_text, use_tools=use_tools)
+    history_len = len(messages) - 2
     logger.info(
         "message chat_id=%s len=%d history_messages=%d",
         chat_id,
@@ -204,8 +208,20 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     )
     logger.debug("message chat_id=%s text=%s", chat_id, user_text[:200])
 
-    use_tools = ENABLE_TOOL_CALLING
-    messages = _get_messages(chat_id, user_text, use_tools=use_tools)
+    answer_cache = get_answer_cache()
+    cache_scope = None
+    if answer_cache.enabled:
+        tools_hash = get_registry().get_tool_schemas().hash if use_tools else ""
+        cache_scope = answer_cache.scope(messages, tools_hash)
+        cached = await answer_cache.get(chat_id, cache_scope, user_text)
+        if cached:
+            await _append_to_history(chat_id, user_text, cached)
+            await update.message.reply_text(cached)
+            logger.info("reply sent from answer cache chat_id=%s reply_len=%d", chat_id, len(cached))
+            if SUMMARY_ENABLED:
+                get_summarizer().schedule(chat_id, get_active_provider())
+            return
+
     typing_task = None
     typing_stop = asyncio.Event()
 
@@ -220,22 +236,41 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             except asyncio.TimeoutError:
                 continue
 
+    stream = StreamingReply(update.message) if STREAM_REPLIES else None
+    on_delta = stream.on_delta if stream else None
+    tool_calls: List[ToolsToolCall] = []
+    outcome = ToolLoopOutcome()
     try:
         typing_task = asyncio.create_task(_typing_loop())
+        if stream:
+            await stream.start()
         if use_tools:
             try:
-                reply = await get_reply_with_tools(messages, telegram_id=user_id)
+                reply = await get_reply_with_tools(
+                    messages,
+                    telegram_id=user_id,
+                    on_delta=on_delta,
+                    chat_id=chat_id,
+                    request_id=f"{chat_id}:{update.update_id}",
+                    tool_calls_out=tool_calls,
+                    outcome=outcome,
+                )
             except Exception as e:
                 logger.warning("Tool-calling failed, falling back to plain reply: %s", e)
-                content, _ = await get_reply(messages)
+                if stream:
+                    stream.reset()
+                content, _ = await get_reply(messages, on_delta=on_delta)
                 reply = content or ""
         else:
-            content, _ = await get_reply(messages)
+            content, _ = await get_reply(messages, on_delta=on_delta)
             reply = content or ""
     except Exception as e:
         logger.exception("LLM request failed: %s", e)
         user_msg = _llm_error_message(e)
-        await update.message.reply_text(user_msg)
+        if stream:
+            await stream.finish(user_msg)
+        else:
+            await update.message.reply_text(user_msg)
         return
     finally:
         typing_stop.set()
@@ -247,13 +282,26 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 pass
 
     if reply:
-        _append_to_history(chat_id, user_text, reply)
+        await _append_to_history(chat_id, user_text, reply)
         logger.info("reply sent chat_id=%s reply_len=%d", chat_id, len(reply))
         logger.debug("reply chat_id=%s text=%s", chat_id, reply[:200])
-        await update.message.reply_text(reply)
+        if stream:
+            await stream.finish(reply)
+        else:
+            await update.message.reply_text(reply)
+        # Only real LLM answers: never the tool loop's fallback message
+        if cache_scope is not None and outcome.complete:
+            await answer_cache.put(chat_id, cache_scope, user_text, reply, ttl=answer_ttl_for_tools(tool_calls))
+        if SUMMARY_ENABLED:
+            # After the reply is out: condense turns that fell out of the verbatim window
+            get_summarizer().schedule(chat_id, get_active_provider())
     else:
         logger.warning("empty reply chat_id=%s", chat_id)
-        await update.message.reply_text("Не удалось получить ответ. Попробуй ещё раз.")
+        empty_msg = "Не удалось получить ответ. Попробуй ещё раз."
+        if stream:
+            await stream.finish(empty_msg)
+        else:
+            await update.message.reply_text(empty_msg)
 
 
 async def _error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -268,11 +316,37 @@ async def _error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) ->
         logger.exception("Update %s caused error: %s", update, exc)
 
 
-def build_application() -> Application:
-    """Create and configure the Telegram application (token from config)."""
-    logger.info("Building application, validating config")
-    validate_config()
-    app = Application.builder().token(BOT_TOKEN).build()
+async def _post_shutdown(app: Application) -> None:
+    """Stop job and summarization workers, close pooled LLM clients (keep-alive connections), flush history, stop tool workers."""
+    from api.jobs import stop_job_workers
+    await stop_job_workers()
+    await close_summarizer()
+    await close_llm_clients()
+    await close_history_store()
+    shutdown_tool_process_pool()
+
+
+async def _post_init_job_workers(app: Application) -> None:
+    """
+    Standalone bot (main.py) has no admin API process to run background jobs (HR import, Jira enrichment):
+    start the job worker pool here. Under the admin API the jobs run in the API process.
+    """
+    from api.db import init_db
+    from api.jobs import start_job_workers
+    init_db()
+    start_job_workers(get_credentials=lambda: (BOT_TOKEN, "https://api.telegram.org"))
+
+
+def _build(token: str, run_jobs: bool = False) -> Application:
+    """Application with handlers, shutdown hook and per-chat ordered concurrent update processing."""
+    builder = Application.builder().token(token).post_shutdown(_post_shutdown)
+    if run_jobs:
+        builder = builder.post_init(_post_init_job_workers)
+    if CONCURRENT_UPDATES > 1:
+        builder = builder.concurrent_updates(
+            PerChatUpdateProcessor(max_workers=CONCURRENT_UPDATES, max_queue_per_chat=CHAT_QUEUE_LIMIT)
+        )
+    app = builder.build()
     app.add_handler(CommandHandler("start", start))
     app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
@@ -280,14 +354,16 @@ def build_application() -> Application:
     return app
 
 
+def build_application() -> Application:
+    """Create and configure the Telegram application (token from config)."""
+    logger.info("Building application, validating config")
+    validate_config()
+    return _build(BOT_TOKEN, run_jobs=True)
+
+
 def build_application_with_token(token: str) -> Application:
     """Create application with given token (for hot-swap from settings DB)."""
-    app = Application.builder().token(token).build()
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    app.add_error_handler(_error_handler)
-    return app
+    return _build(token)
 
 
 def run_polling() -> None:
@@ -0,0 +1,140 @@
+"""
+Progressive Telegram reply for streamed LLM output: placeholder message, then rate-limited
+edit_message_text updates while deltas arrive, then a final edit with the complete answer.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import List, Optional
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows roughly one edit per second per chat before flood control kicks in
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+# Skip an edit when fewer new characters arrived since the last one
+STREAM_MIN_EDIT_CHARS = int(os.getenv("STREAM_MIN_EDIT_CHARS", "20"))
+TELEGRAM_MAX_MESSAGE_LEN = 4096
+PLACEHOLDER_TEXT = "…"
+CURSOR = " ▌"
+
+
+def split_message_text(text: str, limit: int = TELEGRAM_MAX_MESSAGE_LEN) -> List[str]:
+    """Split text into chunks of at most limit chars, preferring line breaks."""
+    chunks: List[str] = []
+    rest = text
+    while len(rest) > limit:
+        cut = rest.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(rest[:cut])
+        rest = rest[cut:].lstrip("\n")
+    if rest or not chunks:
+        chunks.append(rest)
+    return chunks
+
+
+class StreamingReply:
+    """
+    One streamed answer to a user message.
+    Usage: await start(); pass on_delta to get_reply(...); await finish(final_text).
+    Edits run in a background flusher so the LLM stream is never blocked by Telegram round trips.
+    """
+
+    def __init__(
+        self,
+        message: Message,
+        edit_interval: float = STREAM_EDIT_INTERVAL,
+        min_edit_chars: int = STREAM_MIN_EDIT_CHARS,
+    ) -> None:
+        self._message = message
+        self._edit_interval = edit_interval
+        self._min_edit_chars = min_edit_chars
+        self._sent: Optional[Message] = None
+        self._buffer = ""
+        self._shown = ""
+        self._retry_until = 0.0
+        self._done = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def text(self) -> str:
+        """Text received so far."""
+        return self._buffer
+
+    async def start(self) -> None:
+        """Send placeholder message and start the edit flusher."""
+        try:
+            self._sent = await self._message.reply_text(PLACEHOLDER_TEXT)
+            self._shown = PLACEHOLDER_TEXT
+        except Exception as e:
+            logger.warning("Streaming placeholder not sent: %s", e)
+            return
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def on_delta(self, delta: str) -> None:
+        """LLM delta callback: only buffers; the flusher decides when to edit."""
+        self._buffer += delta
+
+    def reset(self) -> None:
+        """Drop buffered text (e.g. before retrying the request without tools)."""
+        self._buffer = ""
+
+    async def _flush_loop(self) -> None:
+        while not self._done.is_set():
+            try:
+                await asyncio.wait_for(self._done.wait(), timeout=self._edit_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._done.is_set():
+                break
+            if len(self._buffer) - len(self._shown) < self._min_edit_chars and self._shown != PLACEHOLDER_TEXT:
+                continue
+            if self._buffer:
+                text = self._buffer
+                if len(text) + len(CURSOR) > TELEGRAM_MAX_MESSAGE_LEN:
+                    text = text[: TELEGRAM_MAX_MESSAGE_LEN - len(CURSOR)]
+                await self._edit(text + CURSOR)
+
+    async def _edit(self, text: str) -> bool:
+        """Edit placeholder; respects RetryAfter and ignores 'message is not modified'."""
+        if self._sent is None or text == self._shown:
+            return True
+        wait = self._retry_until - time.monotonic()
+        if wait > 0:
+            if not self._done.is_set():
+                return False
+            await asyncio.sleep(wait)
+        try:
+            await self._sent.edit_text(text)
+            self._shown = text
+            return True
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else float(e.retry_after)
+            self._retry_until = time.monotonic() + retry_after
+            logger.debug("Streaming edit flood control, retry after %.1fs", retry_after)
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                self._shown = text
+                return True
+            logger.debug("Streaming edit failed: %s", e)
+        except Exception as e:
+            logger.debug("Streaming edit failed: %s", e)
+        return False
+
+    async def finish(self, final_text: str) -> None:
+        """Stop flusher and show final_text (split into extra messages if longer than Telegram limit)."""
+        self._done.set()
+        if self._flusher is not None:
+            try:
+                await self._flusher
+            except Exception as e:
+                logger.debug("Streaming flusher: %s", e)
+        chunks = split_message_text(final_text)
+        if self._sent is None or not await self._edit(chunks[0]):
+            await self._message.reply_text(chunks[0])
+        for chunk in chunks[1:]:
+            await self._message.reply_text(chunk)
@@ -3,11 +3,15 @@ Orchestrates tool-calling: loads plugins, gets tools from registry, calls LLM, e
 """
 import json
 import logging
+import os
+from dataclasses import dataclass
 from typing import List, Optional
 
-from bot.llm import ToolCall as LLMToolCall, get_reply
-from tools import get_registry, load_all_plugins, execute_tool
+from bot.llm import DeltaCallback, ToolCall as LLMToolCall, get_reply
+from tools import get_registry, load_all_plugins, execute_tools
 from tools.models import ToolCall as ToolsToolCall
+from tools.result_store import FETCH_RESULT_PAGE_TOOL
+from tools.router import get_tool_router
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +29,23 @@ IMPORTANT RULES:
 Be concise and helpful."""
 
 MAX_ITERATIONS = 5
+# User messages (latest first) used as the tool-router query, so short follow-ups keep their topic
+TOOL_ROUTER_QUERY_MESSAGES = 2
+# Tool calls from one LLM turn run concurrently (parallel_safe tools only), at most this many at once
+TOOL_CALLS_MAX_CONCURRENCY = int(os.getenv("TOOL_CALLS_MAX_CONCURRENCY", "4"))
+
+# Reply when the loop ends without an answer (max_iterations, or neither content nor tool calls)
+FALLBACK_REPLY = "Could not complete the operation."
 
 _plugins_loaded = False
 
 
+@dataclass
+class ToolLoopOutcome:
+    """Filled by get_reply_with_tools: complete is False when the reply is FALLBACK_REPLY, not an LLM answer."""
+    complete: bool = True
+
+
 async def _ensure_plugins_loaded() -> None:
     global _plugins_loaded
     if not _plugins_loaded:
@@ -42,6 +59,16 @@ def _tool_result_message_openai(tool_call_id: str, content: str) -> dict:
     return {"role": "tool", "tool_call_id": tool_call_id, "content": content}
 
 
+def _router_query(messages: List[dict]) -> str:
+    """Text of the last user messages for relevance-based tool selection."""
+    texts = [
+        m.get("content") or ""
+        for m in reversed(messages)
+        if m.get("role") == "user" and isinstance(m.get("content"), str)
+    ]
+    return "\n".join(texts[:TOOL_ROUTER_QUERY_MESSAGES])
+
+
 def _append_tool_results_openai(
     messages: List[dict], tool_calls: List[LLMToolCall], results: List[str]
 ) -> None:
@@ -67,57 +94,86 @@ async def get_reply_with_tools(
     messages: List[dict],
     max_iterations: int = MAX_ITERATIONS,
     telegram_id: Optional[int] = None,
+    on_delta: Optional[DeltaCallback] = None,
+    chat_id: Optional[int] = None,
+    request_id: Optional[str] = None,
+    tool_calls_out: Optional[List[ToolsToolCall]] = None,
+    outcome: Optional[ToolLoopOutcome] = None,
 ) -> str:
     """
     Get reply from LLM with tool-calling loop. Uses plugin registry and executor.
     If no tools or LLM returns text, returns that text. On max_iterations returns fallback message.
     telegram_id: when set (e.g. from Telegram bot), passed to tools for admin checks (hr_service).
+    chat_id, request_id: passed to the tool context (task-local) for per-chat state and log correlation.
+    on_delta: streaming callback passed to every LLM call; the returned string is the authoritative answer.
+    tool_calls_out: if set, every executed tool call is appended (answer cache checks they were cacheable).
+    outcome: if set, marked incomplete when the fallback message is returned (the caller must not cache it).
     """
     await _ensure_plugins_loaded()
     registry = get_registry()
-    tools_defs = registry.get_tools_for_llm()
-    if not tools_defs:
-        content, _ = await get_reply(messages)
+    all_tools = registry.get_tool_schemas()
+    if not all_tools:
+        content, _ = await get_reply(messages, on_delta=on_delta)
         return (content or "") if content else ""
 
+    router = get_tool_router(registry)
+    query = _router_query(messages)
+    called: List[str] = []
     iteration = 0
     current_messages = list(messages)
 
     while iteration < max_iterations:
         iteration += 1
+        tools_defs = router.select(all_tools, query, extra=called)
         content, tool_calls = await get_reply(
             current_messages,
             tools=tools_defs,
             tool_choice="auto",
+            on_delta=on_delta,
         )
 
         if tool_calls:
             logger.info("Tool calls: %s", [tc.name for tc in tool_calls])
+            called.extend(tc.name for tc in tool_calls)
             if content:
                 current_messages.append({"role": "assistant", "content": content})
-            results = []
-            for tc in tool_calls:
-                tools_tc = ToolsToolCall(id=tc.id, name=tc.name, arguments=tc.arguments or {})
-                tr = await execute_tool(tools_tc, telegram_id=telegram_id)
-                results.append(tr.content)
+            tools_tcs = [
+                ToolsToolCall(id=tc.id, name=tc.name, arguments=tc.arguments or {})
+                for tc in tool_calls
+            ]
+            if tool_calls_out is not None:
+                tool_calls_out.extend(tools_tcs)
+            trs = await execute_tools(
+                tools_tcs,
+                parallel=True,
+                max_concurrency=TOOL_CALLS_MAX_CONCURRENCY,
+                telegram_id=telegram_id,
+                chat_id=chat_id,
+                request_id=request_id,
+            )
+            results = [tr.content for tr in trs]
+            if any(tr.page_handle for tr in trs):
+                # Paged result: offer fetch_result_page on the next iteration even if the router would not
+                called.append(FETCH_RESULT_PAGE_TOOL)
             _append_tool_results_openai(current_messages, tool_calls, results)
             continue
 
         if content:
             return content
+        break
 
-        return "Could not complete the operation."
-
-    return "Could not complete the operation."
+    if outcome is not None:
+        outcome.complete = False
+    return FALLBACK_REPLY
 
 
 def get_system_prompt_for_tools() -> str:
-    """Return system prompt for tool-calling: from DB if set, else default."""
+    """Return system prompt for tool-calling: from DB settings (cached, active or not) if set, else default."""
     try:
-        from api.settings_repository import get_llm_settings
-        settings = get_llm_settings()
-        if settings and (settings.get("system_prompt") or "").strip():
-            return (settings.get("system_prompt") or "").strip()
+        from api.settings_repository import get_llm_system_prompt
+        prompt = (get_llm_system_prompt() or "").strip()
+        if prompt:
+            return prompt
     except Exception:
         pass
     return DEFAULT_SYSTEM_PROMPT_WITH_TOOLS
@@ -0,0 +1,101 @@
+"""
+Concurrent update processing with per-chat ordering for python-telegram-bot.
+Different chats are handled in parallel (bounded worker pool); updates of one chat run strictly
+one after another, so per-chat history stays consistent. Bursts beyond the per-chat queue limit are dropped.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Optional, Set
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+BURST_DROPPED_TEXT = "⏳ Ещё обрабатываю ваши предыдущие сообщения. Это сообщение пропущено — отправьте его позже."
+# Updates accepted (running + waiting for their chat) per worker; PTB's own semaphore bounds this total
+PENDING_PER_WORKER = 64
+
+
+def _chat_id(update: object) -> Optional[int]:
+    if isinstance(update, Update) and update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Update processor: at most max_workers handlers run at once; one chat never runs two updates
+    concurrently (FIFO per chat). A chat with max_queue_per_chat updates already pending gets new
+    updates dropped (with a one-time notice per burst).
+    """
+
+    def __init__(self, max_workers: int, max_queue_per_chat: int = 3, notify_dropped: bool = True) -> None:
+        # PTB semaphore only bounds accepted updates; the worker limit is applied after the chat lock,
+        # so updates waiting for a busy chat do not hold worker slots
+        super().__init__(max_concurrent_updates=max(2, max_workers * PENDING_PER_WORKER))
+        self._workers = asyncio.BoundedSemaphore(max_workers)
+        self._max_workers = max_workers
+        self._max_queue_per_chat = max(1, max_queue_per_chat)
+        self._notify_dropped = notify_dropped
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._pending: Dict[int, int] = {}
+        self._notified: Set[int] = set()
+
+    @property
+    def max_workers(self) -> int:
+        """Maximum number of handlers running at once."""
+        return self._max_workers
+
+    def pending(self, chat_id: int) -> int:
+        """Updates of chat_id running or waiting."""
+        return self._pending.get(chat_id, 0)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat_id = _chat_id(update)
+        if chat_id is None:
+            async with self._workers:
+                await coroutine
+            return
+        if self._pending.get(chat_id, 0) >= self._max_queue_per_chat:
+            await self._drop(chat_id, update, coroutine)
+            return
+        self._pending[chat_id] = self._pending.get(chat_id, 0) + 1
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        try:
+            async with lock:
+                async with self._workers:
+                    await coroutine
+        finally:
+            left = self._pending[chat_id] - 1
+            if left:
+                self._pending[chat_id] = left
+            else:
+                del self._pending[chat_id]
+                self._chat_locks.pop(chat_id, None)
+                self._notified.discard(chat_id)
+
+    async def _drop(self, chat_id: int, update: object, coroutine: Awaitable[Any]) -> None:
+        """Drop update of an overloaded chat: close its coroutine and notify the user once per burst."""
+        if hasattr(coroutine, "close"):
+            coroutine.close()
+        logger.warning(
+            "Dropped update chat_id=%s: %d updates already pending (limit %d)",
+            chat_id, self._pending.get(chat_id, 0), self._max_queue_per_chat,
+        )
+        if not self._notify_dropped or chat_id in self._notified:
+            return
+        self._notified.add(chat_id)
+        message = update.effective_message if isinstance(update, Update) else None
+        if message is None:
+            return
+        try:
+            await message.reply_text(BURST_DROPPED_TEXT)
+        except Exception as e:
+            logger.debug("Drop notice not sent chat_id=%s: %s", chat_id, e)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -4,11 +4,11 @@ Actions: get_employee, list_employees, search_employees, update_employee, import
 Error contract: "Error: ..." string (DOCUMENTATION_AUDIT).
 Write actions (update_employee, import_employees) require service admin when called from bot.
 """
-import json
 import logging
 from typing import Any, Optional
 
 from tools.base import get_current_context
+from tools.result_shaping import compact_json
 
 
 def _is_service_admin_from_context() -> bool:
@@ -40,7 +40,28 @@ def _err(msg: str) -> str:
     return f"Error: {msg}"
 
 
-async def hr_dispatch(
+def _fuzzy_candidates(query: str) -> tuple:
+    """
+    Fuzzy name lookup (Latin spelling, typos, case forms): (employee if one clear match, candidates payload).
+    Lets the LLM pick from the closest names in one call instead of retrying with spelling variants.
+    """
+    from plugins.hr_service.name_index import get_name_index
+    emp, matches = get_name_index().best(query)
+    candidates = [
+        {
+            "full_name": m.employee.get("full_name"),
+            "personal_number": m.employee.get("personal_number"),
+            "email": m.employee.get("email"),
+            "position": m.employee.get("position"),
+            "team": m.employee.get("team"),
+            "score": m.score,
+        }
+        for m in matches
+    ]
+    return emp, candidates
+
+
+def hr_dispatch(
     action: str,
     query: Optional[str] = None,
     mvz: Optional[str] = None,
@@ -54,6 +75,7 @@ async def hr_dispatch(
 ) -> str:
     """
     Single entry point for HR tool. Dispatches by action.
+    Sync on purpose: repository calls block, so the executor runs it in a thread (asyncio.to_thread).
     """
     action = (action or "").strip().lower()
     if not action:
@@ -68,9 +90,20 @@ async def hr_dispatch(
             personal_number=personal_number,
             email=email_arg,
         )
+        if err and name_query and not personal_number:
+            fuzzy_emp, candidates = _fuzzy_candidates(str(name_query))
+            if fuzzy_emp and err == "Employee not found.":
+                # Marked as fuzzy so the LLM can say whom it found instead of presenting an exact hit
+                return compact_json({"match": "fuzzy", "score": candidates[0]["score"], "employee": fuzzy_emp})
+            if candidates:
+                return compact_json({
+                    "error": err,
+                    "candidates": candidates,
+                    "hint": "Closest names; call get_employee with personal_number of the right one.",
+                })
         if err:
             return _err(err)
-        return json.dumps(emp, ensure_ascii=False, indent=2)
+        return compact_json(emp)
 
     if action == "list_employees":
         view = "all"
@@ -85,13 +118,17 @@ async def hr_dispatch(
             supervisors_only=bool(supervisors_only),
             delivery_managers_only=bool(delivery_managers_only),
         )
-        return json.dumps(items, ensure_ascii=False, indent=2)
+        return compact_json(items)
 
     if action == "search_employees":
         if not query or not str(query).strip():
             return _err("query is required for search_employees")
         items = repo_search_employees(query=str(query).strip())
-        return json.dumps(items, ensure_ascii=False, indent=2)
+        if not items:
+            _, candidates = _fuzzy_candidates(str(query).strip())
+            if candidates:
+                return compact_json({"exact_matches": [], "candidates": candidates})
+        return compact_json(items)
 
     if action == "update_employee":
         if not _is_service_admin_from_context():
@@ -117,23 +154,42 @@ async def hr_dispatch(
             elif len(candidates) > 1:
                 names = ", ".join(c["full_name"] for c in candidates[:5])
                 return _err(f"Multiple matches: {names}. Specify personal_number.")
+            else:
+                # Writes never go to a fuzzy match: list the closest names instead
+                _, fuzzy = _fuzzy_candidates(str(query).strip())
+                if fuzzy:
+                    names = ", ".join(f"{c['full_name']} ({c['personal_number']})" for c in fuzzy)
+                    return _err(f"Employee not found. Closest: {names}. Specify personal_number.")
         if emp_id is None:
             return _err("Employee not found. Use query (name) or personal_number.")
         updated, err = repo_update_employee(employee_id=emp_id, updates=payload)
         if err:
             return _err(err)
-        return json.dumps(updated, ensure_ascii=False, indent=2)
+        return compact_json(updated)
 
     if action == "import_employees":
         if not _is_service_admin_from_context():
             return _err("Only service administrators can import employees.")
         if not file_path or not str(file_path).strip():
             return _err("file_path is required for import_employees (path to Excel file).")
-        from plugins.hr_service.import_excel import import_employees_from_file
-        result = import_employees_from_file(str(file_path).strip())
-        if isinstance(result, str) and result.startswith("Error:"):
-            return result
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        # Runs as background job hr_import (plugins/hr_service/jobs.py); the chat gets progress and the result
+        from pathlib import Path
+        from api.jobs import enqueue_job, stage_job_file
+        path = Path(str(file_path).strip())
+        if not path.is_file():
+            return _err("File not found.")
+        if path.suffix.lower() not in (".xlsx", ".xls"):
+            return _err("Only .xlsx and .xls files are supported.")
+        ctx = get_current_context()
+        job = enqueue_job(
+            "hr_import",
+            {"file_path": stage_job_file(str(path)), "update_existing": False},
+            chat_id=ctx.chat_id if ctx else None,
+            telegram_id=ctx.telegram_id if ctx else None,
+        )
+        return compact_json(
+            {"job_id": job["id"], "status": job["status"], "message": "Import queued; progress is sent to the chat."}
+        )
 
     return _err(f"Unknown action: {action}")
 
@@ -1,25 +1,24 @@
 """
 Excel import for HR employees: parse sheets ДДЖ and Инфоком, validate, merge by personal_number.
 SPEC_HR_SERVICE sections 3-4. Supports .xlsx (openpyxl) and .xls (xlrd).
+Rows are streamed (read-only workbook, one row at a time), so memory stays flat for large exports.
 """
 import logging
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from datetime import date
 
-from api.employees_repository import (
-    create_employee,
-    employee_exists_by_personal_number,
-    _parse_date,
-)
+from api.employees_repository import _parse_date, bulk_import_employees
 
 logger = logging.getLogger(__name__)
 
 SHEET_DDJ = "ДДЖ"
 SHEET_INFOKOM = "Инфоком"
+# Records between on_progress calls of an import (job progress and cancellation check)
+IMPORT_PROGRESS_EVERY = 500
 
 # Column headers (exact or normalized) -> field name
 # ДДЖ
@@ -74,55 +73,43 @@ def _parse_date_from_cell(v: Any) -> Optional[date]:
     return _parse_date(v)
 
 
-def _load_xlsx_sheet(path: str, sheet_name: str) -> Optional[Tuple[List[str], List[List]]]:
-    """Load one sheet from .xlsx. Returns (headers, rows) or None."""
+def _iter_xlsx_rows(path: str, sheet_name: str) -> Iterator[Sequence]:
+    """Rows of one .xlsx sheet, read lazily (openpyxl read-only mode). Nothing if the sheet is missing."""
+    import openpyxl
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
     try:
-        import openpyxl
-        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
         if sheet_name not in wb.sheetnames:
-            return None
-        ws = wb[sheet_name]
-        rows = list(ws.iter_rows(values_only=True))
+            return
+        yield from wb[sheet_name].iter_rows(values_only=True)
+    finally:
         wb.close()
-        if not rows:
-            return None
-        headers = [_normalize_header(str(h)) for h in rows[0]]
-        data_rows = rows[1:]
-        return (headers, data_rows)
-    except Exception as e:
-        logger.warning("openpyxl load %s sheet %s: %s", path, sheet_name, e)
-        return None
 
 
-def _load_xls_sheet(path: str, sheet_name: str) -> Optional[Tuple[List[str], List[List]]]:
-    """Load one sheet from .xls. Returns (headers, rows) or None."""
+def _iter_xls_rows(path: str, sheet_name: str) -> Iterator[Sequence]:
+    """Rows of one .xls sheet (xlrd, other sheets are not loaded). Whole-number floats become int."""
+    import xlrd
+    wb = xlrd.open_workbook(path, on_demand=True)
     try:
-        import xlrd
-        wb = xlrd.open_workbook(path)
-        sheet = None
-        for i in range(wb.nsheets):
-            if wb.sheet_by_index(i).name == sheet_name:
-                sheet = wb.sheet_by_index(i)
-                break
-        if sheet is None:
-            return None
-        rows = []
+        if sheet_name not in wb.sheet_names():
+            return
+        sheet = wb.sheet_by_name(sheet_name)
         for r in range(sheet.nrows):
-            row = []
-            for c in range(sheet.ncols):
-                cell = sheet.cell_value(r, c)
-                if isinstance(cell, float) and cell == int(cell):
-                    cell = int(cell)
-                row.append(cell)
-            rows.append(row)
-        if not rows:
-            return None
-        headers = [_normalize_header(str(h)) for h in rows[0]]
-        data_rows = [list(r) for r in rows[1:]]
-        return (headers, data_rows)
+            yield [
+                int(cell) if isinstance(cell, float) and cell == int(cell) else cell
+                for cell in sheet.row_values(r)
+            ]
+    finally:
+        wb.release_resources()
+
+
+def _iter_sheet(path: str, sheet_name: str, errors: List[str]) -> Iterator[Sequence]:
+    """Rows of a sheet (first row = headers), streamed; a read error is reported in errors and ends the sheet."""
+    reader = _iter_xlsx_rows if path.lower().endswith(".xlsx") else _iter_xls_rows
+    try:
+        yield from reader(path, sheet_name)
     except Exception as e:
-        logger.warning("xlrd load %s sheet %s: %s", path, sheet_name, e)
-        return None
+        logger.warning("Excel read %s sheet %s: %s", path, sheet_name, e)
+        errors.append(f"Sheet '{sheet_name}': read error: {e!s}")
 
 
 def _find_col(headers: List[str], name: str) -> Optional[int]:
@@ -146,17 +133,14 @@ def _find_col_infokom_full_name(headers: List[str]) -> Optional[int]:
     return _find_col(headers, "табельный номер")
 
 
-def parse_ddj(path: str) -> Tuple[List[Dict], List[str]]:
-    """Parse sheet ДДЖ. Returns (list of row dicts keyed by field name, list of errors)."""
-    out: List[Dict] = []
-    errors: List[str] = []
-    if path.lower().endswith(".xlsx"):
-        data = _load_xlsx_sheet(path, SHEET_DDJ)
-    else:
-        data = _load_xls_sheet(path, SHEET_DDJ)
-    if not data:
-        return ([], [f"Sheet '{SHEET_DDJ}' not found or empty"])
-    headers, data_rows = data
+def iter_ddj(path: str, errors: List[str]) -> Iterator[Dict]:
+    """Stream sheet ДДЖ as row dicts keyed by field name; problems are appended to errors."""
+    rows = _iter_sheet(path, SHEET_DDJ, errors)
+    header = next(rows, None)
+    if header is None:
+        errors.append(f"Sheet '{SHEET_DDJ}' not found or empty")
+        return
+    headers = [_normalize_header(str(h)) for h in header]
     col_map = {}
     for db_field, possible_headers in [
         ("personal_number", ["табельный номер"]),
@@ -173,8 +157,9 @@ def parse_ddj(path: str) -> Tuple[List[Dict], List[str]]:
                 col_map[db_field] = idx
                 break
     if "personal_number" not in col_map or "full_name" not in col_map:
-        return ([], [f"Sheet ДДЖ: required columns (Табельный номер, ФИО) not found"])
-    for r_idx, row in enumerate(data_rows):
+        errors.append(f"Sheet ДДЖ: required columns (Табельный номер, ФИО) not found")
+        return
+    for r_idx, row in enumerate(rows):
         personal_number = _cell_value(row, col_map.get("personal_number"))
         full_name = _cell_value(row, col_map.get("full_name"))
         if not personal_number and not full_name:
@@ -185,7 +170,7 @@ def parse_ddj(path: str) -> Tuple[List[Dict], List[str]]:
         hire_val = None
         if col_map.get("hire_date") is not None and col_map["hire_date"] < len(row):
             hire_val = row[col_map["hire_date"]]
-        rec = {
+        yield {
             "personal_number": personal_number,
             "full_name": full_name or "",
             "position": _cell_value(row, col_map.get("position")),
@@ -194,21 +179,16 @@ def parse_ddj(path: str) -> Tuple[List[Dict], List[str]]:
             "email": _cell_value(row, col_map.get("email")),
             "supervisor": _cell_value(row, col_map.get("supervisor")),
         }
-        out.append(rec)
-    return (out, errors)
 
 
-def parse_infokom(path: str) -> Tuple[List[Dict], List[str]]:
-    """Parse sheet Инфоком. Column 'Табельный номер' = full_name (FIO). First 'Табельный №' = personal_number."""
-    out: List[Dict] = []
-    errors: List[str] = []
-    if path.lower().endswith(".xlsx"):
-        data = _load_xlsx_sheet(path, SHEET_INFOKOM)
-    else:
-        data = _load_xls_sheet(path, SHEET_INFOKOM)
-    if not data:
-        return ([], [f"Sheet '{SHEET_INFOKOM}' not found or empty"])
-    headers, data_rows = data
+def iter_infokom(path: str, errors: List[str]) -> Iterator[Dict]:
+    """Stream sheet Инфоком. Column 'Табельный номер' = full_name (FIO). First 'Табельный №' = personal_number."""
+    rows = _iter_sheet(path, SHEET_INFOKOM, errors)
+    header = next(rows, None)
+    if header is None:
+        errors.append(f"Sheet '{SHEET_INFOKOM}' not found or empty")
+        return
+    headers = [_normalize_header(str(h)) for h in header]
     col_personal = _find_col_infokom_personal_number(headers)
     col_full_name = _find_col_infokom_full_name(headers)
     col_position = _find_col(headers, INFOKOM_POSITION_COL)
@@ -217,8 +197,9 @@ def parse_infokom(path: str) -> Tuple[List[Dict], List[str]]:
     col_mvz = _find_col(headers, INFOKOM_MVZ)
     col_email = _find_col(headers, INFOKOM_EMAIL)
     if col_personal is None or col_full_name is None:
-        return ([], [f"Sheet Инфоком: required columns (Табельный №, Табельный номер) not found"])
-    for r_idx, row in enumerate(data_rows):
+        errors.append(f"Sheet Инфоком: required columns (Табельный №, Табельный номер) not found")
+        return
+    for r_idx, row in enumerate(rows):
         personal_number = _cell_value(row, col_personal)
         full_name = _cell_value(row, col_full_name)  # on Infokom this column is FIO
         if not personal_number and not full_name:
@@ -226,7 +207,7 @@ def parse_infokom(path: str) -> Tuple[List[Dict], List[str]]:
         if not personal_number:
             errors.append(f"Инфоком row {r_idx + 2}: missing personal number")
             continue
-        rec = {
+        yield {
             "personal_number": personal_number,
             "full_name": full_name or "",
             "position": _cell_value(row, col_position) if col_position is not None else "",
@@ -235,36 +216,63 @@ def parse_infokom(path: str) -> Tuple[List[Dict], List[str]]:
             "email": _cell_value(row, col_email) if col_email is not None else "",
             "supervisor": _cell_value(row, col_supervisor) if col_supervisor is not None else "",
         }
-        out.append(rec)
-    return (out, errors)
-
-
-def _merge_rows_by_personal(ddj_rows: List[Dict], infokom_rows: List[Dict]) -> Dict[str, Dict]:
-    """Merge two lists by personal_number. One number -> one record; fill blanks from the other sheet."""
-    by_num: Dict[str, Dict] = {}
-    for r in ddj_rows:
-        pn = (r.get("personal_number") or "").strip()
-        if pn:
-            by_num[pn] = dict(r)
-    for r in infokom_rows:
-        pn = (r.get("personal_number") or "").strip()
-        if not pn:
-            continue
-        if pn in by_num:
-            existing = by_num[pn]
-            for k, v in r.items():
-                if v and (not existing.get(k) or existing.get(k) == ""):
-                    existing[k] = v
-        else:
-            by_num[pn] = dict(r)
-    return by_num
 
 
-def import_employees_from_file(file_path: str) -> Any:
+def parse_ddj(path: str) -> Tuple[List[Dict], List[str]]:
+    """Parse sheet ДДЖ. Returns (list of row dicts keyed by field name, list of errors)."""
+    errors: List[str] = []
+    return (list(iter_ddj(path, errors)), errors)
+
+
+def parse_infokom(path: str) -> Tuple[List[Dict], List[str]]:
+    """Parse sheet Инфоком. Returns (list of row dicts keyed by field name, list of errors)."""
+    errors: List[str] = []
+    return (list(iter_infokom(path, errors)), errors)
+
+
+class DuplicatePersonalNumberError(ValueError):
+    """Same personal number twice on a sheet or on both sheets: the file is rejected."""
+
+
+def iter_employee_records(path: str, errors: List[str]) -> Iterator[Dict]:
+    """
+    Single streaming pass over ДДЖ then Инфоком: one record per personal number.
+    Only personal numbers are kept in memory (duplicate index), so memory does not grow with row width.
+    A number seen twice (on one sheet or on both) raises DuplicatePersonalNumberError: since such files
+    are rejected, every accepted record comes from exactly one sheet and needs no field merge.
+    """
+    seen: Dict[str, str] = {}
+    for sheet, records in ((SHEET_DDJ, iter_ddj(path, errors)), (SHEET_INFOKOM, iter_infokom(path, errors))):
+        for rec in records:
+            pn = rec["personal_number"].strip()
+            first_sheet = seen.get(pn)
+            if first_sheet == sheet:
+                raise DuplicatePersonalNumberError(
+                    f"Error: Duplicate personal number in file: '{pn}' on sheet {sheet} (rows with this number). Import aborted."
+                )
+            if first_sheet is not None:
+                raise DuplicatePersonalNumberError(
+                    f"Error: Duplicate personal number in file: '{pn}' appears on both sheets (ДДЖ and Инфоком). Import aborted."
+                )
+            seen[pn] = sheet
+            rec["personal_number"] = pn
+            yield rec
+
+
+def import_employees_from_file(
+    file_path: str,
+    update_existing: bool = False,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> Any:
     """
     Parse .xlsx/.xls (sheets ДДЖ and Инфоком), check duplicate personal_number in file,
-    merge by personal_number, insert only new employees. Optionally run Jira enrichment (Task 5).
-    Returns dict: added_count, added_names, errors, [enrichment_errors]
+    merge by personal_number, insert only new employees (update_existing: also update changed fields
+    of existing ones). Runs as background job hr_import (plugins/hr_service/jobs.py), which also queues
+    Jira enrichment (Task 5) for added_ids.
+    Rows are streamed into one bulk-import transaction; a duplicate in the file rolls it back, as does an
+    exception raised by on_progress(records_read) (called every IMPORT_PROGRESS_EVERY records and once after the
+    last row, before the commit; e.g. job cancel).
+    Returns dict: added_count, added_names, added_ids, updated_count, errors
     or "Error: ..." string on fatal error (e.g. duplicate in file, file not found).
     """
     path = Path(file_path).resolve()
@@ -274,72 +282,29 @@ def import_employees_from_file(file_path: str) -> Any:
     if suf not in (".xlsx", ".xls"):
         return "Error: Only .xlsx and .xls files are supported."
 
-    ddj_rows, ddj_err = parse_ddj(str(path))
-    infokom_rows, inf_err = parse_infokom(str(path))
-    errors = ddj_err + inf_err
-
-    # Build set of personal numbers per sheet to detect duplicates (same number on both sheets or twice on one)
-    ddj_nums: Dict[str, List[str]] = {}
-    for r in ddj_rows:
-        pn = (r.get("personal_number") or "").strip()
-        if pn:
-            ddj_nums.setdefault(pn, []).append("ДДЖ")
-    inf_nums: Dict[str, List[str]] = {}
-    for r in infokom_rows:
-        pn = (r.get("personal_number") or "").strip()
-        if pn:
-            inf_nums.setdefault(pn, []).append("Инфоком")
-    # Duplicate = same number in both sheets, or same number more than once in one sheet
-    for pn, locs in ddj_nums.items():
-        if len(locs) > 1:
-            return f"Error: Duplicate personal number in file: '{pn}' on sheet ДДЖ (rows with this number). Import aborted."
-        if pn in inf_nums:
-            return f"Error: Duplicate personal number in file: '{pn}' appears on both sheets (ДДЖ and Инфоком). Import aborted."
-    for pn, locs in inf_nums.items():
-        if len(locs) > 1:
-            return f"Error: Duplicate personal number in file: '{pn}' on sheet Инфоком (rows with this number). Import aborted."
-
-    merged = _merge_rows_by_personal(ddj_rows, infokom_rows)
-    added: List[Dict] = []
-    for pn, rec in merged.items():
-        if not pn or not (rec.get("full_name") or rec.get("email")):
-            continue
-        if employee_exists_by_personal_number(pn):
-            continue
-        email = (rec.get("email") or "").strip()
-        full_name = (rec.get("full_name") or "").strip()
-        if not email:
-            errors.append(f"Personal number {pn} ({full_name}): missing email, skip insert")
-            continue
-        try:
-            created = create_employee(
-                personal_number=pn,
-                full_name=full_name,
-                email=email,
-                position=(rec.get("position") or "").strip() or None,
-                mvz=(rec.get("mvz") or "").strip() or None,
-                supervisor=(rec.get("supervisor") or "").strip() or None,
-                hire_date=rec.get("hire_date"),
-                mattermost_username=email,
-            )
-            added.append(created)
-        except Exception as e:
-            errors.append(f"Personal number {pn}: {e!s}")
-
-    # Jira enrichment for newly added (will be implemented in Task 5)
-    enrichment_errors: List[str] = []
-    try:
-        from plugins.hr_service.jira_enrichment import enrich_new_employees_jira
-        enriched, enrichment_errors = enrich_new_employees_jira([a["id"] for a in added])
-        logger.info("Jira enrichment: %d enriched, %d errors", enriched, len(enrichment_errors))
-    except Exception as e:
-        logger.warning("Jira enrichment not run: %s", e)
+    errors: List[str] = []
 
-    added_names = [a.get("full_name") or a.get("personal_number", "") for a in added]
-    result = {
-        "added_count": len(added),
-        "added_names": added_names[:10] if len(added_names) <= 10 else [],
+    def _records() -> Iterator[Dict]:
+        i = 0
+        for i, rec in enumerate(iter_employee_records(str(path), errors), 1):
+            if on_progress is not None and i % IMPORT_PROGRESS_EVERY == 0:
+                on_progress(i)
+            if rec.get("full_name") or rec.get("email"):
+                yield rec
+        # Last call after the final row, before the transaction commits: a cancel now still rolls back
+        if on_progress is not None:
+            on_progress(i)
+
+    try:
+        imported = bulk_import_employees(_records(), update_existing=update_existing)
+    except DuplicatePersonalNumberError as e:
+        return str(e)
+    errors.extend(imported["errors"])
+    added_ids: List[int] = imported["inserted_ids"]
+    return {
+        "added_count": len(added_ids),
+        "added_names": imported["inserted_names"] if len(added_ids) <= 10 else [],
+        "added_ids": added_ids,
+        "updated_count": imported["updated"],
         "errors": errors,
-        "enrichment_errors": enrichment_errors,
     }
-    return result
@@ -1,64 +1,215 @@
 """
 Jira enrichment: fetch user key (jira_worker_id) from Jira REST API for employees with empty jira_worker_id.
 SPEC_HR_SERVICE section 5. GET /rest/api/2/user?username={username}; response key -> jira_worker_id.
+Async engine: one pooled httpx.AsyncClient, bounded concurrency, token-bucket rate limit shared by all
+workers, retry with backoff on 429/5xx (Retry-After honoured). Rows are read and written in bulk.
+After an import it runs as background job hr_jira_enrichment (plugins/hr_service/jobs.py).
 """
+import asyncio
 import logging
-from typing import List, Tuple
+import os
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+PLUGIN_ID = "hr_service"
 
-def enrich_new_employees_jira(employee_ids: List[int]) -> Tuple[int, List[str]]:
-    """
-    For each employee id, if jira_worker_id is empty, get username from email (part before @),
-    call Jira GET /rest/api/2/user?username=..., write key to jira_worker_id.
-    Returns (count_enriched, list of error messages).
-    """
-    if not employee_ids:
-        return (0, [])
+# Parallel Jira lookups and request rate (requests per second, burst = one second of requests)
+JIRA_ENRICH_CONCURRENCY = int(os.getenv("JIRA_ENRICH_CONCURRENCY", "8"))
+JIRA_ENRICH_RATE = float(os.getenv("JIRA_ENRICH_RATE", "10"))
+JIRA_ENRICH_MAX_RETRIES = 4
+# Found keys are written in batches of this size
+JIRA_ENRICH_WRITE_BATCH = 100
+_BACKOFF_BASE = 1.0
+_BACKOFF_MAX = 60.0
+
+ProgressCallback = Callable[["EnrichmentProgress"], Awaitable[None]]
+
+
+class TokenBucket:
+    """Async token bucket: acquire() waits for a token; pause() stops all takers (e.g. after 429)."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self._rate = max(rate, 0.001)
+        self._capacity = capacity if capacity is not None else max(1.0, self._rate)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+@dataclass
+class EnrichmentProgress:
+    """Progress of one enrichment run."""
+    total: int = 0
+    processed: int = 0
+    enriched: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _jira_settings() -> Tuple[Optional[Tuple[str, str]], List[str]]:
+    """((jira_url, api_token), []) or (None, [error])."""
     try:
         from tools.base import get_plugin_setting
-        jira_url = get_plugin_setting("hr_service", "jira_url")
-        api_token = get_plugin_setting("hr_service", "api_token")
+        jira_url = get_plugin_setting(PLUGIN_ID, "jira_url")
+        api_token = get_plugin_setting(PLUGIN_ID, "api_token")
         if not jira_url or not api_token:
-            return (0, ["Jira not configured (jira_url, api_token). Skip enrichment."])
+            return None, ["Jira not configured (jira_url, api_token). Skip enrichment."]
     except Exception as e:
-        return (0, [f"Settings error: {e!s}"])
-    from api.employees_repository import get_employee_by_id, set_employee_jira_worker_id
-    enriched = 0
-    errors: List[str] = []
-    for eid in employee_ids:
-        emp = get_employee_by_id(eid)
-        if not emp or emp.get("jira_worker_id"):
+        return None, [f"Settings error: {e!s}"]
+    return (str(jira_url).strip().rstrip("/"), str(api_token)), []
+
+
+def _retry_delay(response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(_BACKOFF_MAX, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return min(_BACKOFF_MAX, _BACKOFF_BASE * (2 ** attempt)) * (0.5 + random.random() / 2)
+
+
+async def _jira_get_user_key_async(client, bucket: TokenBucket, username: str) -> str:
+    """GET /rest/api/2/user?username=... with rate limit and retries. Return key (JIRAUSER...) or empty string."""
+    import httpx
+    for attempt in range(JIRA_ENRICH_MAX_RETRIES + 1):
+        await bucket.acquire()
+        try:
+            r = await client.get("/rest/api/2/user", params={"username": username})
+        except httpx.TransportError as e:
+            if attempt == JIRA_ENRICH_MAX_RETRIES:
+                logger.warning("Jira user lookup %s: %s", username, e)
+                return ""
+            await asyncio.sleep(_retry_delay(None, attempt))
             continue
-        email = (emp.get("email") or "").strip()
-        if not email or "@" not in email:
-            errors.append(f"Employee id {eid}: no email, skip Jira lookup")
+        if r.status_code == 429 or r.status_code >= 500:
+            if attempt == JIRA_ENRICH_MAX_RETRIES:
+                logger.warning("Jira user lookup %s: HTTP %s after %d retries", username, r.status_code, attempt)
+                return ""
+            delay = _retry_delay(r, attempt)
+            if r.status_code == 429:
+                bucket.pause(delay)  # throttled: every worker backs off, not only this one
+            else:
+                await asyncio.sleep(delay)
             continue
-        username = email.split("@")[0]
-        key = _jira_get_user_key(jira_url.strip().rstrip("/"), api_token, username)
-        if key:
-            if set_employee_jira_worker_id(eid, key):
-                enriched += 1
-        else:
-            errors.append(f"Employee id {eid} ({email}): Jira user not found or API error")
-    return (enriched, errors)
-
-
-def _jira_get_user_key(base_url: str, api_token: str, username: str) -> str:
-    """GET /rest/api/2/user?username=... Return key (JIRAUSER...) or empty string."""
-    import httpx
-    url = f"{base_url}/rest/api/2/user"
-    params = {"username": username}
-    try:
-        headers = {"Accept": "application/json", "Authorization": f"Bearer {api_token}"}
-        with httpx.Client(timeout=15.0) as client:
-            r = client.get(url, params=params, headers=headers)
         if r.status_code != 200:
             logger.debug("Jira user lookup %s: %s %s", username, r.status_code, r.text[:200])
             return ""
-        data = r.json()
-        return (data.get("key") or "").strip()
-    except Exception as e:
-        logger.warning("Jira user lookup %s: %s", username, e)
-        return ""
+        try:
+            return (r.json().get("key") or "").strip()
+        except Exception as e:
+            logger.warning("Jira user lookup %s: bad response %s", username, e)
+            return ""
+    return ""
+
+
+async def enrich_employees_jira_async(
+    employee_ids: List[int],
+    progress: Optional[EnrichmentProgress] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    client=None,
+) -> Tuple[int, List[str]]:
+    """
+    For employees with empty jira_worker_id: username = email part before @, Jira lookup, bulk write of keys.
+    progress is updated in place; on_progress (if set) is awaited after each employee (an exception
+    raised by it, e.g. job cancellation, stops the run; keys found so far in the current batch are not written).
+    client: optional httpx.AsyncClient with base_url and auth set (tests); otherwise one pooled client is created.
+    Returns (count_enriched, list of error messages).
+    """
+    progress = progress or EnrichmentProgress()
+    if not employee_ids:
+        return (0, [])
+    settings, errors = _jira_settings() if client is None else (None, [])
+    if errors:
+        progress.errors.extend(errors)
+        return (0, errors)
+    from api.employees_repository import get_employees_without_jira_id, set_employees_jira_worker_ids
+
+    rows = await asyncio.to_thread(get_employees_without_jira_id, employee_ids)
+    progress.total = len(rows)
+    queue: "asyncio.Queue[Tuple[int, str]]" = asyncio.Queue()
+    for row in rows:
+        queue.put_nowait(row)
+    found: List[Tuple[int, str]] = []
+    write_lock = asyncio.Lock()
+
+    async def _flush(force: bool = False) -> None:
+        async with write_lock:
+            if not found or (not force and len(found) < JIRA_ENRICH_WRITE_BATCH):
+                return
+            batch = found[:]
+            found.clear()
+            await asyncio.to_thread(set_employees_jira_worker_ids, batch)
+            progress.enriched += len(batch)
+
+    async def _worker(http, bucket: TokenBucket) -> None:
+        while True:
+            try:
+                eid, email = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            email = (email or "").strip()
+            if not email or "@" not in email:
+                progress.errors.append(f"Employee id {eid}: no email, skip Jira lookup")
+            else:
+                key = await _jira_get_user_key_async(http, bucket, email.split("@")[0])
+                if key:
+                    found.append((eid, key))
+                else:
+                    progress.errors.append(f"Employee id {eid} ({email}): Jira user not found or API error")
+            progress.processed += 1
+            await _flush()
+            if on_progress is not None:
+                await on_progress(progress)
+
+    async def _run(http) -> None:
+        bucket = TokenBucket(JIRA_ENRICH_RATE)
+        workers = max(1, min(JIRA_ENRICH_CONCURRENCY, len(rows)))
+        await asyncio.gather(*(_worker(http, bucket) for _ in range(workers)))
+        await _flush(force=True)
+
+    if client is not None:
+        await _run(client)
+    else:
+        import httpx
+        base_url, api_token = settings
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Accept": "application/json", "Authorization": f"Bearer {api_token}"},
+            timeout=15.0,
+            limits=httpx.Limits(
+                max_connections=JIRA_ENRICH_CONCURRENCY, max_keepalive_connections=JIRA_ENRICH_CONCURRENCY,
+            ),
+        ) as http:
+            await _run(http)
+    return (progress.enriched, progress.errors)
+
+
+def enrich_new_employees_jira(employee_ids: List[int]) -> Tuple[int, List[str]]:
+    """Blocking wrapper of enrich_employees_jira_async (scripts; not for use inside an event loop)."""
+    return asyncio.run(enrich_employees_jira_async(employee_ids))
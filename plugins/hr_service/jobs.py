@@ -0,0 +1,104 @@
+"""
+Background jobs of the HR plugin (api/jobs.py): Excel import and Jira enrichment of new employees.
+hr_import       params: file_path (staged by api.jobs.stage_job_file, deleted here), update_existing
+hr_jira_enrichment  params: employee_ids; queued by hr_import for the employees it added
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Dict
+
+from api.jobs import JobCancelled, JobContext, JobError, enqueue_job, register_job_handler
+from plugins.hr_service.import_excel import import_employees_from_file
+from plugins.hr_service.jira_enrichment import EnrichmentProgress, _jira_settings, enrich_employees_jira_async
+
+logger = logging.getLogger(__name__)
+
+PLUGIN_ID = "hr_service"
+JOB_HR_IMPORT = "hr_import"
+JOB_HR_JIRA_ENRICHMENT = "hr_jira_enrichment"
+
+
+def _drop_caches() -> None:
+    """Cached hr tool results and bot answers built from them are stale after an import or enrichment."""
+    from api.answer_cache_repository import purge_answer_cache
+    from tools.result_cache import invalidate_tool_cache
+    invalidate_tool_cache(plugin_id=PLUGIN_ID)
+    purge_answer_cache()
+
+
+async def run_hr_import(ctx: JobContext) -> Dict[str, Any]:
+    file_path = ctx.params.get("file_path") or ""
+    update_existing = bool(ctx.params.get("update_existing"))
+
+    interrupted = threading.Event()
+
+    def _on_progress(records_read: int) -> None:
+        # Runs in the import thread (also right before the commit): raising here rolls back the whole import
+        ctx.report(done=records_read, message="прочитано записей")
+        if interrupted.is_set():
+            raise JobCancelled()
+        ctx.check_cancelled()
+
+    work = asyncio.ensure_future(
+        asyncio.to_thread(import_employees_from_file, file_path, update_existing, _on_progress)
+    )
+    try:
+        try:
+            result = await asyncio.shield(work)
+        except asyncio.CancelledError:
+            # Pool stopping: the thread is not cancelled with the task. Stop it at its next check and wait for the
+            # rollback, so the staged file is not deleted under a running import
+            interrupted.set()
+            await asyncio.gather(work, return_exceptions=True)
+            raise
+    finally:
+        if file_path and os.path.exists(file_path):
+            try:
+                os.unlink(file_path)
+            except OSError as e:
+                logger.debug("Cleanup job file %s: %s", file_path, e)
+    if isinstance(result, str):
+        raise JobError(result)
+    await asyncio.to_thread(_drop_caches)
+
+    added_ids = result.pop("added_ids", [])
+    summary = f"✅ Импорт выполнен. Добавлено сотрудников: {result['added_count']}."
+    if result.get("updated_count"):
+        summary += f" Обновлено: {result['updated_count']}."
+    if result.get("added_names"):
+        summary += " Фамилии: " + ", ".join(result["added_names"][:10])
+    if result.get("errors"):
+        summary += f" Ошибки при обработке: {len(result['errors'])}."
+        result["errors"] = result["errors"][:100]
+    if added_ids and _jira_settings()[0] is not None:
+        job = await asyncio.to_thread(
+            enqueue_job, JOB_HR_JIRA_ENRICHMENT, {"employee_ids": added_ids},
+            chat_id=ctx.chat_id, telegram_id=ctx.telegram_id,
+        )
+        result["enrichment_job_id"] = job["id"]
+        summary += " Данные из Jira подтягиваются в фоне."
+    result["summary"] = summary
+    return result
+
+
+async def run_hr_jira_enrichment(ctx: JobContext) -> Dict[str, Any]:
+    employee_ids = [int(i) for i in ctx.params.get("employee_ids") or []]
+
+    async def _on_progress(progress: EnrichmentProgress) -> None:
+        ctx.report(done=progress.processed, total=progress.total, message=f"найдено в Jira: {progress.enriched}")
+        ctx.check_cancelled()
+
+    progress = EnrichmentProgress()
+    enriched, errors = await enrich_employees_jira_async(employee_ids, progress=progress, on_progress=_on_progress)
+    if enriched:
+        await asyncio.to_thread(_drop_caches)
+    summary = f"✅ Данные из Jira получены для {enriched} из {progress.total} сотрудников."
+    if errors:
+        summary += f" Не найдено или ошибки: {len(errors)}."
+    return {"enriched": enriched, "total": progress.total, "errors": errors[:100], "summary": summary}
+
+
+register_job_handler(JOB_HR_IMPORT, "Импорт сотрудников", run_hr_import, cooperative_cancel=True)
+register_job_handler(JOB_HR_JIRA_ENRICHMENT, "Данные из Jira", run_hr_jira_enrichment)
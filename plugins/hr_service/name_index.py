@@ -0,0 +1,167 @@
+"""
+In-memory fuzzy name index for the hr tool: finds employees by surname/name typed in Latin, with typos
+or in another grammatical case ("Иванову", "ivanov", "Ivanof").
+Every name word is reduced to one Latin key: Russian case ending stripped (api.employees_search.stem_ru),
+Cyrillic transliterated, common Latin spelling variants folded (iu/yu, kh/h, ...). Keys are compared by
+character trigram Dice similarity through a trigram -> employees inverted index.
+Built from the employee directory snapshot (api/employees_snapshot.py), or from the DB when snapshots are
+disabled, and rebuilt when the directory version changes.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from api.employees_search import stem_ru
+
+logger = logging.getLogger(__name__)
+
+# Candidates below this similarity (0..1) are not returned
+NAME_MATCH_MIN_SCORE = float(os.getenv("NAME_MATCH_MIN_SCORE", "0.45"))
+# A single candidate at least this similar (and clearly ahead of the next) is taken as the answer
+NAME_MATCH_ACCEPT_SCORE = 0.8
+_ACCEPT_MARGIN = 0.1
+_MAX_PREFILTER = 200
+
+_TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "",
+    "э": "e", "ю": "yu", "я": "ya",
+}
+# Latin spelling variants of the same Russian sound -> one form (applied in order)
+_LATIN_FOLDS = (
+    ("shch", "sch"), ("sch", "sh"), ("iu", "yu"), ("ju", "yu"), ("ia", "ya"), ("ja", "ya"), ("jo", "yo"),
+    ("kh", "h"), ("x", "ks"), ("w", "v"), ("ph", "f"), ("ck", "k"), ("tz", "ts"), ("j", "y"),
+    ("iy", "y"), ("ii", "y"), ("yy", "y"), ("ff", "v"),
+)
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+
+
+def name_key(word: str) -> str:
+    """Case-insensitive, case-ending-free Latin key of one name word."""
+    w = word.lower().replace("ё", "е")
+    if _CYRILLIC_RE.search(w):
+        w = "".join(_TRANSLIT.get(ch, ch) for ch in stem_ru(w))
+    else:
+        # Latin spelling of an inflected form ("Ivanovoy", "Ivanova") -> same stem as the Cyrillic path
+        for ending in ("oy", "oj", "omu", "ym", "om", "a", "u", "e", "y", "i"):
+            if w.endswith(ending) and len(w) - len(ending) >= 3:
+                w = w[: -len(ending)]
+                break
+    for src, dst in _LATIN_FOLDS:
+        w = w.replace(src, dst)
+    return w
+
+
+def name_keys(text: str) -> List[str]:
+    return [k for k in (name_key(w) for w in _WORD_RE.findall(text or "")) if k]
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+@dataclass
+class NameMatch:
+    employee: dict
+    score: float
+
+
+class NameIndex:
+    """Fuzzy name lookup over a list of employee dicts (id, full_name, ...)."""
+
+    def __init__(self, employees: List[dict]) -> None:
+        self._employees = employees
+        self._keys: List[List[Set[str]]] = []
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        for i, emp in enumerate(employees):
+            grams = [_trigrams(k) for k in name_keys(emp.get("full_name") or "")]
+            self._keys.append(grams)
+            for g in set().union(*grams) if grams else ():
+                self._postings[g].add(i)
+
+    def __len__(self) -> int:
+        return len(self._employees)
+
+    def search(self, query: str, limit: int = 5, min_score: float = NAME_MATCH_MIN_SCORE) -> List[NameMatch]:
+        """Best matching employees: every query word scored against its best name word, averaged."""
+        query_grams = [_trigrams(k) for k in name_keys(query)]
+        if not query_grams:
+            return []
+        hits: Counter = Counter()
+        for g in set().union(*query_grams):
+            for i in self._postings.get(g, ()):
+                hits[i] += 1
+        matches = []
+        for i, _ in hits.most_common(_MAX_PREFILTER):
+            name_grams = self._keys[i]
+            score = sum(max(_dice(q, n) for n in name_grams) for q in query_grams) / len(query_grams)
+            if score >= min_score:
+                matches.append(NameMatch(self._employees[i], round(score, 3)))
+        matches.sort(key=lambda m: (-m.score, m.employee.get("full_name") or ""))
+        return matches[:limit]
+
+    def best(self, query: str) -> Tuple[Optional[dict], List[NameMatch]]:
+        """(employee if one candidate is clearly the answer, else None; candidates)."""
+        matches = self.search(query)
+        if matches and matches[0].score >= NAME_MATCH_ACCEPT_SCORE and (
+            len(matches) == 1 or matches[0].score - matches[1].score >= _ACCEPT_MARGIN
+        ):
+            return matches[0].employee, matches
+        return None, matches
+
+
+_index: Optional[NameIndex] = None
+_version: Optional[int] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_name_index() -> NameIndex:
+    """
+    Current index; rebuilt when the employee directory version changed. Without a snapshot the version row is
+    read at most every EMPLOYEE_SNAPSHOT_CHECK_SECONDS, so lookups do not reload the directory each time.
+    """
+    global _index, _version, _checked_at
+    from api.employees_snapshot import EMPLOYEE_SNAPSHOT_CHECK_SECONDS, get_directory_version, get_employee_snapshot
+    snapshot = get_employee_snapshot()
+    with _lock:
+        now = time.monotonic()
+        if snapshot is not None:
+            version = snapshot.version
+        elif _index is not None and now - _checked_at < EMPLOYEE_SNAPSHOT_CHECK_SECONDS:
+            return _index
+        else:
+            version = get_directory_version()
+            _checked_at = now
+        if _index is None or version != _version:
+            started = time.monotonic()
+            if snapshot is not None:
+                employees = [r.to_dict() for r in snapshot.records]
+            else:
+                from api.employees_repository import list_employees
+                employees = list_employees(limit=1_000_000)
+            _index = NameIndex(employees)
+            _version = version
+            logger.info("Name index built: %d employees in %.3fs", len(_index), time.monotonic() - started)
+        return _index
+
+
+def invalidate_name_index() -> None:
+    """Force a rebuild on the next lookup (same process)."""
+    global _index
+    with _lock:
+        _index = None
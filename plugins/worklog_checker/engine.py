@@ -0,0 +1,320 @@
+"""
+Worklog engine: period parsing, employee/team resolution through the HR table (employees.jira_worker_id),
+batched Tempo fetch with a per-(worker, date range) cache and aggregation of hours, deficit and overtime.
+
+Cache: worklogs of past ranges do not change often, so repeated queries (e.g. managers asking for
+last_week) are served from memory for WORKLOG_CACHE_HISTORY_TTL; ranges including today expire after
+WORKLOG_CACHE_TTL. Only workers missing from the cache are fetched, in one batched search.
+Norm: working days (Mon-Fri, holidays not taken into account) up to today × required hours per day.
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from plugins.worklog_checker.tempo_client import TempoClient, Worklog
+
+logger = logging.getLogger(__name__)
+
+WORKLOG_CACHE_TTL = int(os.getenv("WORKLOG_CACHE_TTL", "300"))
+WORKLOG_CACHE_HISTORY_TTL = int(os.getenv("WORKLOG_CACHE_HISTORY_TTL", "21600"))
+WORKLOG_CACHE_MAX_ENTRIES = int(os.getenv("WORKLOG_CACHE_MAX_ENTRIES", "2000"))
+DEFAULT_HOURS_PER_DAY = 8.0
+
+_RANGE_RE = re.compile(r"^\s*(\d{4}-\d{2}-\d{2})\s*/\s*(\d{4}-\d{2}-\d{2})\s*$")
+_MAX_MISSING_DAYS = 31
+_MAX_ISSUES = 20
+
+
+def parse_period(period: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """this_week | last_week | this_month | last_month | YYYY-MM-DD/YYYY-MM-DD -> (date_from, date_to). ValueError if invalid."""
+    today = today or date.today()
+    p = (period or "").strip().lower()
+    if p == "this_week":
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=6)
+    if p == "last_week":
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=6)
+    if p == "this_month":
+        start = today.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    if p == "last_month":
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+    m = _RANGE_RE.match(period or "")
+    if m:
+        date_from, date_to = date.fromisoformat(m.group(1)), date.fromisoformat(m.group(2))
+        if date_from > date_to:
+            raise ValueError("Начало периода позже конца.")
+        if (date_to - date_from).days > 366:
+            raise ValueError("Период не может быть больше года.")
+        return date_from, date_to
+    raise ValueError(
+        f"Неизвестный период «{period}». Используйте this_week, last_week, this_month, last_month "
+        "или YYYY-MM-DD/YYYY-MM-DD."
+    )
+
+
+def working_days(date_from: date, date_to: date) -> int:
+    """Mon-Fri days in [date_from, date_to], closed form (no per-day loop)."""
+    if date_to < date_from:
+        return 0
+    days = (date_to - date_from).days + 1
+    full_weeks, rest = divmod(days, 7)
+    start = date_from.weekday()
+    return full_weeks * 5 + sum(1 for i in range(rest) if (start + i) % 7 < 5)
+
+
+class WorklogCache:
+    """LRU + TTL cache of worklogs per (worker, date_from, date_to)."""
+
+    def __init__(self, max_entries: int = WORKLOG_CACHE_MAX_ENTRIES) -> None:
+        self._max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, List[Worklog]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, worker: str, date_from: str, date_to: str) -> Optional[List[Worklog]]:
+        key = (worker, date_from, date_to)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] <= time.monotonic():
+                if item is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, worker: str, date_from: str, date_to: str, worklogs: List[Worklog], ttl: float) -> None:
+        if ttl <= 0:
+            return
+        key = (worker, date_from, date_to)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, worklogs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = WorklogCache()
+
+
+def get_worklog_cache() -> WorklogCache:
+    return _cache
+
+
+def _resolve_employee(query: str) -> Tuple[Optional[dict], str]:
+    from api.employees_repository import get_employee
+    q = (query or "").strip()
+    if "@" in q:
+        return get_employee(email=q)
+    return get_employee(query=q)
+
+
+def _resolve_team(team: str) -> Tuple[List[dict], List[str]]:
+    """Team name (employees.team) or comma-separated names/emails -> (employees, not found messages)."""
+    from api.employees_repository import list_employees
+    parts = [p.strip() for p in (team or "").split(",") if p.strip()]
+    if len(parts) == 1:
+        members = list_employees(team=parts[0], limit=1000)
+        if members:
+            return members, []
+    employees: List[dict] = []
+    not_found: List[str] = []
+    for part in parts:
+        emp, err = _resolve_employee(part)
+        if emp:
+            employees.append(emp)
+        else:
+            not_found.append(f"{part}: {err}")
+    return employees, not_found
+
+
+def _aggregate_person(
+    worklogs: List[Worklog],
+    date_from: date,
+    date_to: date,
+    norm_to: date,
+    hours_per_day: float,
+    workday_mask: List[bool],
+) -> Dict[str, Any]:
+    """Hours, norm, deficit/overtime, days without logs and top issues of one worker."""
+    per_day = [0] * len(workday_mask)  # seconds by day offset from date_from
+    per_issue: Dict[str, List[Any]] = {}
+    for wl in worklogs:
+        try:
+            offset = (date.fromisoformat(wl.day) - date_from).days
+        except ValueError:
+            continue
+        if 0 <= offset < len(per_day):
+            per_day[offset] += wl.seconds
+        item = per_issue.setdefault(wl.issue_key or "—", [0, wl.issue_summary])
+        item[0] += wl.seconds
+    logged = sum(per_day) / 3600
+    required = working_days(date_from, norm_to) * hours_per_day
+    norm_days = max(0, (norm_to - date_from).days + 1)
+    missing = [
+        (date_from + timedelta(days=i)).isoformat()
+        for i in range(min(norm_days, len(per_day)))
+        if workday_mask[i] and per_day[i] == 0
+    ]
+    issues = sorted(per_issue.items(), key=lambda kv: kv[1][0], reverse=True)
+    return {
+        "logged_hours": round(logged, 2),
+        "required_hours": round(required, 2),
+        "balance_hours": round(logged - required, 2),
+        "deficit_hours": round(max(0.0, required - logged), 2),
+        "overtime_hours": round(max(0.0, logged - required), 2),
+        "days_without_logs": missing[:_MAX_MISSING_DAYS],
+        "issues": [
+            {"key": key, "summary": summary, "hours": round(seconds / 3600, 2)}
+            for key, (seconds, summary) in issues[:_MAX_ISSUES]
+        ],
+    }
+
+
+class WorklogEngine:
+    """Reports for one employee or a team; client: TempoClient (settings-based or a test stub)."""
+
+    def __init__(
+        self,
+        client: TempoClient,
+        hours_per_day: float = DEFAULT_HOURS_PER_DAY,
+        cache: Optional[WorklogCache] = None,
+        today: Optional[date] = None,
+    ) -> None:
+        self._client = client
+        self._hours_per_day = hours_per_day
+        self._cache = cache or get_worklog_cache()
+        self._today = today
+
+    async def _worker_ids(self, employees: List[dict]) -> Tuple[Dict[str, dict], List[str]]:
+        """jira_worker_id -> employee; employees without it are looked up in Jira once and saved to the HR table."""
+        from api.employees_repository import set_employees_jira_worker_ids
+        workers: Dict[str, dict] = {}
+        missing: List[dict] = []
+        for emp in employees:
+            if emp.get("jira_worker_id"):
+                workers[emp["jira_worker_id"]] = emp
+            else:
+                missing.append(emp)
+        unresolved: List[str] = []
+        if missing:
+            usernames = [(emp.get("email") or "").split("@")[0] for emp in missing]
+            keys = await asyncio.gather(*(self._client.get_user_key(u) if u else _empty() for u in usernames))
+            found = []
+            for emp, key in zip(missing, keys):
+                if key:
+                    emp = {**emp, "jira_worker_id": key}
+                    workers[key] = emp
+                    found.append((emp["id"], key))
+                else:
+                    unresolved.append(emp.get("full_name") or emp.get("email") or str(emp.get("id")))
+            if found:
+                await asyncio.to_thread(set_employees_jira_worker_ids, found)
+        return workers, unresolved
+
+    async def _fetch(self, worker_ids: List[str], date_from: date, date_to: date) -> Dict[str, List[Worklog]]:
+        """Worklogs by worker: cached ones from memory, the rest in one batched Tempo search."""
+        f, t = date_from.isoformat(), date_to.isoformat()
+        result: Dict[str, List[Worklog]] = {}
+        to_fetch = []
+        for w in worker_ids:
+            cached = self._cache.get(w, f, t)
+            if cached is None:
+                to_fetch.append(w)
+            else:
+                result[w] = cached
+        if to_fetch:
+            fetched: Dict[str, List[Worklog]] = defaultdict(list)
+            for wl in await self._client.search_worklogs(to_fetch, f, t):
+                fetched[wl.worker].append(wl)
+            ttl = WORKLOG_CACHE_HISTORY_TTL if date_to < self._today_date() else WORKLOG_CACHE_TTL
+            for w in to_fetch:
+                result[w] = fetched.get(w, [])
+                self._cache.put(w, f, t, result[w], ttl)
+        logger.debug("Worklogs %s..%s: %d cached, %d fetched", f, t, len(worker_ids) - len(to_fetch), len(to_fetch))
+        return result
+
+    def _today_date(self) -> date:
+        return self._today or date.today()
+
+    def _frame(self, period: str) -> Tuple[date, date, date, List[bool]]:
+        date_from, date_to = parse_period(period, self._today_date())
+        norm_to = min(date_to, self._today_date())
+        first = date_from.weekday()
+        mask = [(first + i) % 7 < 5 for i in range((date_to - date_from).days + 1)]
+        return date_from, date_to, norm_to, mask
+
+    async def person_report(self, employee: str, period: str) -> Dict[str, Any]:
+        """Detail for one employee (raises ValueError with a user-facing message)."""
+        date_from, date_to, norm_to, mask = self._frame(period)
+        emp, err = await asyncio.to_thread(_resolve_employee, employee)
+        if not emp:
+            raise ValueError(err or "Сотрудник не найден.")
+        workers, unresolved = await self._worker_ids([emp])
+        if unresolved:
+            raise ValueError(f"Для «{emp['full_name']}» не найден пользователь Jira (jira_worker_id).")
+        worker_id = next(iter(workers))
+        logs = (await self._fetch([worker_id], date_from, date_to))[worker_id]
+        return {
+            "employee": emp.get("full_name"),
+            "email": emp.get("email"),
+            "worker_id": worker_id,
+            "period": {"from": date_from.isoformat(), "to": date_to.isoformat()},
+            "hours_per_day": self._hours_per_day,
+            **_aggregate_person(logs, date_from, date_to, norm_to, self._hours_per_day, mask),
+        }
+
+    async def team_report(self, team: str, period: str) -> Dict[str, Any]:
+        """Summary by person and totals for a team (employees.team) or a comma-separated list."""
+        date_from, date_to, norm_to, mask = self._frame(period)
+        employees, not_found = await asyncio.to_thread(_resolve_team, team)
+        if not employees:
+            raise ValueError("Сотрудники не найдены. " + "; ".join(not_found[:10]))
+        workers, unresolved = await self._worker_ids(employees)
+        logs = await self._fetch(list(workers), date_from, date_to)
+        people = []
+        for worker_id, emp in workers.items():
+            agg = _aggregate_person(logs.get(worker_id, []), date_from, date_to, norm_to, self._hours_per_day, mask)
+            people.append({
+                "employee": emp.get("full_name"),
+                "team": emp.get("team"),
+                "logged_hours": agg["logged_hours"],
+                "required_hours": agg["required_hours"],
+                "deficit_hours": agg["deficit_hours"],
+                "overtime_hours": agg["overtime_hours"],
+                "days_without_logs": len(agg["days_without_logs"]),
+            })
+        people.sort(key=lambda p: (-p["deficit_hours"], p["employee"] or ""))
+        totals = {
+            k: round(sum(p[k] for p in people), 2)
+            for k in ("logged_hours", "required_hours", "deficit_hours", "overtime_hours")
+        }
+        return {
+            "team": team,
+            "period": {"from": date_from.isoformat(), "to": date_to.isoformat()},
+            "hours_per_day": self._hours_per_day,
+            "people_count": len(people),
+            "people": people,
+            "totals": totals,
+            "without_jira_account": unresolved,
+            "not_found": not_found,
+        }
+
+
+async def _empty() -> str:
+    return ""
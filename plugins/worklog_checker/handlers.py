@@ -1,9 +1,27 @@
 """
 Worklog Checker plugin: one tool for worklogs (detail by employee or summary by team).
-Uses single account/token for Jira and Tempo.
+Uses single account/token for Jira and Tempo; employees and teams are resolved through the HR table
+(plugins/worklog_checker/engine.py, docs/tempo_api.md).
 """
+import json
+import logging
 from typing import Optional
 
+from plugins.worklog_checker.engine import DEFAULT_HOURS_PER_DAY, WorklogEngine
+from plugins.worklog_checker.tempo_client import TempoClient, TempoError
+
+logger = logging.getLogger(__name__)
+
+PLUGIN_ID = "worklog-checker"
+
+
+def _setting_bool(value, default: bool) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
 
 async def get_worklogs(
     period: str,
@@ -17,29 +35,37 @@ async def get_worklogs(
     try:
         from tools.base import get_plugin_setting
 
-        jira_url = get_plugin_setting("worklog-checker", "jira_url")
-        api_token = get_plugin_setting("worklog-checker", "api_token")
+        jira_url = get_plugin_setting(PLUGIN_ID, "jira_url")
+        api_token = get_plugin_setting(PLUGIN_ID, "api_token")
         if not jira_url or not api_token:
             return (
                 "Worklog Checker: настройте Jira URL и API Token в разделе «Инструменты» админ-панели, "
                 "затем включите инструмент get_worklogs."
             )
-        if employee:
-            # Один сотрудник — детальная проверка (часы, дефицит/переработки, задачи)
-            # TODO: Jira user search + Tempo worklogs + required hours
-            return (
-                f"Проверка ворклогов для «{employee}» за период «{period}»: интеграция с Jira и Tempo в разработке. "
-                "Настройте плагин в админке и обновите до версии с полной поддержкой."
-            )
-        if team:
-            # Команда или список — сводка по людям
-            # TODO: team resolution + per-user worklogs + aggregation
+        if not employee and not team:
             return (
-                f"Сводка ворклогов за период «{period}» по команде/списку «{team}»: "
-                "полная интеграция в разработке. Настройте плагин в админке."
+                "Укажите employee (для детали по одному человеку) или team (для сводки по команде/списку)."
             )
-        return (
-            "Укажите employee (для детали по одному человеку) или team (для сводки по команде/списку)."
-        )
+        try:
+            hours_per_day = float(get_plugin_setting(PLUGIN_ID, "required_hours_per_day") or DEFAULT_HOURS_PER_DAY)
+        except (TypeError, ValueError):
+            hours_per_day = DEFAULT_HOURS_PER_DAY
+        async with TempoClient(
+            base_url=str(jira_url).strip(),
+            api_token=str(api_token),
+            jira_email=str(get_plugin_setting(PLUGIN_ID, "jira_email") or ""),
+            verify_ssl=_setting_bool(get_plugin_setting(PLUGIN_ID, "verify_ssl"), True),
+        ) as client:
+            engine = WorklogEngine(client, hours_per_day=hours_per_day)
+            if employee:
+                # Один сотрудник — детальная проверка (часы, дефицит/переработки, задачи)
+                report = await engine.person_report(employee, period)
+            else:
+                # Команда или список — сводка по людям
+                report = await engine.team_report(team, period)
+        return json.dumps(report, ensure_ascii=False, indent=2)
+    except (ValueError, TempoError) as e:
+        return "Ошибка: " + str(e)
     except Exception as e:
+        logger.exception("get_worklogs failed: %s", e)
         return "Ошибка: " + str(e)
@@ -0,0 +1,170 @@
+"""
+Jira / Tempo Timesheets client for worklog_checker (docs/tempo_api.md).
+One pooled httpx.AsyncClient; worklogs of many workers are fetched with
+POST /rest/tempo-timesheets/4/worklogs/search in batches of TEMPO_BATCH_SIZE workers, each batch paged
+by offset/limit (pages are de-duplicated by tempoWorklogId, so a server ignoring paging is handled too).
+Retries with backoff on 429/5xx and transport errors.
+"""
+import asyncio
+import logging
+import os
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Workers per Tempo search request and concurrent requests (docs/tempo_api.md: batch size recommendations)
+TEMPO_BATCH_SIZE = int(os.getenv("TEMPO_BATCH_SIZE", "20"))
+TEMPO_CONCURRENCY = int(os.getenv("TEMPO_CONCURRENCY", "4"))
+TEMPO_PAGE_SIZE = int(os.getenv("TEMPO_PAGE_SIZE", "1000"))
+TEMPO_MAX_RETRIES = 3
+_BACKOFF_MAX = 30.0
+
+SEARCH_PATH = "/rest/tempo-timesheets/4/worklogs/search"
+USER_PATH = "/rest/api/2/user"
+
+
+class TempoError(Exception):
+    """Jira/Tempo request failed (message is shown to the user)."""
+
+
+@dataclass(frozen=True)
+class Worklog:
+    """Compact worklog: only fields used by the aggregation (full entries are large)."""
+    id: int
+    worker: str
+    day: str  # YYYY-MM-DD
+    seconds: int
+    issue_key: str
+    issue_summary: str
+
+
+def _compact(raw: Dict[str, Any]) -> Optional[Worklog]:
+    try:
+        issue = raw.get("issue") or {}
+        return Worklog(
+            id=int(raw.get("tempoWorklogId") or raw.get("originId") or 0),
+            worker=str(raw.get("worker") or ""),
+            day=str(raw.get("started") or "")[:10],
+            seconds=int(raw.get("timeSpentSeconds") or 0),
+            issue_key=str(issue.get("key") or ""),
+            issue_summary=str(issue.get("summary") or ""),
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for i in range(0, len(items), max(1, size)):
+        yield items[i:i + size]
+
+
+class TempoClient:
+    """Async Jira/Tempo client; use as async context manager (or pass a ready httpx.AsyncClient, e.g. in tests)."""
+
+    def __init__(
+        self,
+        base_url: str = "",
+        api_token: str = "",
+        jira_email: str = "",
+        verify_ssl: bool = True,
+        client=None,
+    ) -> None:
+        self._own_client = client is None
+        if client is None:
+            import httpx
+            auth = None
+            headers = {"Accept": "application/json", "Content-Type": "application/json"}
+            if jira_email and ".atlassian.net" in base_url:
+                auth = (jira_email, api_token)  # Jira Cloud: email + API token
+            else:
+                headers["Authorization"] = f"Bearer {api_token}"  # Server / Data Center: PAT
+            client = httpx.AsyncClient(
+                base_url=base_url.rstrip("/"),
+                headers=headers,
+                auth=auth,
+                verify=verify_ssl,
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=TEMPO_CONCURRENCY, max_keepalive_connections=TEMPO_CONCURRENCY),
+            )
+        self._client = client
+        self._semaphore = asyncio.Semaphore(max(1, TEMPO_CONCURRENCY))
+
+    async def __aenter__(self) -> "TempoClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._own_client:
+            await self._client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs):
+        import httpx
+        async with self._semaphore:
+            for attempt in range(TEMPO_MAX_RETRIES + 1):
+                try:
+                    r = await self._client.request(method, path, **kwargs)
+                except httpx.TransportError as e:
+                    if attempt == TEMPO_MAX_RETRIES:
+                        raise TempoError(f"Jira/Tempo недоступен: {e!s}") from e
+                    await asyncio.sleep(min(_BACKOFF_MAX, 2 ** attempt) * (0.5 + random.random() / 2))
+                    continue
+                if (r.status_code == 429 or r.status_code >= 500) and attempt < TEMPO_MAX_RETRIES:
+                    retry_after = r.headers.get("Retry-After")
+                    try:
+                        delay = float(retry_after) if retry_after else 2 ** attempt
+                    except ValueError:
+                        delay = 2 ** attempt
+                    await asyncio.sleep(min(_BACKOFF_MAX, max(0.0, delay)))
+                    continue
+                return r
+
+    async def get_user_key(self, username: str) -> str:
+        """Jira userKey (JIRAUSER...) for a login, or empty string if not found."""
+        r = await self._request("GET", USER_PATH, params={"username": username})
+        if r.status_code != 200:
+            return ""
+        try:
+            return (r.json().get("key") or "").strip()
+        except ValueError:
+            return ""
+
+    async def _search_batch(self, workers: List[str], date_from: str, date_to: str) -> List[Worklog]:
+        result: List[Worklog] = []
+        seen = set()
+        offset = 0
+        while True:
+            body = {"from": date_from, "to": date_to, "worker": workers, "offset": offset, "limit": TEMPO_PAGE_SIZE}
+            r = await self._request("POST", SEARCH_PATH, json=body)
+            if r.status_code in (401, 403):
+                raise TempoError(f"Tempo: нет доступа к ворклогам (HTTP {r.status_code}). Проверьте API Token.")
+            if r.status_code != 200:
+                raise TempoError(f"Tempo: HTTP {r.status_code} {r.text[:200]}")
+            page = r.json()
+            if isinstance(page, dict):  # paged envelope {results: [...]}
+                page = page.get("results") or []
+            new = 0
+            for raw in page:
+                wl = _compact(raw)
+                key = wl.id or wl if wl is not None else None
+                if key is None or key in seen:
+                    continue
+                seen.add(key)
+                result.append(wl)
+                new += 1
+            if len(page) < TEMPO_PAGE_SIZE or new == 0:
+                return result
+            offset += len(page)
+
+    async def search_worklogs(self, workers: List[str], date_from: str, date_to: str) -> List[Worklog]:
+        """Worklogs of all workers for [date_from, date_to]: concurrent batched, paged searches."""
+        workers = sorted(set(w for w in workers if w))
+        if not workers:
+            return []
+        batches = await asyncio.gather(
+            *(self._search_batch(chunk, date_from, date_to) for chunk in _chunks(workers, TEMPO_BATCH_SIZE))
+        )
+        return [wl for batch in batches for wl in batch]
@@ -250,3 +250,44 @@ def test_patch_llm_no_row(client):
     clear_llm_settings()
     r = client.patch("/api/settings/llm", json={"modelType": "gpt-4o"})
     assert r.status_code == 400
+
+
+def test_llm_settings_decrypted_cache_and_invalidation(client, monkeypatch):
+    """get_llm_settings_decrypted is served from cache; local writes invalidate it, remote writes are polled."""
+    import api.settings_repository as repo
+    from api.db import LLMSettingsModel, SessionLocal
+
+    repo.clear_llm_settings()
+    repo.save_llm_settings(
+        llm_type="openai",
+        api_key="sk-cache-test-12345",
+        base_url="https://api.openai.com/v1",
+        model_type="gpt-4o-mini",
+        system_prompt="Prompt A",
+        connection_status="success",
+        is_active=True,
+    )
+    monkeypatch.setattr(repo, "SETTINGS_CACHE_POLL_SECONDS", 3600)
+    first = repo.get_llm_settings_decrypted()
+    assert first["api_key"] == "sk-cache-test-12345"
+    assert first["system_prompt"] == "Prompt A"
+
+    # Write bypassing the repository (as another process would): cache still serves old value
+    with SessionLocal() as session:
+        row = session.query(LLMSettingsModel).first()
+        row.system_prompt = "Prompt B"
+        session.commit()
+    assert repo.get_llm_settings_decrypted()["system_prompt"] == "Prompt A"
+    # After the poll interval the version (updated_at) check picks up the change
+    monkeypatch.setattr(repo, "SETTINGS_CACHE_POLL_SECONDS", 0)
+    assert repo.get_llm_settings_decrypted()["system_prompt"] == "Prompt B"
+
+    # Writes through the repository invalidate immediately
+    monkeypatch.setattr(repo, "SETTINGS_CACHE_POLL_SECONDS", 3600)
+    repo.set_llm_active(False)
+    assert repo.get_llm_settings_decrypted() is None
+    # The tool-calling system prompt does not depend on the active flag
+    from bot.tool_calling import get_system_prompt_for_tools
+    assert repo.get_llm_system_prompt() == "Prompt B"
+    assert get_system_prompt_for_tools() == "Prompt B"
+    repo.clear_llm_settings()
@@ -0,0 +1,56 @@
+"""Tests for bot.context_window (token-budgeted history)."""
+from bot.context_window import (
+    build_context,
+    count_message_tokens,
+    count_text_tokens,
+    estimate_text_tokens,
+)
+
+
+def test_estimator_counts_cyrillic_heavier():
+    assert estimate_text_tokens("") == 0
+    latin = estimate_text_tokens("a" * 300, "anthropic")
+    cyrillic = estimate_text_tokens("я" * 300, "anthropic")
+    assert cyrillic > latin
+
+
+def test_token_counts_are_memoized():
+    text = "сообщение для кэша " * 10
+    count_text_tokens.cache_clear()
+    count_text_tokens(text, "yandex")
+    count_text_tokens(text, "yandex")
+    assert count_text_tokens.cache_info().hits == 1
+
+
+def test_build_context_keeps_newest_turns_within_budget():
+    history = []
+    for i in range(10):
+        history.append({"role": "user", "content": f"вопрос {i} " + "x" * 400})
+        history.append({"role": "assistant", "content": f"ответ {i} " + "y" * 400})
+    turn = count_message_tokens(history[-2], "yandex") + count_message_tokens(history[-1], "yandex")
+    fixed = count_message_tokens({"role": "system", "content": "sys"}, "yandex") + count_message_tokens(
+        {"role": "user", "content": "new"}, "yandex"
+    )
+    messages = build_context(
+        "sys", history, "new", provider="yandex",
+        max_tokens=fixed + 3 * turn + 100, completion_tokens=100,
+    )
+    assert messages[0] == {"role": "system", "content": "sys"}
+    assert messages[-1] == {"role": "user", "content": "new"}
+    kept = messages[1:-1]
+    assert len(kept) == 6
+    assert kept[0]["content"].startswith("вопрос 7")
+    assert kept[-1]["content"].startswith("ответ 9")
+
+
+def test_build_context_drops_orphaned_assistant_and_reserves_tools():
+    history = [
+        {"role": "user", "content": "q" * 4000},
+        {"role": "assistant", "content": "short answer"},
+    ]
+    messages = build_context("sys", history, "new", provider="openai", max_tokens=600, completion_tokens=100)
+    assert [m["role"] for m in messages] == ["system", "user"]
+    full = build_context("sys", history[1:], "new", max_tokens=600, completion_tokens=100)
+    assert len(full) == 2
+    reserved = build_context("sys", [], "new", max_tokens=600, completion_tokens=100, reserve_tokens=10_000)
+    assert len(reserved) == 2
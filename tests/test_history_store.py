@@ -0,0 +1,131 @@
+"""Tests for bot.history_store (LRU memory tier + write-behind DB tier)."""
+import os
+import tempfile
+
+import pytest
+
+# Set before any api import
+_test_db = os.path.join(tempfile.gettempdir(), "lo_tg_bot_test_history.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_test_db}")
+
+from bot.history_store import ChatHistoryStore
+
+
+def _turn(i: int) -> list:
+    return [{"role": "user", "content": f"q{i}"}, {"role": "assistant", "content": f"a{i}"}]
+
+
+@pytest.mark.asyncio
+async def test_memory_lru_and_message_cap():
+    """Least recently used chat is evicted; per-chat history keeps the last max_messages."""
+    store = ChatHistoryStore(max_chats=2, max_messages=4, persistent=False)
+    for i in range(3):
+        await store.append(1, _turn(i))
+    assert [m["content"] for m in await store.get(1)] == ["q1", "a1", "q2", "a2"]
+    await store.append(2, _turn(0))
+    await store.get(1)  # touch: chat 2 becomes least recently used
+    await store.append(3, _turn(0))
+    assert len(store) == 2
+    assert await store.get(2) == []
+    assert len(await store.get(1)) == 4
+
+
+@pytest.mark.asyncio
+async def test_ttl_expires_chat():
+    store = ChatHistoryStore(ttl_seconds=60, persistent=False)
+    await store.append(1, _turn(0))
+    store._chats[1].touched_at -= 120
+    assert await store.get(1) == []
+    assert len(store) == 0
+
+
+@pytest.mark.asyncio
+async def test_write_behind_survives_eviction_and_restart():
+    """Flushed history is read back after eviction and by a new store (bot restart)."""
+    chat_id = 987654321
+    store = ChatHistoryStore(max_chats=1, max_messages=4, persistent=True, flush_interval=60)
+    await store.clear(chat_id)
+    for i in range(3):
+        await store.append(chat_id, _turn(i))
+    await store.append(chat_id + 1, _turn(9))  # evicts chat_id before any flush
+    assert [m["content"] for m in await store.get(chat_id)] == ["q1", "a1", "q2", "a2"]
+    await store.close()
+
+    restarted = ChatHistoryStore(max_messages=4, persistent=True)
+    assert [m["content"] for m in await restarted.get(chat_id)] == ["q1", "a1", "q2", "a2"]
+    await restarted.clear(chat_id)
+    await restarted.clear(chat_id + 1)
+    assert await restarted.get(chat_id) == []
+    await restarted.close()
+
+
+@pytest.mark.asyncio
+async def test_summarizer_compacts_old_turns(monkeypatch):
+    """Turns outside the verbatim window are replaced by a rolling summary; the prompt gets it after system."""
+    import bot.llm
+    from bot.context_window import build_context
+    from bot.summarizer import ConversationSummarizer
+
+    prompts = []
+
+    async def fake_get_reply(messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        return f"summary {len(prompts)}", None
+
+    monkeypatch.setattr(bot.llm, "get_reply", fake_get_reply)
+    store = ChatHistoryStore(max_messages=100, persistent=False)
+    summarizer = ConversationSummarizer(store=store, keep_tokens=40, min_messages=4)
+    for i in range(6):
+        await store.append(1, _turn(i))
+    assert await summarizer.summarize(1) is True
+    history = await store.get(1)
+    assert 0 < len(history) < 12
+    assert history[-1]["content"] == "a5"
+    assert await store.get_summary(1) == "summary 1"
+    assert "q0" in prompts[0]
+
+    for i in range(6, 12):
+        await store.append(1, _turn(i))
+    assert await summarizer.summarize(1) is True
+    assert "summary 1" in prompts[1]  # previous summary is rolled into the new one
+    messages = build_context("sys", await store.get(1), "new", summary=await store.get_summary(1))
+    assert messages[1]["role"] == "system" and messages[1]["content"].endswith("summary 2")
+
+
+@pytest.mark.asyncio
+async def test_summarizer_keeps_turns_appended_while_condensing(monkeypatch):
+    """Messages appended during the LLM call (pushing summarized ones out over the cap) are never dropped."""
+    import bot.llm
+    from bot.summarizer import ConversationSummarizer
+
+    store = ChatHistoryStore(max_messages=8, persistent=False)
+    prompts = []
+
+    async def fake_get_reply(messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        for i in (4, 5):
+            await store.append(1, _turn(i))
+        return "summary", None
+
+    monkeypatch.setattr(bot.llm, "get_reply", fake_get_reply)
+    summarizer = ConversationSummarizer(store=store, keep_tokens=5, min_messages=4)
+    for i in range(4):
+        await store.append(1, _turn(i))
+    assert await summarizer.summarize(1) is True
+    assert "a3" in prompts[0] and "q4" not in prompts[0]
+    # q0..a3 were summarized (q0..a1 already pushed out by the cap); q4..a5 came later and stay
+    assert [m["content"] for m in await store.get(1)] == ["q4", "a4", "q5", "a5"]
+
+
+@pytest.mark.asyncio
+async def test_memory_expiry_does_not_delete_persisted_history():
+    """An expired memory entry is evicted and re-read from the DB; DB rows are not deleted by the eviction."""
+    chat_id = 987654300
+    store = ChatHistoryStore(max_messages=4, ttl_seconds=3600, persistent=True, flush_interval=60)
+    await store.clear(chat_id)
+    await store.append(chat_id, _turn(0))
+    await store.flush()
+    store._chats[chat_id].touched_at -= 7200  # memory entry idle past TTL; DB rows are fresh
+    assert [m["content"] for m in await store.get(chat_id)] == ["q0", "a0"]
+    await store.clear(chat_id)
+    await store.close()
@@ -70,3 +70,447 @@ def test_employees_repository_create_and_get():
     items = list_employees(view="all")
     assert len(items) >= 1
     assert any(r["personal_number"] == "T001" for r in items)
+
+
+def _write_hr_xlsx(path, ddj_rows, infokom_rows):
+    import openpyxl
+    wb = openpyxl.Workbook()
+    ddj = wb.active
+    ddj.title = "ДДЖ"
+    ddj.append(["Табельный номер", "ФИО", "Должность", "Почта"])
+    for row in ddj_rows:
+        ddj.append(row)
+    inf = wb.create_sheet("Инфоком")
+    inf.append(["Табельный №", "Табельный номер", "Почта"])
+    for row in infokom_rows:
+        inf.append(row)
+    wb.save(path)
+
+
+def test_import_employees_streams_both_sheets_and_rejects_duplicates(tmp_path):
+    """Both sheets are imported in one streamed pass; a duplicate personal number rejects the whole file."""
+    from api.db import init_db
+    from api.employees_repository import delete_employees, get_employee_by_personal_number
+    from plugins.hr_service.import_excel import import_employees_from_file
+
+    init_db()
+    numbers = ["IMP001", "IMP002", "IMP003"]
+    try:
+        dup = tmp_path / "dup.xlsx"
+        _write_hr_xlsx(dup, [["IMP001", "Иванов Иван", "dev", "ivanov@example.com"]], [["IMP001", "Иванов И.", "x@example.com"]])
+        result = import_employees_from_file(str(dup))
+        assert isinstance(result, str) and "both sheets" in result
+        assert get_employee_by_personal_number("IMP001") is None
+
+        ok = tmp_path / "ok.xlsx"
+        _write_hr_xlsx(
+            ok,
+            [["IMP001", "Иванов Иван", "dev", "ivanov@example.com"], [None, "Без номера", "", ""]],
+            [["IMP002", "Петров Пётр", "petrov@example.com"], ["IMP003", "Сидоров", None]],
+        )
+        result = import_employees_from_file(str(ok))
+        assert result["added_count"] == 2
+        assert result["added_names"] == ["Иванов Иван", "Петров Пётр"]
+        assert any("row 3: missing personal number" in e for e in result["errors"])
+        assert any("IMP003" in e and "missing email" in e for e in result["errors"])
+        assert get_employee_by_personal_number("IMP002")["email"] == "petrov@example.com"
+        assert import_employees_from_file(str(ok))["added_count"] == 0  # existing employees are skipped
+    finally:
+        delete_employees(numbers)
+
+
+def test_bulk_import_employees_one_transaction_update_mode_and_row_errors():
+    """Invalid rows are reported without aborting the batch; update_existing changes only changed fields."""
+    from api.db import init_db
+    from api.employees_repository import bulk_import_employees, delete_employees, get_employee_by_personal_number
+
+    init_db()
+    numbers = ["BLK001", "BLK002", "BLK003"]
+    try:
+        result = bulk_import_employees(
+            [
+                {"personal_number": "BLK001", "full_name": "Первый", "email": "first@example.com"},
+                {"personal_number": "BLK002", "full_name": "Без почты", "email": ""},
+                {"personal_number": "BLK003", "full_name": "Х" * 600, "email": "long@example.com"},
+            ],
+            chunk_size=2,
+        )
+        assert result["inserted"] == 1 and result["inserted_names"] == ["Первый"]
+        assert len(result["errors"]) == 2
+
+        again = [{"personal_number": "BLK001", "full_name": "Первый", "email": "new@example.com", "mvz": ""}]
+        assert bulk_import_employees(again)["skipped"] == 1
+        assert get_employee_by_personal_number("BLK001")["email"] == "first@example.com"
+        updated = bulk_import_employees(again, update_existing=True)
+        assert updated["updated"] == 1 and updated["inserted"] == 0
+        assert get_employee_by_personal_number("BLK001")["email"] == "new@example.com"
+
+        def failing():
+            yield {"personal_number": "BLK002", "full_name": "Второй", "email": "second@example.com"}
+            raise RuntimeError("broken file")
+
+        with pytest.raises(RuntimeError):
+            bulk_import_employees(failing(), chunk_size=1)
+        assert get_employee_by_personal_number("BLK002") is None  # rolled back with the whole import
+    finally:
+        delete_employees(numbers)
+
+
+@pytest.mark.asyncio
+async def test_jira_enrichment_async_retries_429_and_writes_in_bulk():
+    """Keys are looked up concurrently through one client (429 retried) and written to jira_worker_id."""
+    import httpx
+
+    from api.db import init_db
+    from api.employees_repository import bulk_import_employees, delete_employees, get_employee_by_personal_number
+    from plugins.hr_service.jira_enrichment import EnrichmentProgress, enrich_employees_jira_async
+
+    init_db()
+    numbers = ["JRA001", "JRA002"]
+    calls = []
+
+    def handler(request):
+        username = request.url.params["username"]
+        calls.append(username)
+        if username == "anna" and calls.count("anna") == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        if username == "anna":
+            return httpx.Response(200, json={"key": "JIRAUSER1"})
+        return httpx.Response(404)
+
+    try:
+        imported = bulk_import_employees([
+            {"personal_number": "JRA001", "full_name": "Анна", "email": "anna@example.com"},
+            {"personal_number": "JRA002", "full_name": "Борис", "email": "boris@example.com"},
+        ])
+        progress = EnrichmentProgress()
+        async with httpx.AsyncClient(base_url="http://jira", transport=httpx.MockTransport(handler)) as client:
+            enriched, errors = await enrich_employees_jira_async(imported["inserted_ids"], progress=progress, client=client)
+        assert enriched == 1 and len(errors) == 1 and "boris@example.com" in errors[0]
+        assert calls.count("anna") == 2
+        assert progress.total == progress.processed == 2
+        assert get_employee_by_personal_number("JRA001")["jira_worker_id"] == "JIRAUSER1"
+        assert get_employee_by_personal_number("JRA002")["jira_worker_id"] is None
+    finally:
+        delete_employees(numbers)
+
+
+@pytest.mark.asyncio
+async def test_hr_import_runs_as_background_job(tmp_path):
+    """The import is queued, claimed by a worker pool and its result stored in the job; staged file is removed."""
+    import asyncio
+
+    from api.db import init_db
+    from api.employees_repository import delete_employees, get_employee_by_personal_number
+    from api.jobs import JobWorkerPool, enqueue_job, stage_job_file
+    from api.jobs_repository import get_job
+
+    init_db()
+    src = tmp_path / "job.xlsx"
+    _write_hr_xlsx(src, [["JOB001", "Орлов Олег", "dev", "orlov@example.com"]], [])
+    job_file = stage_job_file(str(src))
+    pool = JobWorkerPool(workers=1, poll_seconds=0.05)
+    try:
+        pool.start()
+        job = enqueue_job("hr_import", {"file_path": job_file, "update_existing": False})
+        for _ in range(200):
+            job = get_job(job["id"])
+            if job["status"] not in ("pending", "running"):
+                break
+            await asyncio.sleep(0.05)
+        assert job["status"] == "done", job
+        assert job["result"]["added_count"] == 1
+        assert "added_ids" not in job["result"]
+        assert "Добавлено сотрудников: 1" in job["result"]["summary"]
+        assert get_employee_by_personal_number("JOB001") is not None
+        assert not os.path.exists(job_file)
+    finally:
+        await pool.stop()
+        delete_employees(["JOB001"])
+
+
+def test_jobs_api_cancel_pending_job(client):
+    """A pending job is cancelled at once; a finished one cannot be cancelled again."""
+    from api.jobs_repository import create_job
+
+    job = create_job("hr_import", {"file_path": "/nonexistent.xlsx"})
+    r = client.get(f"/api/jobs/{job['id']}")
+    assert r.status_code == 200 and r.json()["status"] == "pending"
+    r = client.post(f"/api/jobs/{job['id']}/cancel")
+    assert r.status_code == 200 and r.json()["status"] == "cancelled"
+    assert client.post(f"/api/jobs/{job['id']}/cancel").status_code == 409
+    assert any(j["id"] == job["id"] for j in client.get("/api/jobs?kind=hr_import").json())
+    assert client.get("/api/jobs/unknown").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_job_interrupted_by_pool_stop_is_recorded_as_failed():
+    """Stopping the pool cancels a running job and records it as failed without blocking the loop."""
+    import asyncio
+
+    from api.db import init_db
+    from api.jobs import JobWorkerPool, enqueue_job, register_job_handler
+    from api.jobs_repository import get_job
+
+    async def _forever(ctx):
+        await asyncio.sleep(3600)
+
+    init_db()
+    register_job_handler("test_forever", "Test", _forever)
+    pool = JobWorkerPool(workers=1, poll_seconds=0.05)
+    pool.start()
+    job = enqueue_job("test_forever")
+    for _ in range(100):
+        if get_job(job["id"])["status"] == "running":
+            break
+        await asyncio.sleep(0.05)
+    await pool.stop()
+    job = get_job(job["id"])
+    assert job["status"] == "failed" and "worker stopped" in job["error"]
+
+
+@pytest.mark.asyncio
+async def test_cooperative_job_cancel_lets_the_thread_stop_itself():
+    """A cancel of a thread-backed handler only sets ctx.cancelled: the handler waits for its thread and cleans up."""
+    import asyncio
+    import threading
+    import time
+
+    from api.db import init_db
+    from api.jobs import JobWorkerPool, enqueue_job, register_job_handler
+    from api.jobs_repository import get_job, request_job_cancel
+
+    thread_stopped = threading.Event()
+    cleaned_up = []
+
+    def _work(ctx):
+        try:
+            while True:
+                ctx.check_cancelled()
+                time.sleep(0.05)
+        finally:
+            thread_stopped.set()
+
+    async def _threaded(ctx):
+        try:
+            return await asyncio.to_thread(_work, ctx)
+        finally:
+            cleaned_up.append(thread_stopped.is_set())
+
+    init_db()
+    register_job_handler("test_threaded", "Test", _threaded, cooperative_cancel=True)
+    pool = JobWorkerPool(workers=1, poll_seconds=0.05)
+    pool.start()
+    try:
+        job = enqueue_job("test_threaded")
+        for _ in range(100):
+            if get_job(job["id"])["status"] == "running":
+                break
+            await asyncio.sleep(0.05)
+        request_job_cancel(job["id"])
+        for _ in range(100):
+            job = get_job(job["id"])
+            if job["status"] not in ("pending", "running"):
+                break
+            await asyncio.sleep(0.05)
+        assert job["status"] == "cancelled"
+        # Cleanup ran after the thread stopped (not when a task cancel abandoned it)
+        assert cleaned_up == [True]
+    finally:
+        await pool.stop()
+
+
+def test_admin_edit_invalidates_tool_cache_of_other_process(client):
+    """PATCH in the API process publishes the invalidation; another process's cache drops hr entries on its poll."""
+    from api.employees_repository import bulk_import_employees, delete_employees, get_employee_by_personal_number
+    from tools.models import ToolDefinition
+    from tools.result_cache import ToolResultCache
+
+    hr_tool = ToolDefinition(name="hr", description="", plugin_id="hr_service", cache_ttl=120)
+    other_tool = ToolDefinition(name="calc", description="", plugin_id="calculator", cache_ttl=120)
+    bot_cache = ToolResultCache()  # stands for the bot process
+    try:
+        bulk_import_employees([{"personal_number": "TCC001", "full_name": "Кэшев Иван", "email": "tcc@example.com"}])
+        bot_cache.sync_control()
+        bot_cache.put("hr-key", "cached employee", hr_tool)
+        bot_cache.put("calc-key", "4", other_tool)
+
+        emp = get_employee_by_personal_number("TCC001")
+        assert client.patch(f"/api/hr/employees/{emp['id']}", json={"team": "Кэш"}).status_code == 200
+        bot_cache.sync_control()
+        assert bot_cache.get("hr-key", "hr") is None
+        assert bot_cache.get("calc-key", "calc") == "4"
+
+        stats = client.get("/api/tools/cache/stats").json()
+        assert stats["processes"] and stats["size"] >= 1
+        purged = client.delete("/api/tools/cache").json()
+        assert purged["generations"]["*"] >= 1
+        bot_cache.sync_control()
+        assert bot_cache.get("calc-key", "calc") is None
+    finally:
+        delete_employees(["TCC001"])
+
+
+def test_employee_search_index_stems_ranks_and_stays_in_sync():
+    """Full-text search: inflected and ё forms, prefix words, name ranked above position; index follows writes."""
+    from api.db import init_db
+    from api.employees_repository import (
+        bulk_import_employees,
+        delete_employees,
+        find_employees_by_name,
+        get_employee_by_personal_number,
+        search_employees,
+        update_employee,
+    )
+
+    init_db()
+    numbers = ["FTS001", "FTS002", "FTS003"]
+    try:
+        bulk_import_employees([
+            {"personal_number": "FTS001", "full_name": "Фёдорова Алёна", "email": "fedorova@example.com", "position": "Аналитик"},
+            {"personal_number": "FTS002", "full_name": "Аналитиков Пётр", "email": "petr@example.com", "position": "Разработчик"},
+            {"personal_number": "FTS003", "full_name": "Громов Семён", "email": "gromov@example.com", "position": "Аналитик"},
+        ])
+        assert [e["personal_number"] for e in find_employees_by_name("Федоровой")] == ["FTS001"]
+        assert [e["personal_number"] for e in find_employees_by_name("алена фед")] == ["FTS001"]
+        found = [e["personal_number"] for e in search_employees("аналитика")]
+        assert found[0] == "FTS002" and set(found) == {"FTS001", "FTS002", "FTS003"}
+        assert [e["personal_number"] for e in search_employees("gromov@example")] == ["FTS003"]
+
+        emp = get_employee_by_personal_number("FTS003")
+        update_employee(emp["id"], {"team": "Платформа", "position": "Архитектор"})
+        assert [e["personal_number"] for e in search_employees("платформы")] == ["FTS003"]
+        assert {e["personal_number"] for e in search_employees("аналитик")} == {"FTS001", "FTS002"}
+        delete_employees(["FTS002"])
+        assert search_employees("аналитиков") == []
+    finally:
+        delete_employees(numbers)
+
+
+def test_employee_snapshot_serves_reads_and_follows_directory_version(monkeypatch):
+    """Reads come from the in-memory snapshot; a write or a version bump from another process reloads it."""
+    from sqlalchemy import update
+
+    from api import employees_snapshot
+    from api.db import EmployeeDirectoryVersionModel, SessionLocal, init_db
+    from api.employees_repository import (
+        bulk_import_employees,
+        delete_employees,
+        get_employee_by_jira_worker_id,
+        get_employee_by_personal_number,
+        list_employees,
+        set_employees_jira_worker_ids,
+    )
+
+    init_db()
+    numbers = ["SNP001", "SNP002"]
+    try:
+        bulk_import_employees([
+            {"personal_number": "SNP001", "full_name": "Снапшотов Олег", "email": "oleg@example.com", "mvz": "SNP-MVZ"},
+            {"personal_number": "SNP002", "full_name": "Снапшотова Ира", "email": "ira@example.com", "mvz": "SNP-MVZ"},
+        ])
+        snapshot = employees_snapshot.get_employee_snapshot()
+        emp = get_employee_by_personal_number("SNP001")
+        assert emp["id"] in snapshot.by_id and emp["full_name"] == "Снапшотов Олег"
+        assert [e["personal_number"] for e in list_employees(mvz="snp-mvz")] == ["SNP001", "SNP002"]
+
+        set_employees_jira_worker_ids([(emp["id"], "JIRASNP1")])  # own write: snapshot dropped on commit
+        assert get_employee_by_jira_worker_id("JIRASNP1")["personal_number"] == "SNP001"
+        current = employees_snapshot.get_employee_snapshot()
+        assert current is employees_snapshot.get_employee_snapshot()
+
+        monkeypatch.setattr(employees_snapshot, "EMPLOYEE_SNAPSHOT_CHECK_SECONDS", 0)
+        with SessionLocal() as session:  # another process bumped the version
+            session.execute(update(EmployeeDirectoryVersionModel).values(version=EmployeeDirectoryVersionModel.version + 1))
+            session.commit()
+        assert employees_snapshot.get_employee_snapshot().version == current.version + 1
+    finally:
+        delete_employees(numbers)
+    assert get_employee_by_personal_number("SNP001") is None
+
+
+def test_name_index_latin_typos_and_case_forms():
+    """Fuzzy name lookup: Latin spelling, dative/genitive forms and a typo find the same employee."""
+    from plugins.hr_service.name_index import NameIndex, name_key
+
+    assert name_key("Иванову") == name_key("ivanov") == name_key("Ivanova")
+    assert name_key("Хабибуллин") == name_key("Habibullin")
+    index = NameIndex([
+        {"id": 1, "full_name": "Иванов Сергей Петрович"},
+        {"id": 2, "full_name": "Иванова Анна Сергеевна"},
+        {"id": 3, "full_name": "Щукин Юрий Алексеевич"},
+        {"id": 4, "full_name": "Петров Иван Иванович"},
+    ])
+    assert index.search("ivanov sergey")[0].employee["id"] == 1
+    assert index.search("Ивановой Анне")[0].employee["id"] == 2
+    assert index.search("Shchukin Yuri")[0].employee["id"] == 3
+    assert index.search("Schukin Iurii")[0].employee["id"] == 3
+    emp, matches = index.best("Щукину")
+    assert emp is not None and emp["id"] == 3
+    emp, matches = index.best("Иванов")  # two Ivanovs: no single answer, both offered
+    assert emp is None and {m.employee["id"] for m in matches[:2]} == {1, 2}
+    assert index.search("Zzzz") == []
+
+
+@pytest.mark.asyncio
+async def test_hr_get_employee_returns_fuzzy_match_in_one_call():
+    """get_employee with a Latin/misspelled name answers with the employee (or candidates), not 'not found'."""
+    import json
+    from pathlib import Path
+
+    import yaml
+
+    from api.db import init_db
+    from api.employees_repository import bulk_import_employees, delete_employees
+    from plugins.hr_service.handlers import hr_dispatch
+    from plugins.hr_service.name_index import invalidate_name_index
+    from tools.models import ToolDefinition
+    from tools.result_shaping import shape_result
+
+    init_db()
+    try:
+        bulk_import_employees([
+            {"personal_number": "FZY001", "full_name": "Закиров Тимур", "email": "zakirov@example.com"},
+        ])
+        invalidate_name_index()
+        content = hr_dispatch(action="get_employee", query="Zakirov Timur")
+        data = json.loads(content)
+        assert data["match"] == "fuzzy" and data["score"] > 0
+        assert data["employee"]["personal_number"] == "FZY001"
+        # The wrapper has no employee column: projection keeps it and projects the employee inside
+        manifest = Path(__file__).parent.parent / "plugins" / "hr_service" / "plugin.yaml"
+        result_fields = yaml.safe_load(manifest.read_text(encoding="utf-8"))["tools"][0]["result_fields"]
+        hr_tool = ToolDefinition(name="hr", description="", plugin_id="hr_service", result_fields=result_fields)
+        shaped = json.loads(shape_result(hr_tool, {"action": "get_employee"}, content).content)
+        assert shaped["match"] == "fuzzy" and "id" not in shaped["employee"]
+        data = json.loads(hr_dispatch(action="search_employees", query="Zakirof"))
+        assert data["candidates"][0]["personal_number"] == "FZY001"
+    finally:
+        delete_employees(["FZY001"])
+        invalidate_name_index()
+
+
+def test_name_index_without_snapshot_rebuilds_only_on_directory_change(monkeypatch):
+    """EMPLOYEE_SNAPSHOT_ENABLED=false: lookups reuse the index until the directory version row changes."""
+    import api.employees_repository as employees_repo
+    import api.employees_snapshot as snapshot_mod
+    import plugins.hr_service.name_index as name_index
+    from api.db import init_db
+
+    init_db()
+    loads = []
+    list_employees = employees_repo.list_employees
+    monkeypatch.setattr(snapshot_mod, "EMPLOYEE_SNAPSHOT_ENABLED", False)
+    monkeypatch.setattr(snapshot_mod, "EMPLOYEE_SNAPSHOT_CHECK_SECONDS", 0)
+    monkeypatch.setattr(employees_repo, "list_employees", lambda **kw: loads.append(1) or list_employees(**kw))
+    try:
+        name_index.invalidate_name_index()
+        first = name_index.get_name_index()
+        assert name_index.get_name_index() is first and len(loads) == 1
+        employees_repo.bulk_import_employees([
+            {"personal_number": "NIX001", "full_name": "Пример Петр", "email": "nix@example.com"},
+        ])
+        assert name_index.get_name_index() is not first and len(loads) == 2
+    finally:
+        employees_repo.delete_employees(["NIX001"])
+        name_index.invalidate_name_index()
@@ -1,4 +1,5 @@
 """Tests for bot.llm."""
+import asyncio
 from unittest.mock import AsyncMock, patch
 
 import pytest
@@ -51,3 +52,151 @@ async def test_get_reply_uses_active_provider_and_model():
     call_args = mock_groq.call_args[0]
     assert call_args[1] == "llama-3.3-70b"
     assert call_args[2]["api_key"] == "grok"
+
+
+@pytest.mark.asyncio
+async def test_client_manager_reuses_client_for_same_settings():
+    from bot.llm_clients import LLMClientManager
+
+    manager = LLMClientManager()
+    kwargs = {"api_key": "sk-test", "base_url": "https://api.example.com/v1"}
+    first = manager.get_openai("openai", kwargs)
+    second = manager.get_openai("openai", dict(kwargs))
+    assert first is second
+    assert len(manager) == 1
+    await manager.aclose()
+    assert len(manager) == 0
+
+
+@pytest.mark.asyncio
+async def test_client_manager_replaces_client_on_settings_change():
+    from bot.llm_clients import LLMClientManager
+
+    manager = LLMClientManager()
+    old = manager.get_openai("openai", {"api_key": "sk-old", "base_url": "https://api.example.com/v1"})
+    new = manager.get_openai("openai", {"api_key": "sk-new", "base_url": "https://api.example.com/v1"})
+    assert old is not new
+    assert len(manager) == 1
+    # The replaced client stays open for calls still running on it (closed after its grace period)
+    await asyncio.sleep(0)
+    assert not old.is_closed()
+    groq = manager.get_openai("groq", {"api_key": "gsk", "base_url": "https://api.groq.com/openai/v1"})
+    assert groq is not new
+    assert len(manager) == 2
+    manager.invalidate(provider="groq")
+    assert len(manager) == 1
+    await manager.aclose()
+    assert old.is_closed() and groq.is_closed()
+
+
+@pytest.mark.asyncio
+async def test_get_reply_streams_deltas():
+    deltas = []
+
+    async def on_delta(text):
+        deltas.append(text)
+
+    async def fake_stream(messages, model, kwargs, on_delta, tools=None, tool_choice="auto"):
+        for part in ("Hel", "lo"):
+            await on_delta(part)
+        return ("Hello", None)
+
+    with patch.object(llm, "get_active_llm", return_value=("openai", "gpt-4o-mini", {"api_key": "sk-test"})):
+        with patch.dict(llm._STREAM_HANDLERS, {"openai": fake_stream}):
+            content, tool_calls = await llm.get_reply([{"role": "user", "content": "Hi"}], on_delta=on_delta)
+    assert content == "Hello"
+    assert tool_calls is None
+    assert deltas == ["Hel", "lo"]
+
+
+@pytest.mark.asyncio
+async def test_get_reply_stream_fallback_single_delta():
+    """Provider without streaming handler delivers the whole answer as one delta."""
+    deltas = []
+
+    async def on_delta(text):
+        deltas.append(text)
+
+    with patch.object(llm, "get_active_llm", return_value=("yandex", "yandexgpt", {"api_key": "k"})):
+        with patch.dict(llm._HANDLERS, {"yandex": AsyncMock(return_value=("Привет", None))}):
+            content, _ = await llm.get_reply([{"role": "user", "content": "Hi"}], on_delta=on_delta)
+    assert content == "Привет"
+    assert deltas == ["Привет"]
+
+
+@pytest.mark.asyncio
+async def test_openai_stream_accumulates_tool_call_deltas():
+    from types import SimpleNamespace as NS
+
+    def chunk(content=None, tool_calls=None):
+        return NS(choices=[NS(delta=NS(content=content, tool_calls=tool_calls))])
+
+    chunks = [
+        chunk(content="Let me check. "),
+        chunk(tool_calls=[NS(index=0, id="call_1", function=NS(name="calculate", arguments='{"expr'))]),
+        chunk(tool_calls=[NS(index=0, id=None, function=NS(name=None, arguments='ession": "2+2"}'))]),
+    ]
+
+    async def agen():
+        for c in chunks:
+            yield c
+
+    client = NS(chat=NS(completions=NS(create=AsyncMock(return_value=agen()))))
+    deltas = []
+
+    async def on_delta(text):
+        deltas.append(text)
+
+    content, tool_calls = await llm._openai_chat_completion_stream(
+        client, [{"role": "user", "content": "2+2?"}], "gpt-4o-mini", on_delta, tools=llm.as_schema_set([{"type": "function"}]),
+    )
+    assert content == "Let me check."
+    assert deltas == ["Let me check. "]
+    assert len(tool_calls) == 1
+    assert tool_calls[0].id == "call_1"
+    assert tool_calls[0].name == "calculate"
+    assert tool_calls[0].arguments == {"expression": "2+2"}
+
+
+def test_order_system_messages_keeps_summary_block():
+    """Settings-DB system prompt replaces only the first system message; the summary block follows it."""
+    from bot.llm import _order_system_messages
+
+    messages = [
+        {"role": "system", "content": "default"},
+        {"role": "system", "content": "summary"},
+        {"role": "user", "content": "hi"},
+    ]
+    assert _order_system_messages(messages, "from db") == [
+        {"role": "system", "content": "from db"},
+        {"role": "system", "content": "summary"},
+        {"role": "user", "content": "hi"},
+    ]
+    assert _order_system_messages([{"role": "user", "content": "hi"}]) == [{"role": "user", "content": "hi"}]
+
+
+def test_anthropic_cache_breakpoints_and_usage():
+    """Stable prefix gets cache_control; cache read/write tokens from usage are recorded."""
+    from types import SimpleNamespace
+
+    tools = [
+        {"type": "function", "function": {"name": "b", "description": "B", "parameters": {}}},
+        {"type": "function", "function": {"name": "a", "description": "A", "parameters": {}}},
+    ]
+    messages = [
+        {"role": "system", "content": "stable prompt"},
+        {"role": "system", "content": "summary"},
+        {"role": "user", "content": "hi"},
+    ]
+    kw = llm._anthropic_create_kw(messages, "claude", llm.as_schema_set(tools))
+    assert [t["name"] for t in kw["tools"]] == ["a", "b"]
+    assert "cache_control" in kw["tools"][-1] and "cache_control" not in kw["tools"][0]
+    assert kw["system"][0] == {"type": "text", "text": "stable prompt", "cache_control": {"type": "ephemeral"}}
+    assert kw["system"][1] == {"type": "text", "text": "summary"}
+    assert kw["messages"][-1]["content"][0]["cache_control"] == {"type": "ephemeral"}
+
+    llm._prompt_cache_stats.pop("anthropic", None)
+    usage = SimpleNamespace(input_tokens=10, cache_read_input_tokens=900, cache_creation_input_tokens=0)
+    llm._anthropic_result(SimpleNamespace(content=[], usage=usage))
+    stats = llm.get_prompt_cache_stats()["anthropic"]
+    assert stats["prompt_tokens"] == 910 and stats["cached_tokens"] == 900
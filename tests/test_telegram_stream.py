@@ -0,0 +1,34 @@
+"""Tests for bot.telegram_stream (progressive Telegram replies)."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bot.telegram_stream import StreamingReply, split_message_text
+
+
+def test_split_message_text_respects_limit():
+    text = "a" * 10 + "\n" + "b" * 10
+    assert split_message_text(text, limit=15) == ["a" * 10, "b" * 10]
+    assert split_message_text("short") == ["short"]
+    assert all(len(c) <= 7 for c in split_message_text("x" * 20, limit=7))
+
+
+@pytest.mark.asyncio
+async def test_streaming_reply_edits_placeholder():
+    sent = MagicMock()
+    sent.edit_text = AsyncMock()
+    message = MagicMock()
+    message.reply_text = AsyncMock(return_value=sent)
+
+    stream = StreamingReply(message, edit_interval=0.01, min_edit_chars=1)
+    await stream.start()
+    message.reply_text.assert_awaited_once()
+    await stream.on_delta("Hello, ")
+    await stream.on_delta("world")
+    await asyncio.sleep(0.05)
+    await stream.finish("Hello, world!")
+    assert sent.edit_text.await_count >= 2
+    assert sent.edit_text.await_args_list[-1].args[0] == "Hello, world!"
+    # No extra messages besides the placeholder
+    assert message.reply_text.await_count == 1
@@ -4,6 +4,7 @@ from unittest.mock import AsyncMock, patch
 import pytest
 
 from bot.tool_calling import (
+    ToolLoopOutcome,
     get_reply_with_tools,
     get_system_prompt_for_tools,
     MAX_ITERATIONS,
@@ -92,11 +93,436 @@ async def test_get_reply_with_tools_max_iterations(plugins_loaded):
     with patch("bot.tool_calling.get_reply", new_callable=AsyncMock, return_value=(
         None, [LLMToolCall(id="x", name="get_current_datetime", arguments={})]
     )):
-        result = await get_reply_with_tools([{"role": "user", "content": "Hi"}], max_iterations=2)
+        outcome = ToolLoopOutcome()
+        result = await get_reply_with_tools([{"role": "user", "content": "Hi"}], max_iterations=2, outcome=outcome)
     assert result == "Could not complete the operation."
+    # The fallback is flagged so the caller does not cache it as an answer
+    assert not outcome.complete
 
 
 def test_get_system_prompt_for_tools_returns_string():
     prompt = get_system_prompt_for_tools()
     assert isinstance(prompt, str)
     assert "Russian" in prompt or "tool" in prompt.lower()
+
+
+@pytest.mark.asyncio
+async def test_execute_tools_parallel_keeps_order_and_limits_concurrency():
+    import asyncio
+
+    from tools import ToolRegistry, execute_tools
+    from tools.models import ToolDefinition
+
+    running = 0
+    peak = 0
+    log = []
+
+    async def slow(value: str, delay: float) -> str:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(delay)
+        running -= 1
+        log.append(value)
+        return value
+
+    async def side_effect(value: str) -> str:
+        log.append(f"write:{value}")
+        assert running == 0
+        return f"write:{value}"
+
+    reg = ToolRegistry()
+    reg.register_tool(ToolDefinition(name="slow", description="", plugin_id="t", handler=slow))
+    reg.register_tool(ToolDefinition(
+        name="write", description="", plugin_id="t", handler=side_effect, parallel_safe=False,
+    ))
+    calls = [
+        ToolsToolCall(id="1", name="slow", arguments={"value": "a", "delay": 0.05}),
+        ToolsToolCall(id="2", name="slow", arguments={"value": "b", "delay": 0.01}),
+        ToolsToolCall(id="3", name="slow", arguments={"value": "c", "delay": 0.02}),
+        ToolsToolCall(id="4", name="write", arguments={"value": "d"}),
+        ToolsToolCall(id="5", name="missing", arguments={}),
+    ]
+    results = await execute_tools(calls, registry=reg, parallel=True, max_concurrency=2)
+    assert [r.tool_call_id for r in results] == ["1", "2", "3", "4", "5"]
+    assert [r.content for r in results[:4]] == ["a", "b", "c", "write:d"]
+    assert not results[4].success
+    assert peak == 2
+    assert log[-1] == "write:d"
+
+    # serial_actions: only the write action of a mixed read/write tool is a barrier
+    from tools.executor import _parallel_batches
+
+    reg.register_tool(ToolDefinition(
+        name="hr", description="", plugin_id="t", handler=slow, serial_actions=["update_employee"],
+    ))
+    hr_calls = [
+        ToolsToolCall(id=str(i), name="hr", arguments={"action": action})
+        for i, action in enumerate(["get_employee", "list_employees", "update_employee", "get_employee"])
+    ]
+    assert _parallel_batches(hr_calls, reg) == [[0, 1], [2], [3]]
+
+
+@pytest.mark.asyncio
+async def test_tool_context_is_isolated_between_concurrent_calls():
+    import asyncio
+
+    from tools import ToolRegistry, get_current_context
+    from tools.models import ToolDefinition
+
+    async def whoami_async(delay: float) -> str:
+        await asyncio.sleep(delay)
+        ctx = get_current_context()
+        return f"{ctx.telegram_id}:{ctx.chat_id}"
+
+    def whoami_sync() -> str:
+        ctx = get_current_context()
+        return f"{ctx.telegram_id}:{ctx.chat_id}"
+
+    reg = ToolRegistry()
+    reg.register_tool(ToolDefinition(name="who_async", description="", plugin_id="t", handler=whoami_async))
+    reg.register_tool(ToolDefinition(name="who_sync", description="", plugin_id="t", handler=whoami_sync))
+
+    first, second, third = await asyncio.gather(
+        execute_tool(ToolsToolCall(id="1", name="who_async", arguments={"delay": 0.05}),
+                     registry=reg, telegram_id=111, chat_id=1),
+        execute_tool(ToolsToolCall(id="2", name="who_async", arguments={"delay": 0.0}),
+                     registry=reg, telegram_id=222, chat_id=2),
+        execute_tool(ToolsToolCall(id="3", name="who_sync", arguments={}),
+                     registry=reg, telegram_id=333, chat_id=3),
+    )
+    assert first.content == "111:1"
+    assert second.content == "222:2"
+    assert third.content == "333:3"
+    assert get_current_context() is None
+
+
+def test_registry_schema_snapshot_is_versioned_and_memoized():
+    """Snapshot is reused until the registry changes; hash depends only on schema content."""
+    from tools.models import ToolDefinition
+    from tools.registry import ToolRegistry
+
+    def handler(**kwargs):
+        return ""
+
+    reg = ToolRegistry()
+    for name in ("zeta", "alpha"):
+        reg.register_tool(ToolDefinition(
+            name=name, description=name, parameters={"type": "object", "properties": {}},
+            handler=handler, plugin_id="p",
+        ))
+    snap = reg.get_tool_schemas()
+    assert reg.get_tool_schemas() is snap
+    assert snap.names == ("alpha", "zeta")
+    assert snap.anthropic() is snap.anthropic()
+    assert snap.anthropic()[0]["input_schema"] == {"type": "object", "properties": {}}
+
+    version = reg.version
+    reg.disable_tool("zeta")
+    assert reg.version == version + 1
+    reg.disable_tool("zeta")  # no change, no bump
+    assert reg.version == version + 1
+    assert reg.get_tool_schemas().names == ("alpha",)
+    reg.enable_tool("zeta")
+    again = reg.get_tool_schemas()
+    assert again is not snap and again.hash == snap.hash
+
+
+def test_tool_router_selects_relevant_tools_and_keeps_pinned():
+    """BM25 router sends top-k matching tools plus pinned ones; small catalogs are not filtered."""
+    from tools.models import ToolDefinition
+    from tools.registry import ToolRegistry
+    from tools.router import ToolRouter
+
+    def handler(**kwargs):
+        return ""
+
+    reg = ToolRegistry()
+    specs = [
+        ("hr", "Employee directory", ["сотрудник", "табельный номер"], False),
+        ("get_weather", "Weather forecast for a city", ["погода"], False),
+        ("calculate", "Evaluate math expression", ["посчитай"], False),
+        ("get_current_datetime", "Current date and time", ["время"], True),
+    ]
+    for name, desc, keywords, pinned in specs:
+        reg.register_tool(ToolDefinition(
+            name=name, description=desc, keywords=keywords, pinned=pinned,
+            parameters={"type": "object", "properties": {"city": {"type": "string", "description": "City"}}},
+            handler=handler, plugin_id=name,
+        ))
+    router = ToolRouter(top_k=1)
+    router.rebuild(reg)
+    schemas = reg.get_tool_schemas()
+
+    selected = router.select(schemas, "Найди сотрудника Иванова")
+    assert selected.names == ("get_current_datetime", "hr")
+    assert router.select(schemas, "Найди сотрудника Иванова") is selected  # subset snapshot memoized
+    assert router.select(schemas, "какая погода в Москве", extra=["hr"]).names == (
+        "get_current_datetime", "get_weather", "hr",
+    )
+    assert router.select(schemas, "ничего общего") is schemas
+    assert ToolRouter(top_k=10).select(schemas, "погода") is schemas
+
+    reg.unregister_plugin("get_weather")
+    router.update_plugin("get_weather", reg)
+    assert "get_weather" not in [name for name, _ in router.score("погода")]
+
+
+@pytest.mark.asyncio
+async def test_tool_result_cache_hits_scopes_and_invalidation():
+    """Cacheable read actions are served from cache; write actions invalidate the plugin's entries."""
+    from tools.executor import execute_tool
+    from tools.models import ToolCall, ToolDefinition
+    from tools.registry import ToolRegistry
+    from tools.result_cache import get_tool_cache
+
+    calls = []
+
+    def handler(action, query=None):
+        calls.append((action, query))
+        return f"{action}:{query}:{len(calls)}"
+
+    reg = ToolRegistry()
+    reg.register_tool(ToolDefinition(
+        name="cached_hr", description="", plugin_id="cached_hr_plugin", handler=handler,
+        cache_ttl=60, cache_scope="user",
+        cache_actions=["get_employee"], cache_invalidate_on=["update_employee"],
+    ))
+    cache = get_tool_cache()
+    cache.invalidate()
+
+    def call(action, query=None):
+        return ToolCall(id="1", name="cached_hr", arguments={"action": action, "query": query})
+
+    first = await execute_tool(call("get_employee", "Иванов"), registry=reg, telegram_id=1)
+    # Same arguments (different key order / None fields) -> cache hit
+    again = await execute_tool(
+        ToolCall(id="2", name="cached_hr", arguments={"query": "Иванов", "action": "get_employee", "x": None}),
+        registry=reg, telegram_id=1,
+    )
+    assert again.content == first.content and len(calls) == 1
+    # user scope: another user does not share the entry
+    await execute_tool(call("get_employee", "Иванов"), registry=reg, telegram_id=2)
+    assert len(calls) == 2
+    # not a cached action
+    await execute_tool(call("list_employees"), registry=reg, telegram_id=1)
+    await execute_tool(call("list_employees"), registry=reg, telegram_id=1)
+    assert len(calls) == 4
+    # write action drops cached results
+    await execute_tool(call("update_employee", "Иванов"), registry=reg, telegram_id=1)
+    await execute_tool(call("get_employee", "Иванов"), registry=reg, telegram_id=1)
+    assert len(calls) == 6
+    stats = cache.stats()["tools"]["cached_hr"]
+    assert stats["hits"] == 1 and stats["misses"] == 3
+
+
+@pytest.mark.asyncio
+async def test_tool_results_are_compacted_projected_and_capped(monkeypatch):
+    """executor: compact JSON, per-action field projection, token cap with an explicit omitted marker."""
+    import json
+
+    from tools import result_store
+    from tools.executor import execute_tool
+    from tools.models import ToolDefinition
+    from tools.registry import ToolRegistry
+
+    monkeypatch.setattr(result_store, "_store", result_store.ResultPageStore(ttl_seconds=0))
+    rows = [
+        {"id": i, "full_name": f"Employee {i:03d}", "team": "Core", "created_at": "2026-01-01T00:00:00", "fte": None}
+        for i in range(500)
+    ]
+
+    def directory(action: str):
+        if action == "one":
+            return {"error": "not found", "candidates": rows[:2]}
+        return json.dumps(rows, indent=2)
+
+    reg = ToolRegistry()
+    reg.register_tool(ToolDefinition(
+        name="dir", description="", plugin_id="p", handler=directory,
+        result_fields={"list": ["id", "full_name"], "one": ["full_name"]}, result_max_tokens=300,
+    ))
+    listed = await execute_tool(ToolsToolCall(id="1", name="dir", arguments={"action": "list"}), registry=reg)
+    shaped = json.loads(listed.content)
+    assert listed.content.startswith('{"total":500,"omitted":')
+    assert shaped["items"][0] == {"id": 0, "full_name": "Employee 000"} and 0 < len(shaped["items"]) < 500
+    assert shaped["omitted"] == 500 - len(shaped["items"]) and "refine your query" in shaped["note"]
+    assert listed.page_handle is None
+
+    one = await execute_tool(ToolsToolCall(id="2", name="dir", arguments={"action": "one"}), registry=reg)
+    assert json.loads(one.content) == {
+        "error": "not found", "candidates": [{"full_name": "Employee 000"}, {"full_name": "Employee 001"}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_oversized_tool_result_is_paged_through_fetch_result_page(monkeypatch):
+    """Oversized result: first page + handle; fetch_result_page returns later pages to the same chat only."""
+    import json
+
+    from tools import result_store
+    from tools.executor import execute_tool
+    from tools.models import ToolDefinition
+    from tools.registry import ToolRegistry
+
+    monkeypatch.setattr(result_store, "_store", result_store.ResultPageStore(ttl_seconds=60))
+    rows = [{"id": i, "full_name": f"Employee {i:03d}"} for i in range(300)]
+    reg = ToolRegistry()
+    reg.register_tool(ToolDefinition(
+        name="dir", description="", plugin_id="p", handler=lambda: json.dumps(rows), result_max_tokens=300,
+    ))
+    reg.register_tool(result_store.fetch_result_page_tool())
+
+    first = await execute_tool(ToolsToolCall(id="1", name="dir", arguments={}), registry=reg, chat_id=10)
+    shaped = json.loads(first.content)
+    size = len(shaped["items"])
+    assert first.page_handle == shaped["handle"] and shaped["page"] == 1 and shaped["total"] == 300
+    assert shaped["pages"] == -(-300 // size) > 1 and result_store.FETCH_RESULT_PAGE_TOOL in shaped["note"]
+
+    fetch = ToolsToolCall(id="2", name="fetch_result_page", arguments={"handle": first.page_handle, "page": 2})
+    second = json.loads((await execute_tool(fetch, registry=reg, chat_id=10)).content)
+    assert second["items"] == rows[size:2 * size] and second["page"] == 2
+    last = await execute_tool(
+        ToolsToolCall(id="3", name="fetch_result_page", arguments={"handle": first.page_handle, "page": 99}),
+        registry=reg, chat_id=10,
+    )
+    assert json.loads(last.content)["items"][-1] == rows[-1] and "next" not in json.loads(last.content)
+    other_chat = await execute_tool(fetch, registry=reg, chat_id=11)
+    assert other_chat.content.startswith("Error:")
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_exact_similar_and_tool_rules():
+    """Normalized exact hits, similar-mode matches, and answers with non-cacheable tools never stored."""
+    from bot.answer_cache import AnswerCache, answer_ttl_for_tools
+    from tools.models import ToolDefinition
+    from tools.registry import ToolRegistry
+
+    exact = AnswerCache(mode="exact", ttl_seconds=60, control=False)
+    await exact.put(1, "scope", "Кто руководитель отдела продаж?", "Иванов")
+    assert await exact.get(2, "scope", "  кто  руководитель отдела продаж ") == "Иванов"
+    assert await exact.get(2, "other-scope", "Кто руководитель отдела продаж?") is None
+    assert await exact.get(2, "scope", "Кто руководитель отдела закупок?") is None
+
+    similar = AnswerCache(mode="similar", ttl_seconds=60, similarity=0.9, control=False)
+    await similar.put(1, "scope", "Как оформить отпуск?", "Через портал")
+    assert await similar.get(2, "scope", "как мне оформить отпуск") == "Через портал"
+    assert await similar.get(2, "scope", "Сколько будет 2+2") is None
+
+    # Short follow-ups are never cached
+    await exact.put(1, "scope", "А его?", "Петров")
+    assert await exact.get(2, "scope", "а его") is None
+
+    off = AnswerCache(mode="off", control=False)
+    await off.put(1, "scope", "Как оформить отпуск?", "a")
+    assert len(off) == 0
+
+    reg = ToolRegistry()
+    reg.register_tool(ToolDefinition(name="calc", description="", plugin_id="p", handler=lambda: "", cache_ttl=3600))
+    reg.register_tool(ToolDefinition(name="now", description="", plugin_id="p", handler=lambda: ""))
+    reg.register_tool(ToolDefinition(
+        name="me", description="", plugin_id="p", handler=lambda: "", cache_ttl=60, cache_scope="user",
+    ))
+    calc, now, me = (ToolsToolCall(id=n, name=n, arguments={}) for n in ("calc", "now", "me"))
+    assert answer_ttl_for_tools([], ttl=600, registry=reg) == 600
+    assert answer_ttl_for_tools([calc], ttl=7200, registry=reg) == 3600
+    assert answer_ttl_for_tools([calc, now], ttl=600, registry=reg) == 0
+    assert answer_ttl_for_tools([me], ttl=600, registry=reg) == 0
+    await exact.put(1, "scope", "Который час?", "12:00", ttl=answer_ttl_for_tools([now], registry=reg))
+    assert await exact.get(1, "scope", "Который час?") is None
+
+
+def test_answer_cache_scope_includes_context_only_for_follow_ups():
+    """A follow-up gets a scope per conversation context; a fresh conversation shares one."""
+    from unittest.mock import patch
+
+    from bot.answer_cache import AnswerCache, is_follow_up
+
+    def request(*turns):
+        return [{"role": "system", "content": "prompt"}, *turns, {"role": "user", "content": "Расскажи подробнее"}]
+
+    assert is_follow_up("А у него какая почта?") and not is_follow_up("Как оформить отпуск?")
+    with patch("bot.llm.get_active_model", return_value=("openai", "gpt", "")):
+        fresh = AnswerCache.scope(request())
+        assert AnswerCache.scope(request()) == fresh
+        about_vacation = AnswerCache.scope(request(
+            {"role": "user", "content": "Как оформить отпуск?"}, {"role": "assistant", "content": "Через портал"},
+        ))
+        about_salary = AnswerCache.scope(request(
+            {"role": "user", "content": "Когда аванс?"}, {"role": "assistant", "content": "20-го числа"},
+        ))
+        with_summary = AnswerCache.scope(request({"role": "system", "content": "Краткое содержание: отпуск"}))
+    assert len({fresh, about_vacation, about_salary, with_summary}) == 4
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_standalone_question_hits_across_chats_with_different_history():
+    """The growing history does not enter the scope of a standalone question: another chat gets a hit."""
+    from unittest.mock import patch
+
+    from bot.answer_cache import AnswerCache
+
+    cache = AnswerCache(mode="exact", ttl_seconds=60, control=False)
+    question = {"role": "user", "content": "Как оформить отпуск?"}
+    chat_1 = [{"role": "system", "content": "prompt"}, {"role": "user", "content": "Когда аванс?"},
+              {"role": "assistant", "content": "20-го числа"}, question]
+    chat_2 = [{"role": "system", "content": "prompt"}, {"role": "system", "content": "Краткое содержание: отчёты"},
+              {"role": "user", "content": "Где шаблон отчёта?"}, {"role": "assistant", "content": "В вики"}, question]
+    with patch("bot.llm.get_active_model", return_value=("openai", "gpt", "")):
+        await cache.put(1, AnswerCache.scope(chat_1), question["content"], "Через портал")
+        assert await cache.get(2, AnswerCache.scope(chat_2), question["content"]) == "Через портал"
+
+
+@pytest.mark.asyncio
+async def test_process_executor_runs_in_worker_and_kills_on_timeout(tmp_path):
+    """executor: process runs the handler in a pool worker with the tool context; a runaway call is killed."""
+    import asyncio
+    import os
+
+    from tools.executor import execute_tool
+    from tools.loader import load_plugin
+    from tools.process_pool import shutdown_tool_process_pool
+    from tools.registry import ToolRegistry
+
+    plugin = tmp_path / "cpu_plugin"
+    plugin.mkdir()
+    (plugin / "plugin.yaml").write_text(
+        "id: cpu_plugin\nname: CPU\nversion: '1.0'\ntools:\n"
+        "  - {name: whoami, description: pid, handler: whoami, executor: process}\n"
+        "  - {name: spin, description: loop, handler: spin, executor: process, timeout: 1}\n"
+        "  - {name: nap, description: sleep, handler: nap, executor: process, timeout: 10}\n",
+        encoding="utf-8",
+    )
+    (plugin / "handlers.py").write_text(
+        "import os\n"
+        "from tools.base import get_current_context\n"
+        "def whoami():\n"
+        "    return {'pid': os.getpid(), 'telegram_id': get_current_context().telegram_id}\n"
+        "def spin():\n"
+        "    while True:\n"
+        "        pass\n"
+        "def nap():\n"
+        "    import time\n"
+        "    time.sleep(1.5)\n"
+        "    return 'rested'\n",
+        encoding="utf-8",
+    )
+    reg = ToolRegistry()
+    try:
+        assert await load_plugin(str(plugin), registry=reg) is not None
+        first = await execute_tool(ToolsToolCall(id="1", name="whoami", arguments={}), registry=reg, telegram_id=42)
+        assert first.success and '"telegram_id":42' in first.content
+        assert f'"pid":{os.getpid()}' not in first.content
+
+        # Only the timed-out call's worker is killed: a call of another chat in flight on the other worker finishes
+        spun, napped = await asyncio.gather(
+            execute_tool(ToolsToolCall(id="2", name="spin", arguments={}), registry=reg),
+            execute_tool(ToolsToolCall(id="4", name="nap", arguments={}), registry=reg, chat_id=5),
+        )
+        assert not spun.success and "timed out" in spun.content
+        assert napped.success and napped.content == "rested"
+        # A replacement worker serves later calls
+        again = await execute_tool(ToolsToolCall(id="3", name="whoami", arguments={}), registry=reg, telegram_id=7)
+        assert again.success
+    finally:
+        shutdown_tool_process_pool()
@@ -0,0 +1,56 @@
+"""Tests for bot.update_processor (per-chat ordered concurrent updates)."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telegram import Update
+
+from bot.update_processor import PerChatUpdateProcessor
+
+
+def _update(chat_id: int) -> MagicMock:
+    upd = MagicMock(spec=Update)
+    upd.effective_chat = MagicMock(id=chat_id)
+    upd.effective_message = MagicMock()
+    upd.effective_message.reply_text = AsyncMock()
+    return upd
+
+
+@pytest.mark.asyncio
+async def test_same_chat_in_order_other_chats_concurrent():
+    processor = PerChatUpdateProcessor(max_workers=4, max_queue_per_chat=10)
+    log = []
+
+    async def handler(name: str, delay: float):
+        log.append(f"start:{name}")
+        await asyncio.sleep(delay)
+        log.append(f"end:{name}")
+
+    await asyncio.gather(
+        processor.process_update(_update(1), handler("a1", 0.05)),
+        processor.process_update(_update(1), handler("a2", 0.0)),
+        processor.process_update(_update(2), handler("b1", 0.0)),
+    )
+    # chat 1: a2 starts only after a1 ended; chat 2 is not blocked by chat 1
+    assert log.index("end:a1") < log.index("start:a2")
+    assert log.index("end:b1") < log.index("end:a1")
+    assert processor.pending(1) == 0
+
+
+@pytest.mark.asyncio
+async def test_burst_over_queue_limit_is_dropped():
+    processor = PerChatUpdateProcessor(max_workers=2, max_queue_per_chat=2)
+    handled = []
+
+    async def handler(name: str):
+        await asyncio.sleep(0.02)
+        handled.append(name)
+
+    updates = [_update(7) for _ in range(4)]
+    await asyncio.gather(*[
+        processor.process_update(u, handler(f"m{i}")) for i, u in enumerate(updates)
+    ])
+    assert handled == ["m0", "m1"]
+    # one notice per burst
+    notices = sum(u.effective_message.reply_text.await_count for u in updates)
+    assert notices == 1
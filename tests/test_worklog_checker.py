@@ -0,0 +1,96 @@
+"""Tests for the worklog_checker engine against a stub Jira/Tempo (httpx.MockTransport)."""
+import json
+import os
+import tempfile
+from datetime import date
+
+import pytest
+
+_test_db = os.path.join(tempfile.gettempdir(), "lo_tg_bot_test_hr.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_test_db}")
+os.environ.setdefault("SETTINGS_ENCRYPTION_KEY", "zOkTsCorSklBG_KtNc6s-B_5Mz5HkuDBE5ncOg8yU8Q=")
+
+
+def test_parse_period_and_working_days():
+    from plugins.worklog_checker.engine import parse_period, working_days
+
+    today = date(2026, 1, 21)  # Wednesday
+    assert parse_period("this_week", today) == (date(2026, 1, 19), date(2026, 1, 25))
+    assert parse_period("last_week", today) == (date(2026, 1, 12), date(2026, 1, 18))
+    assert parse_period("this_month", today) == (date(2026, 1, 1), date(2026, 1, 31))
+    assert parse_period("last_month", today) == (date(2025, 12, 1), date(2025, 12, 31))
+    assert parse_period("2026-01-05/2026-01-09") == (date(2026, 1, 5), date(2026, 1, 9))
+    with pytest.raises(ValueError):
+        parse_period("yesterday", today)
+    assert working_days(date(2026, 1, 12), date(2026, 1, 18)) == 5
+    assert working_days(date(2026, 1, 1), date(2026, 1, 31)) == 22
+    assert working_days(date(2026, 1, 17), date(2026, 1, 18)) == 0
+
+
+@pytest.mark.asyncio
+async def test_worklog_engine_batches_pages_caches_and_aggregates(monkeypatch):
+    """Team report: one batched paged search, Jira key resolved and saved, second query served from cache."""
+    import httpx
+
+    from api.db import init_db
+    from api.employees_repository import (
+        bulk_import_employees,
+        delete_employees,
+        get_employee_by_personal_number,
+        set_employees_jira_worker_ids,
+        update_employee,
+    )
+    from plugins.worklog_checker import tempo_client
+    from plugins.worklog_checker.engine import WorklogCache, WorklogEngine
+    from plugins.worklog_checker.tempo_client import TempoClient
+
+    init_db()
+    monkeypatch.setattr(tempo_client, "TEMPO_PAGE_SIZE", 2)
+    numbers = ["WLG001", "WLG002"]
+    worklogs = [
+        {"tempoWorklogId": 1, "worker": "JIRAUSER1", "started": "2026-01-12 00:00:00.000", "timeSpentSeconds": 8 * 3600,
+         "issue": {"key": "DT-1", "summary": "Backend"}},
+        {"tempoWorklogId": 2, "worker": "JIRAUSER1", "started": "2026-01-13 00:00:00.000", "timeSpentSeconds": 10 * 3600,
+         "issue": {"key": "DT-2", "summary": "Review"}},
+        {"tempoWorklogId": 3, "worker": "JIRAUSER2", "started": "2026-01-12 00:00:00.000", "timeSpentSeconds": 4 * 3600,
+         "issue": {"key": "DT-1", "summary": "Backend"}},
+    ]
+    searches = []
+
+    def handler(request):
+        if request.url.path == "/rest/api/2/user":
+            if request.url.params["username"] == "lena":
+                return httpx.Response(200, json={"key": "JIRAUSER2"})
+            return httpx.Response(404)
+        body = json.loads(request.content)
+        searches.append(body)
+        rows = [w for w in worklogs if w["worker"] in body["worker"]]
+        return httpx.Response(200, json=rows[body["offset"]:body["offset"] + body["limit"]])
+
+    try:
+        bulk_import_employees([
+            {"personal_number": "WLG001", "full_name": "Кирилл Котов", "email": "kirill@example.com"},
+            {"personal_number": "WLG002", "full_name": "Елена Лосева", "email": "lena@example.com"},
+        ])
+        for number in numbers:
+            update_employee(get_employee_by_personal_number(number)["id"], {"team": "WLG Team"})
+        set_employees_jira_worker_ids([(get_employee_by_personal_number("WLG001")["id"], "JIRAUSER1")])
+        async with httpx.AsyncClient(base_url="http://jira", transport=httpx.MockTransport(handler)) as http:
+            engine = WorklogEngine(TempoClient(client=http), cache=WorklogCache(), today=date(2026, 1, 21))
+            report = await engine.team_report("WLG Team", "last_week")
+            assert len(searches) == 2  # one batch, two pages of 2
+            assert sorted(searches[0]["worker"]) == ["JIRAUSER1", "JIRAUSER2"]
+            by_name = {p["employee"]: p for p in report["people"]}
+            assert by_name["Кирилл Котов"]["logged_hours"] == 18
+            assert by_name["Кирилл Котов"]["required_hours"] == 40
+            assert by_name["Кирилл Котов"]["deficit_hours"] == 22
+            assert by_name["Елена Лосева"]["days_without_logs"] == 4
+            assert report["totals"]["logged_hours"] == 22
+            assert get_employee_by_personal_number("WLG002")["jira_worker_id"] == "JIRAUSER2"
+
+            detail = await engine.person_report("kirill@example.com", "last_week")
+            assert len(searches) == 2  # served from cache
+            assert detail["issues"][0] == {"key": "DT-2", "summary": "Review", "hours": 10}
+            assert detail["days_without_logs"] == ["2026-01-14", "2026-01-15", "2026-01-16"]
+    finally:
+        delete_employees(numbers)
@@ -29,6 +29,8 @@ from tools.base import (
     require_plugin_setting,
     get_http_client,
     get_plugin_logger,
+    ToolContext,
+    get_current_context,
 )
 
 __all__ = [
@@ -50,4 +52,6 @@ __all__ = [
     "require_plugin_setting",
     "get_http_client",
     "get_plugin_logger",
+    "ToolContext",
+    "get_current_context",
 ]
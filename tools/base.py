@@ -3,8 +3,11 @@ Plugin utilities: settings access, HTTP client, logging.
 Phase 2: get_plugin_setting returns default (DB in Phase 3).
 """
 import logging
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -42,22 +45,46 @@ def get_plugin_logger(plugin_id: str) -> logging.Logger:
 
 @dataclass
 class ToolContext:
-    """Tool execution context (for future use). telegram_id used by hr_service for admin check."""
+    """
+    Tool execution context. telegram_id used by hr_service for admin check.
+    Stored in a ContextVar: each asyncio task (one chat's tool calls) sees its own value,
+    and asyncio.to_thread copies it into the worker thread for sync handlers.
+    """
     user_id: Optional[str] = None
-    chat_id: Optional[str] = None
+    chat_id: Optional[int] = None
     plugin_id: Optional[str] = None
     telegram_id: Optional[int] = None
+    request_id: Optional[str] = None
 
 
-_current_context: Optional[ToolContext] = None
+_current_context: ContextVar[Optional[ToolContext]] = ContextVar("tool_context", default=None)
+
+
+def new_request_id() -> str:
+    """Short random id to correlate logs of one user request (LLM turn + tool calls)."""
+    return uuid.uuid4().hex[:12]
 
 
 def get_current_context() -> Optional[ToolContext]:
-    """Get current execution context."""
-    return _current_context
+    """Get current execution context (task-local)."""
+    return _current_context.get()
+
+
+def set_current_context(ctx: Optional[ToolContext]) -> Token:
+    """Set current execution context for this task; returns token for reset_current_context."""
+    return _current_context.set(ctx)
 
 
-def set_current_context(ctx: Optional[ToolContext]) -> None:
-    """Set current execution context (used by bot when invoking tools)."""
-    global _current_context
-    _current_context = ctx
+def reset_current_context(token: Token) -> None:
+    """Restore the context that was current before set_current_context."""
+    _current_context.reset(token)
+
+
+@contextmanager
+def tool_context(ctx: Optional[ToolContext]) -> Iterator[Optional[ToolContext]]:
+    """Run a block with ctx as current tool context."""
+    token = set_current_context(ctx)
+    try:
+        yield ctx
+    finally:
+        reset_current_context(token)
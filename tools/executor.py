@@ -5,7 +5,11 @@ import asyncio
 import logging
 from typing import List, Optional
 
+from tools import result_cache
+from tools.result_shaping import shape_result
+from tools.base import ToolContext, get_current_context, new_request_id, tool_context
 from tools.models import ToolCall, ToolDefinition, ToolResult
+from tools.process_pool import ProcessHandler, get_tool_process_pool
 from tools.registry import ToolRegistry, get_registry
 
 logger = logging.getLogger(__name__)
@@ -19,25 +23,37 @@ ERROR_MESSAGES = {
 }
 
 
+def _make_context(
+    telegram_id: Optional[int],
+    chat_id: Optional[int],
+    request_id: Optional[str],
+) -> Optional[ToolContext]:
+    """ToolContext for a call, or None when the caller gave no identity (API, tests)."""
+    if telegram_id is None and chat_id is None and request_id is None:
+        return None
+    return ToolContext(
+        telegram_id=telegram_id,
+        chat_id=chat_id,
+        request_id=request_id or new_request_id(),
+    )
+
+
 async def execute_tool(
     tool_call: ToolCall,
     registry: Optional[ToolRegistry] = None,
     timeout: Optional[int] = None,
     telegram_id: Optional[int] = None,
+    chat_id: Optional[int] = None,
+    request_id: Optional[str] = None,
 ) -> ToolResult:
     """
     Execute a tool call. Returns ToolResult with result or error.
     telegram_id: optional Telegram user id for context (e.g. hr_service admin check).
+    chat_id, request_id: optional chat and request ids for context and logs.
+    Context is task-local (contextvars), so concurrent chats do not see each other's context.
     """
-    from tools.base import ToolContext, set_current_context
-    if telegram_id is not None:
-        set_current_context(ToolContext(telegram_id=telegram_id))
-    else:
-        set_current_context(None)
-    try:
+    with tool_context(_make_context(telegram_id, chat_id, request_id)):
         return await _execute_tool_impl(tool_call, registry=registry, timeout=timeout)
-    finally:
-        set_current_context(None)
 
 
 async def _execute_tool_impl(
@@ -45,7 +61,7 @@ async def _execute_tool_impl(
     registry: Optional[ToolRegistry] = None,
     timeout: Optional[int] = None,
 ) -> ToolResult:
-    """Internal: execute without context cleanup."""
+    """Internal: execute in the current tool context (set by execute_tool/execute_tools)."""
     reg = registry or get_registry()
     tool = reg.get_tool(tool_call.name)
     if not tool:
@@ -62,19 +78,36 @@ async def _execute_tool_impl(
 
     effective_timeout = timeout if timeout is not None else tool.timeout
     args = tool_call.arguments or {}
+    if result_cache.is_cacheable(tool, args):
+        await result_cache.sync_tool_cache_control()
+    cache_key, cached = result_cache.lookup(tool, args, get_current_context())
+    if cached is not None:
+        ctx = get_current_context()
+        logger.info("Tool %s served from cache request_id=%s", tool_call.name, ctx.request_id if ctx else None)
+        return _shaped_result(tool_call, tool, args, cached)
 
     try:
         import time
         start = time.perf_counter()
-        if asyncio.iscoroutinefunction(handler):
+        if isinstance(handler, ProcessHandler):
+            # Separate process: the pool kills the worker on timeout (a thread cannot be stopped)
+            result = await get_tool_process_pool().run(
+                handler, args, timeout=effective_timeout, ctx=get_current_context(),
+            )
+        elif asyncio.iscoroutinefunction(handler):
             result = await asyncio.wait_for(handler(**args), timeout=effective_timeout)
         else:
+            # to_thread runs the handler with a copy of the current contextvars (ToolContext included)
             result = await asyncio.wait_for(
                 asyncio.to_thread(handler, **args),
                 timeout=effective_timeout,
             )
         duration = time.perf_counter() - start
-        logger.info("Tool %s executed in %.2fs", tool_call.name, duration)
+        ctx = get_current_context()
+        logger.info(
+            "Tool %s executed in %.2fs request_id=%s",
+            tool_call.name, duration, ctx.request_id if ctx else None,
+        )
     except asyncio.TimeoutError:
         msg = ERROR_MESSAGES["timeout"].format(name=tool_call.name, timeout=effective_timeout)
         logger.warning("Tool %s timed out after %ss", tool_call.name, effective_timeout)
@@ -95,31 +128,97 @@ async def _execute_tool_impl(
         content = result
     else:
         content = str(result) if result is not None else ""
-    return ToolResult(tool_call_id=tool_call.id, content=content, success=True)
+    if result_cache.invalidates_cache(tool, args):
+        await asyncio.to_thread(result_cache.invalidate_tool_cache, None, tool.plugin_id)
+    elif cache_key is not None and not content.startswith("Error:"):
+        # Unshaped: a cache hit gets its own result-store handle (handles are per conversation)
+        result_cache.get_tool_cache().put(cache_key, content, tool)
+    return _shaped_result(tool_call, tool, args, content)
+
+
+def _shaped_result(tool_call: ToolCall, tool: ToolDefinition, args: dict, content: str) -> ToolResult:
+    shaped = shape_result(tool, args, content)
+    return ToolResult(tool_call_id=tool_call.id, content=shaped.content, success=True, page_handle=shaped.handle)
+
+
+def _error_result(tool_call: ToolCall, exc: BaseException) -> ToolResult:
+    """ToolResult for an exception escaping _execute_tool_impl (gather with return_exceptions)."""
+    return ToolResult(
+        tool_call_id=tool_call.id,
+        content=ERROR_MESSAGES["execution"].format(name=tool_call.name, error=str(exc)),
+        success=False,
+        error=str(exc),
+    )
+
+
+def _is_parallel_safe(tool: ToolDefinition, arguments: Optional[dict]) -> bool:
+    """False for tools with parallel_safe=False and for calls whose arguments.action is in serial_actions."""
+    if not tool.parallel_safe:
+        return False
+    if tool.serial_actions:
+        return str((arguments or {}).get("action") or "").strip().lower() not in tool.serial_actions
+    return True
+
+
+def _parallel_batches(tool_calls: List[ToolCall], reg: ToolRegistry) -> List[List[int]]:
+    """
+    Split call indexes into batches, keeping call order: consecutive parallel-safe calls share a batch;
+    a call of a tool with parallel_safe=False (or of a serial action) gets a batch of its own
+    (barrier for side effects: reads before it finish first, reads after it see its result).
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for i, tc in enumerate(tool_calls):
+        tool = reg.get_tool(tc.name)
+        if tool is not None and not _is_parallel_safe(tool, tc.arguments):
+            if current:
+                batches.append(current)
+                current = []
+            batches.append([i])
+        else:
+            current.append(i)
+    if current:
+        batches.append(current)
+    return batches
 
 
 async def execute_tools(
     tool_calls: List[ToolCall],
     registry: Optional[ToolRegistry] = None,
     parallel: bool = False,
+    max_concurrency: Optional[int] = None,
+    telegram_id: Optional[int] = None,
+    chat_id: Optional[int] = None,
+    request_id: Optional[str] = None,
 ) -> List[ToolResult]:
-    """Execute multiple tools. parallel=True uses asyncio.gather."""
+    """
+    Execute multiple tools. Results are returned in the order of tool_calls.
+    parallel=True runs parallel-safe tools concurrently (asyncio.gather), at most max_concurrency at once;
+    tools with parallel_safe=False (manifest) run alone, in their original position.
+    telegram_id, chat_id, request_id: context for all calls (they come from one LLM turn of one user).
+    """
     reg = registry or get_registry()
-    if parallel:
-        results = await asyncio.gather(
-            *[execute_tool(tc, registry=reg) for tc in tool_calls],
-            return_exceptions=True,
-        )
-        out = []
-        for i, r in enumerate(results):
-            if isinstance(r, Exception):
-                out.append(ToolResult(
-                    tool_call_id=tool_calls[i].id,
-                    content=ERROR_MESSAGES["execution"].format(name=tool_calls[i].name, error=str(r)),
-                    success=False,
-                    error=str(r),
-                ))
-            else:
-                out.append(r)
-        return out
-    return [await execute_tool(tc, registry=reg) for tc in tool_calls]
+    ctx = _make_context(telegram_id, chat_id, request_id)
+    if not parallel or len(tool_calls) <= 1:
+        with tool_context(ctx):
+            return [await _execute_tool_impl(tc, registry=reg) for tc in tool_calls]
+
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency and max_concurrency > 0 else None
+
+    async def _run(tc: ToolCall) -> ToolResult:
+        if semaphore is None:
+            return await _execute_tool_impl(tc, registry=reg)
+        async with semaphore:
+            return await _execute_tool_impl(tc, registry=reg)
+
+    out: List[Optional[ToolResult]] = [None] * len(tool_calls)
+    # gather() copies the current context into each task, so set it once for the whole turn
+    with tool_context(ctx):
+        for batch in _parallel_batches(tool_calls, reg):
+            results = await asyncio.gather(
+                *[_run(tool_calls[i]) for i in batch],
+                return_exceptions=True,
+            )
+            for i, r in zip(batch, results):
+                out[i] = _error_result(tool_calls[i], r) if isinstance(r, BaseException) else r
+    return [r for r in out if r is not None]
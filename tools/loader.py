@@ -1,6 +1,7 @@
 """
 Plugin loader: scan plugins dir, read manifests, load handlers, register tools.
 """
+import asyncio
 import importlib.util
 import logging
 from dataclasses import dataclass
@@ -10,7 +11,11 @@ from typing import Any, Dict, List, Optional
 import yaml
 
 from tools.models import PluginManifest, ToolDefinition, ToolManifestItem
+from tools.process_pool import ProcessHandler, get_tool_process_pool
 from tools.registry import ToolRegistry, get_registry
+from tools.result_cache import invalidate_tool_cache
+from tools.result_store import fetch_result_page_tool, get_result_store
+from tools.router import get_tool_router
 
 logger = logging.getLogger(__name__)
 
@@ -103,6 +108,17 @@ def _build_tool_definition(
         parameters=item.parameters,
         timeout=item.timeout,
         enabled=manifest.enabled,
+        parallel_safe=item.parallel_safe,
+        serial_actions=[a.lower() for a in item.serial_actions],
+        executor=item.executor,
+        keywords=item.keywords,
+        pinned=item.pinned,
+        cache_ttl=item.cache_ttl,
+        cache_scope=item.cache_scope,
+        cache_actions=[a.lower() for a in item.cache_actions],
+        cache_invalidate_on=[a.lower() for a in item.cache_invalidate_on],
+        result_fields={a.lower(): fields for a, fields in item.result_fields.items()},
+        result_max_tokens=item.result_max_tokens,
     )
 
 
@@ -134,11 +150,16 @@ async def load_plugin(
         if not callable(handler):
             logger.warning("Handler %s not found or not callable in %s", item.handler, path)
             continue
+        if item.executor == "process":
+            handler = ProcessHandler(manifest.id, str(path), item.handler)
         tool_def = _build_tool_definition(manifest, item, handler)
         try:
             reg.register_tool(tool_def)
         except ValueError as e:
             logger.warning("Skip tool %s: %s", item.name, e)
+    if any(item.executor == "process" for item in manifest.tools):
+        get_tool_process_pool().register_plugin(manifest.id, str(path))
+    get_tool_router(reg).update_plugin(manifest.id, reg)
     logger.info("Loaded plugin %s (%d tools)", manifest.id, len(manifest.tools))
     return manifest
 
@@ -179,6 +200,12 @@ async def load_all_plugins(
                 error=str(e),
                 exception=e,
             ))
+    if get_result_store().enabled and reg.get_tool(fetch_result_page_tool().name) is None:
+        # Built-in tool for paged results (tools/result_store.py), not part of any plugin
+        reg.register_tool(fetch_result_page_tool())
+    get_tool_router(reg).rebuild(reg)
+    if any(t.executor == "process" for t in reg.get_all_tools()):
+        get_tool_process_pool().warm_up()
     total = reg.get_stats()["total_tools"]
     return LoadResult(loaded=loaded, failed=failed, total_tools=total)
 
@@ -206,7 +233,11 @@ async def reload_plugin(
         logger.warning("Plugin %s not found in %s", plugin_id, plugins_dir)
         return False
     reg.unregister_plugin(plugin_id)
+    await asyncio.to_thread(invalidate_tool_cache, None, plugin_id)
     manifest = await load_plugin(str(plugin_path), registry=reg)
+    if manifest is None:
+        # Drop the unloaded plugin's tools from the router index
+        get_tool_router(reg).update_plugin(plugin_id, reg)
     return manifest is not None
 
 
@@ -217,4 +248,5 @@ async def reload_all_plugins(
     """Clear registry and load all plugins again."""
     reg = registry or get_registry()
     reg.clear()
+    await asyncio.to_thread(invalidate_tool_cache)
     return await load_all_plugins(plugins_dir=plugins_dir, registry=reg)
@@ -2,7 +2,7 @@
 Data models for plugin system: tools, plugins, tool calls and results.
 """
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -24,6 +24,7 @@ class ToolResult:
     content: str
     success: bool = True
     error: Optional[str] = None
+    page_handle: Optional[str] = None  # full result kept in the result store (fetch_result_page)
 
 
 # ---- Pydantic models (validation) ----
@@ -45,6 +46,19 @@ class ToolManifestItem(BaseModel):
     handler: str
     timeout: int = 30
     parameters: Dict[str, Any] = Field(default_factory=dict)
+    parallel_safe: bool = True  # False: tool has side effects, never run concurrently with other calls
+    serial_actions: List[str] = Field(default_factory=list)  # arguments.action values run like parallel_safe: false
+    executor: Literal["thread", "process"] = "thread"  # process: CPU-bound handler in the tool process pool
+    keywords: List[str] = Field(default_factory=list)  # extra search terms for the tool router (e.g. in Russian)
+    pinned: bool = False  # always offered to the LLM, regardless of tool routing
+    # Result cache (tools/result_cache.py): only for deterministic, read-only calls
+    cache_ttl: int = 0  # seconds; 0 = results are not cached
+    cache_scope: Literal["global", "user"] = "global"  # user: cached per telegram_id
+    cache_actions: List[str] = Field(default_factory=list)  # cache only these values of arguments.action
+    cache_invalidate_on: List[str] = Field(default_factory=list)  # actions that drop the plugin's cached results
+    # Result shaping (tools/result_shaping.py): fields kept per arguments.action ("*" = any), token cap
+    result_fields: Dict[str, List[str]] = Field(default_factory=dict)
+    result_max_tokens: Optional[int] = None  # None = TOOL_RESULT_MAX_TOKENS, 0 = no cap
 
 
 class PluginSettingDefinition(BaseModel):
@@ -78,6 +92,17 @@ class ToolDefinition(BaseModel):
     parameters: Dict[str, Any] = Field(default_factory=dict)
     timeout: int = 30
     enabled: bool = True
+    parallel_safe: bool = True
+    serial_actions: List[str] = Field(default_factory=list)
+    executor: Literal["thread", "process"] = "thread"
+    keywords: List[str] = Field(default_factory=list)
+    pinned: bool = False
+    cache_ttl: int = 0
+    cache_scope: Literal["global", "user"] = "global"
+    cache_actions: List[str] = Field(default_factory=list)
+    cache_invalidate_on: List[str] = Field(default_factory=list)
+    result_fields: Dict[str, List[str]] = Field(default_factory=dict)
+    result_max_tokens: Optional[int] = None
 
     class Config:
         arbitrary_types_allowed = True
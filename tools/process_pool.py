@@ -0,0 +1,321 @@
+"""
+Process-pool execution for CPU-bound tool handlers (plugin.yaml: executor: process).
+Thread mode (default) cannot stop a runaway handler and a handler holding the GIL stalls the event loop;
+process-mode handlers run in a warm pool of spawned workers that preload the plugin modules.
+Each worker runs one call at a time over its own pipe; on timeout only the worker running that call is
+killed (calls of other chats on other workers are not affected) and a replacement is spawned on demand.
+Arguments, ToolContext and results cross the process boundary, so they must be picklable;
+results other than str/dict/list/numbers are converted to str in the worker.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from tools.base import ToolContext, reset_current_context, set_current_context
+
+logger = logging.getLogger(__name__)
+
+TOOL_PROCESS_WORKERS = int(os.getenv("TOOL_PROCESS_WORKERS", "2"))
+
+_PICKLABLE_RESULTS = (str, dict, list, int, float, bool)
+
+# Worker side: handlers modules loaded in this process, keyed by (plugin_id, handlers.py mtime)
+_worker_modules: Dict[Tuple[str, int], Any] = {}
+
+
+def _handlers_stamp(plugin_dir: str) -> int:
+    try:
+        return os.stat(Path(plugin_dir) / "handlers.py").st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _worker_module(plugin_id: str, plugin_dir: str, stamp: int) -> Any:
+    key = (plugin_id, stamp)
+    module = _worker_modules.get(key)
+    if module is None:
+        from tools.loader import _load_handlers_module
+        module = _load_handlers_module(Path(plugin_dir), plugin_id)
+        if module is None:
+            raise RuntimeError(f"Cannot load handlers of plugin {plugin_id}")
+        _worker_modules[key] = module
+    return module
+
+
+def _init_worker(plugins: Tuple[Tuple[str, str, int], ...]) -> None:
+    """Worker start: Ctrl+C is handled by the parent; preload plugin modules (warm workers)."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for plugin_id, plugin_dir, stamp in plugins:
+        try:
+            _worker_module(plugin_id, plugin_dir, stamp)
+        except Exception as e:
+            logger.warning("Tool worker: preload of %s failed: %s", plugin_id, e)
+
+
+def _run_handler(
+    plugin_id: str,
+    plugin_dir: str,
+    stamp: int,
+    handler_name: str,
+    arguments: Dict[str, Any],
+    ctx: Optional[ToolContext],
+) -> Any:
+    """Worker entry point: call handler(**arguments) with ctx as current ToolContext."""
+    handler = getattr(_worker_module(plugin_id, plugin_dir, stamp), handler_name)
+    token = set_current_context(ctx)
+    try:
+        result = handler(**arguments)
+        if asyncio.iscoroutine(result):
+            result = asyncio.run(result)
+    finally:
+        reset_current_context(token)
+    if result is None or isinstance(result, _PICKLABLE_RESULTS):
+        return result
+    return str(result)
+
+
+def _worker_main(conn, plugins: Tuple[Tuple[str, str, int], ...]) -> None:
+    """Worker process: preload plugins, then run (plugin_id, dir, stamp, handler, arguments, ctx) tasks one by one."""
+    _init_worker(plugins)
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        try:
+            reply = (True, _run_handler(*task))
+        except BaseException as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception:
+            # Unpicklable exception: send its text
+            conn.send((False, RuntimeError(f"{type(reply[1]).__name__}: {reply[1]!s}")))
+
+
+class ProcessHandler:
+    """Picklable reference to a plugin handler; the executor runs it in the tool process pool."""
+
+    def __init__(self, plugin_id: str, plugin_dir: str, handler_name: str) -> None:
+        self.plugin_id = plugin_id
+        self.plugin_dir = str(plugin_dir)
+        self.handler_name = handler_name
+        self.stamp = _handlers_stamp(self.plugin_dir)
+
+    def __call__(self, **arguments: Any) -> Any:
+        """In-process call (same code path as the worker); the executor uses ToolProcessPool.run instead."""
+        return _run_handler(self.plugin_id, self.plugin_dir, self.stamp, self.handler_name, arguments, None)
+
+    def __repr__(self) -> str:
+        return f"ProcessHandler({self.plugin_id}.{self.handler_name})"
+
+
+class _Worker:
+    """One spawned worker process and its end of the task pipe."""
+
+    def __init__(self, plugins: Tuple[Tuple[str, str, int], ...]) -> None:
+        mp = multiprocessing.get_context("spawn")
+        self.conn, child_conn = mp.Pipe()
+        self.process = mp.Process(target=_worker_main, args=(child_conn, plugins), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def call(self, task: tuple) -> Tuple[bool, Any]:
+        """Blocking: send task, wait for (ok, value). EOFError if the worker died or was killed."""
+        self.conn.send(task)
+        return self.conn.recv()
+
+    def kill(self) -> None:
+        try:
+            self.process.kill()
+            self.process.join(timeout=1)
+        except Exception:
+            pass
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=1)
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class ToolProcessPool:
+    """
+    Up to max_workers warm worker processes (spawn), one call per worker at a time.
+    A timed-out call kills only its own worker; a replacement is spawned on demand.
+    """
+
+    def __init__(self, max_workers: int = TOOL_PROCESS_WORKERS) -> None:
+        self._max_workers = max(1, max_workers)
+        self._plugins: Dict[str, Tuple[str, int]] = {}
+        self._idle: List[_Worker] = []
+        self._busy: Set[_Worker] = set()
+        self._spawning = 0
+        # Calls waiting for a worker: resolved with an idle worker, or None = a slot is free, spawn one
+        self._waiters: Deque[Future] = deque()
+        self._lock = threading.Lock()
+
+    def register_plugin(self, plugin_id: str, plugin_dir: str) -> None:
+        """Plugin whose handlers new workers preload (loader, for plugins with process-mode tools)."""
+        self._plugins[plugin_id] = (str(plugin_dir), _handlers_stamp(str(plugin_dir)))
+
+    def _size(self) -> int:
+        return len(self._idle) + len(self._busy) + self._spawning
+
+    def _spawn(self) -> _Worker:
+        """Start a worker for a reserved slot (self._spawning was incremented by the caller)."""
+        try:
+            preload = tuple((pid, d, stamp) for pid, (d, stamp) in self._plugins.items())
+            worker = _Worker(preload)
+        except BaseException:
+            with self._lock:
+                self._spawning -= 1
+            self._hand_over(None)
+            raise
+        with self._lock:
+            self._spawning -= 1
+            self._busy.add(worker)
+        logger.info("Tool worker started pid=%s plugins=%s", worker.process.pid, list(self._plugins))
+        return worker
+
+    def warm_up(self) -> None:
+        """Start all workers now (spawn + module preload) instead of on the first call."""
+        with self._lock:
+            missing = self._max_workers - self._size()
+            self._spawning += max(0, missing)
+        for _ in range(missing):
+            self._release(self._spawn())
+
+    async def _acquire(self) -> _Worker:
+        with self._lock:
+            if self._idle:
+                worker = self._idle.pop()
+                self._busy.add(worker)
+                return worker
+            waiter: Optional[Future] = None
+            if self._size() < self._max_workers:
+                self._spawning += 1
+            else:
+                waiter = Future()
+                self._waiters.append(waiter)
+        if waiter is not None:
+            try:
+                worker = await asyncio.wrap_future(waiter)
+            except asyncio.CancelledError:
+                if not waiter.cancel():
+                    # Handed over right before the cancellation: pass it on
+                    self._give_back(waiter.result())
+                raise
+            if worker is not None:
+                return worker
+        return self._spawn()
+
+    def _hand_over(self, worker: Optional[_Worker]) -> bool:
+        """Give an idle worker (or a free slot: None) to the first waiting call. False if nobody waits."""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    if worker is None:
+                        self._spawning += 1
+                    waiter.set_result(worker)
+                    return True
+        return False
+
+    def _give_back(self, worker: Optional[_Worker]) -> None:
+        """Return a worker (or a reserved slot) obtained from a waiter that was cancelled meanwhile."""
+        if worker is None:
+            with self._lock:
+                self._spawning -= 1
+            self._hand_over(None)
+        else:
+            self._release(worker)
+
+    def _release(self, worker: _Worker) -> None:
+        """Worker is idle again: first waiting call gets it, else it goes back to the idle list."""
+        if self._hand_over(worker):
+            return
+        with self._lock:
+            self._busy.discard(worker)
+            self._idle.append(worker)
+
+    def _drop(self, worker: _Worker) -> None:
+        """Kill worker and free its slot for a waiting call (which spawns a replacement)."""
+        worker.kill()
+        with self._lock:
+            self._busy.discard(worker)
+        self._hand_over(None)
+
+    async def run(
+        self,
+        handler: ProcessHandler,
+        arguments: Dict[str, Any],
+        timeout: float,
+        ctx: Optional[ToolContext] = None,
+    ) -> Any:
+        """Run handler in a worker; on timeout kill that worker and raise asyncio.TimeoutError."""
+        worker = await self._acquire()
+        task = (handler.plugin_id, handler.plugin_dir, handler.stamp, handler.handler_name, dict(arguments), ctx)
+        try:
+            ok, value = await asyncio.wait_for(asyncio.to_thread(worker.call, task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Tool process pool: %r timed out after %ss, killing worker pid=%s",
+                           handler, timeout, worker.process.pid)
+            # Killing the process also ends the thread blocked in recv (EOFError)
+            self._drop(worker)
+            raise
+        except (EOFError, OSError) as e:
+            self._drop(worker)
+            raise RuntimeError(f"Tool worker for {handler!r} died: {e!s}") from e
+        except BaseException:
+            self._drop(worker)
+            raise
+        self._release(worker)
+        if ok:
+            return value
+        raise value
+
+    def shutdown(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            busy, self._busy = list(self._busy), set()
+            waiters, self._waiters = list(self._waiters), deque()
+        for waiter in waiters:
+            if waiter.set_running_or_notify_cancel():
+                waiter.set_exception(RuntimeError("Tool process pool stopped"))
+        for worker in idle:
+            worker.stop()
+        for worker in busy:
+            worker.kill()
+
+
+_pool: Optional[ToolProcessPool] = None
+
+
+def get_tool_process_pool() -> ToolProcessPool:
+    """Get global tool process pool."""
+    global _pool
+    if _pool is None:
+        _pool = ToolProcessPool()
+    return _pool
+
+
+def shutdown_tool_process_pool() -> None:
+    """Stop pool workers (bot / API shutdown)."""
+    if _pool is not None:
+        _pool.shutdown()
@@ -1,11 +1,14 @@
 """
 Tool registry: centralized store of registered tools and plugins.
 Singleton per application.
+Every change (register/unregister/enable/disable/clear) bumps a version; LLM tool schemas are served
+from a snapshot rebuilt only when the version changes.
 """
 import logging
 from typing import Any, Dict, List, Optional
 
 from tools.models import PluginManifest, ToolDefinition
+from tools.schemas import ToolSchemaSet
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +20,23 @@ class ToolRegistry:
     def __init__(self) -> None:
         self._tools: Dict[str, ToolDefinition] = {}
         self._plugins: Dict[str, PluginManifest] = {}
+        self._version = 0
+        self._schemas: Optional[ToolSchemaSet] = None
+
+    @property
+    def version(self) -> int:
+        """Incremented on every change of tools or their enabled state."""
+        return self._version
+
+    def _bump(self) -> None:
+        self._version += 1
 
     def register_tool(self, tool: ToolDefinition) -> None:
         """Register a tool. Raises ValueError if name already exists."""
         if tool.name in self._tools:
             raise ValueError(f"Tool '{tool.name}' already registered")
         self._tools[tool.name] = tool
+        self._bump()
         logger.debug("Registered tool %s (plugin=%s)", tool.name, tool.plugin_id)
 
     def register_plugin(self, manifest: PluginManifest) -> None:
@@ -37,6 +51,7 @@ class ToolRegistry:
             del self._tools[name]
         if plugin_id in self._plugins:
             del self._plugins[plugin_id]
+        self._bump()
         logger.debug("Unregistered plugin %s (removed %d tools)", plugin_id, len(to_remove))
 
     def get_tool(self, name: str) -> Optional[ToolDefinition]:
@@ -59,36 +74,56 @@ class ToolRegistry:
         """Get tools of a specific plugin."""
         return [t for t in self._tools.values() if t.plugin_id == plugin_id]
 
+    def get_tool_schemas(self) -> ToolSchemaSet:
+        """
+        Snapshot of enabled tools for LLM requests (OpenAI form plus memoized per-provider forms and hash).
+        Rebuilt only after the registry version changed.
+        """
+        snapshot = self._schemas
+        if snapshot is not None and snapshot.version == self._version:
+            return snapshot
+        snapshot = ToolSchemaSet(
+            [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": t.name,
+                        "description": t.description,
+                        "parameters": t.parameters,
+                    },
+                }
+                for t in self._tools.values()
+                if t.enabled
+            ],
+            version=self._version,
+        )
+        self._schemas = snapshot
+        logger.debug("Tool schemas rebuilt version=%d tools=%d hash=%s", snapshot.version, len(snapshot), snapshot.hash)
+        return snapshot
+
     def get_tools_for_llm(self) -> List[Dict[str, Any]]:
         """
-        Return list of tools in OpenAI format for LLM. Only enabled tools.
+        Return list of tools in OpenAI format for LLM. Only enabled tools, sorted by name.
+        Dicts come from the cached snapshot (get_tool_schemas) and must not be modified.
         """
-        result = []
-        for t in self._tools.values():
-            if not t.enabled:
-                continue
-            result.append({
-                "type": "function",
-                "function": {
-                    "name": t.name,
-                    "description": t.description,
-                    "parameters": t.parameters,
-                },
-            })
-        return result
+        return list(self.get_tool_schemas().openai)
 
     def enable_tool(self, name: str) -> bool:
         """Enable tool. Returns success."""
         if name not in self._tools:
             return False
-        self._tools[name].enabled = True
+        if not self._tools[name].enabled:
+            self._tools[name].enabled = True
+            self._bump()
         return True
 
     def disable_tool(self, name: str) -> bool:
         """Disable tool. Returns success."""
         if name not in self._tools:
             return False
-        self._tools[name].enabled = False
+        if self._tools[name].enabled:
+            self._tools[name].enabled = False
+            self._bump()
         return True
 
     def is_tool_enabled(self, name: str) -> bool:
@@ -100,6 +135,7 @@ class ToolRegistry:
         """Clear registry (for tests and reload)."""
         self._tools.clear()
         self._plugins.clear()
+        self._bump()
         logger.debug("Registry cleared")
 
     def get_stats(self) -> Dict[str, Any]:
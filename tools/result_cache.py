@@ -0,0 +1,241 @@
+"""
+Opt-in cache of tool results for deterministic, read-only calls.
+Declared per tool in plugin.yaml:
+    cache_ttl: 300                 # seconds, 0 = not cached (default)
+    cache_scope: global | user     # user: key includes the caller (telegram_id / chat_id)
+    cache_actions: [get_employee]  # optional: only calls with arguments.action in the list
+    cache_invalidate_on: [update_employee]  # actions that drop cached results of the whole plugin
+Keys are canonical JSON of the arguments. LRU + TTL eviction; hit/miss counters per tool.
+The cache is per process (bot / API). invalidate_tool_cache also bumps a generation row
+(api.tool_cache_repository); every process polls the rows at most every TOOL_CACHE_POLL_SECONDS, drops the
+matching entries and reports its counters there for the admin API.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from tools.base import ToolContext
+from tools.models import ToolDefinition
+
+logger = logging.getLogger(__name__)
+
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1000"))
+# How often a process re-reads invalidations published by other processes and reports its counters, sec
+TOOL_CACHE_POLL_SECONDS = float(os.getenv("TOOL_CACHE_POLL_SECONDS", "2"))
+
+CACHE_SCOPE_GLOBAL = "global"
+CACHE_SCOPE_USER = "user"
+
+
+@dataclass
+class _Entry:
+    content: str
+    expires_at: float
+    tool_name: str
+    plugin_id: str
+
+
+def canonical_arguments(arguments: Optional[Dict[str, Any]]) -> str:
+    """Canonical JSON of tool arguments: sorted keys, no whitespace, None values dropped."""
+    args = {k: v for k, v in (arguments or {}).items() if v is not None}
+    return json.dumps(args, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _action(arguments: Optional[Dict[str, Any]]) -> str:
+    return str((arguments or {}).get("action") or "").strip().lower()
+
+
+def is_cacheable(tool: ToolDefinition, arguments: Optional[Dict[str, Any]]) -> bool:
+    """True if this call of tool may be served from / stored in the cache."""
+    if tool.cache_ttl <= 0:
+        return False
+    if tool.cache_actions:
+        return _action(arguments) in tool.cache_actions
+    return True
+
+
+def invalidates_cache(tool: ToolDefinition, arguments: Optional[Dict[str, Any]]) -> bool:
+    """True if this call changes data behind cached results of the tool's plugin."""
+    return bool(tool.cache_invalidate_on) and _action(arguments) in tool.cache_invalidate_on
+
+
+def make_key(tool: ToolDefinition, arguments: Optional[Dict[str, Any]], ctx: Optional[ToolContext]) -> str:
+    owner = ""
+    if tool.cache_scope == CACHE_SCOPE_USER:
+        if ctx is not None:
+            owner = str(ctx.telegram_id if ctx.telegram_id is not None else ctx.chat_id)
+        owner = owner or "-"
+    return f"{tool.name}\x1f{owner}\x1f{canonical_arguments(arguments)}"
+
+
+class ToolResultCache:
+    """Thread-safe LRU + TTL cache of tool result strings."""
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES) -> None:
+        self._max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._generations: Optional[Dict[str, int]] = None
+        self._polled_at = 0.0
+        self._reported: Optional[Dict[str, Any]] = None
+
+    def _count(self, tool_name: str, counter: str) -> None:
+        per_tool = self._counters.setdefault(tool_name, {"hits": 0, "misses": 0})
+        per_tool[counter] = per_tool.get(counter, 0) + 1
+
+    def get(self, key: str, tool_name: str) -> Optional[str]:
+        """Cached content or None (miss or expired)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._count(tool_name, "hits")
+                return entry.content
+            if entry is not None:
+                del self._entries[key]
+            self._count(tool_name, "misses")
+            return None
+
+    def put(self, key: str, content: str, tool: ToolDefinition) -> None:
+        with self._lock:
+            self._entries[key] = _Entry(
+                content=content,
+                expires_at=time.monotonic() + tool.cache_ttl,
+                tool_name=tool.name,
+                plugin_id=tool.plugin_id,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tool_name: Optional[str] = None, plugin_id: Optional[str] = None) -> int:
+        """Drop entries of a tool, of a plugin, or everything (no filter). Returns number dropped."""
+        with self._lock:
+            if tool_name is None and plugin_id is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [
+                    k for k, e in self._entries.items()
+                    if (tool_name is None or e.tool_name == tool_name)
+                    and (plugin_id is None or e.plugin_id == plugin_id)
+                ]
+                for k in keys:
+                    del self._entries[k]
+                dropped = len(keys)
+        if dropped:
+            logger.info("Tool cache invalidated tool=%s plugin=%s entries=%d", tool_name, plugin_id, dropped)
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters (total and per tool) and current size."""
+        with self._lock:
+            per_tool = {name: dict(c) for name, c in self._counters.items()}
+            size = len(self._entries)
+        hits = sum(c.get("hits", 0) for c in per_tool.values())
+        misses = sum(c.get("misses", 0) for c in per_tool.values())
+        return {
+            "size": size,
+            "max_entries": self._max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "tools": per_tool,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def poll_due(self) -> bool:
+        return time.monotonic() - self._polled_at >= TOOL_CACHE_POLL_SECONDS
+
+    def sync_control(self) -> None:
+        """Apply invalidations published by other processes and report counters (blocking DB I/O)."""
+        from api.tool_cache_repository import SCOPE_ALL, get_tool_cache_generations, save_tool_cache_stats
+
+        self._polled_at = time.monotonic()
+        generations = get_tool_cache_generations()
+        known = self._generations
+        self._generations = generations
+        if known is not None:
+            for scope, generation in generations.items():
+                if known.get(scope, 0) == generation:
+                    continue
+                kind, _, name = scope.partition(":")
+                if scope == SCOPE_ALL:
+                    self.invalidate()
+                elif kind == "tool":
+                    self.invalidate(tool_name=name)
+                elif kind == "plugin":
+                    self.invalidate(plugin_id=name)
+        stats = self.stats()
+        if stats != self._reported:
+            save_tool_cache_stats(_PROCESS_KEY, _PROCESS_LABEL, stats)
+            self._reported = stats
+
+    def note_published(self, scope: str, generation: int) -> None:
+        """This process already applied its own invalidation: do not drop entries again on the next poll."""
+        if self._generations is not None:
+            self._generations[scope] = generation
+
+
+_PROCESS_KEY = f"{socket.gethostname()}:{os.getpid()}"
+_PROCESS_LABEL = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+
+_cache: Optional[ToolResultCache] = None
+
+
+def get_tool_cache() -> ToolResultCache:
+    """Get global tool result cache."""
+    global _cache
+    if _cache is None:
+        _cache = ToolResultCache()
+    return _cache
+
+
+def invalidate_tool_cache(tool_name: Optional[str] = None, plugin_id: Optional[str] = None) -> int:
+    """
+    Invalidation hook for code that changes data behind cached tools (e.g. HR import via API).
+    Drops entries here and publishes the invalidation to other processes (blocking DB write).
+    Returns number of entries dropped in this process.
+    """
+    dropped = _cache.invalidate(tool_name=tool_name, plugin_id=plugin_id) if _cache is not None else 0
+    try:
+        from api.tool_cache_repository import bump_tool_cache_generation, cache_scope_key
+        scope = cache_scope_key(tool_name, plugin_id)
+        generation = bump_tool_cache_generation(scope)
+    except Exception as e:
+        logger.warning("Tool cache invalidation not published to other processes: %s", e)
+        return dropped
+    if _cache is not None:
+        _cache.note_published(scope, generation)
+    return dropped
+
+
+async def sync_tool_cache_control() -> None:
+    """Apply other processes' invalidations and report counters, at most every TOOL_CACHE_POLL_SECONDS."""
+    cache = get_tool_cache()
+    if not cache.poll_due():
+        return
+    try:
+        await asyncio.to_thread(cache.sync_control)
+    except Exception as e:
+        logger.debug("Tool cache control not available: %s", e)
+
+
+def lookup(tool: ToolDefinition, arguments: Optional[Dict[str, Any]], ctx: Optional[ToolContext]) -> Tuple[Optional[str], Optional[str]]:
+    """(key, cached content) for a cacheable call; (None, None) when the call is not cacheable."""
+    if not is_cacheable(tool, arguments):
+        return None, None
+    key = make_key(tool, arguments, ctx)
+    return key, get_tool_cache().get(key, tool.name)
@@ -0,0 +1,167 @@
+"""
+Shaping of tool results before they go back to the LLM (every result stays in the prompt for the rest
+of the tool-calling loop, so its size is paid on each later iteration).
+- JSON results are re-serialized compactly (no indentation, no spaces, null fields dropped).
+- Field projection, declared per tool in plugin.yaml:
+    result_fields:                 # arguments.action -> fields kept in result records; "*" = any action
+      list_employees: [personal_number, full_name, position, team]
+  A record is a JSON object with at least one of the listed fields; other objects (wrappers like
+  {"candidates": [...]}) are kept and their values projected.
+- Token cap: result_max_tokens (plugin.yaml; 0 = no cap) or TOOL_RESULT_MAX_TOKENS. A JSON list (top-level
+  or the largest list of a top-level object) keeps as many items as fit; the full list goes to the result
+  store (tools/result_store.py) and the LLM gets total/pages, the first page and a handle for
+  fetch_result_page. Other text is split into pages the same way. With the store disabled the rest is
+  dropped with an explicit marker ("N more omitted, refine your query").
+"""
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from bot.context_window import estimate_text_tokens
+from tools.base import get_current_context
+from tools.models import ToolDefinition
+from tools.result_store import FETCH_RESULT_PAGE_TOOL, get_result_store, paging_summary, result_owner, split_text
+
+logger = logging.getLogger(__name__)
+
+# Default cap per tool result (tokens); 0 = no cap
+TOOL_RESULT_MAX_TOKENS = int(os.getenv("TOOL_RESULT_MAX_TOKENS", "2000"))
+
+ALL_ACTIONS = "*"
+OMITTED_NOTE = "{omitted} more omitted, refine your query"
+_TRUNCATED_NOTE = "\n[truncated: about {omitted} more tokens omitted, refine your query]"
+_PAGED_NOTE = (
+    "\n[part 1 of {pages}; call " + FETCH_RESULT_PAGE_TOOL + " with handle={handle} and page=2..{pages} "
+    "only if needed, or refine your query]"
+)
+
+# store(items, page_size) -> handle
+StoreFn = Callable[[list, int], str]
+
+
+class ShapedResult(NamedTuple):
+    content: str
+    handle: Optional[str] = None  # set when the full result went to the result store
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _fields_for(tool: ToolDefinition, arguments: Optional[Dict[str, Any]]) -> Optional[frozenset]:
+    if not tool.result_fields:
+        return None
+    action = str((arguments or {}).get("action") or "").strip().lower()
+    fields = tool.result_fields.get(action) or tool.result_fields.get(ALL_ACTIONS)
+    return frozenset(fields) if fields else None
+
+
+def project(value: Any, fields: Optional[frozenset]) -> Any:
+    """Drop null fields; in records (objects with any of fields) keep only fields."""
+    if isinstance(value, list):
+        return [project(v, fields) for v in value]
+    if isinstance(value, dict):
+        is_record = fields is not None and not fields.isdisjoint(value)
+        return {
+            k: project(v, fields)
+            for k, v in value.items()
+            if v is not None and (not is_record or k in fields)
+        }
+    return value
+
+
+def _largest_list(value: Any) -> Tuple[Optional[str], Optional[list]]:
+    """(key, list) to trim: the value itself if a list, else the longest list value of an object."""
+    if isinstance(value, list):
+        return None, value
+    if isinstance(value, dict):
+        lists = [(k, v) for k, v in value.items() if isinstance(v, list)]
+        if lists:
+            return max(lists, key=lambda kv: len(kv[1]))
+    return None, None
+
+
+def _fit_items(items: list, budget: int) -> int:
+    """How many leading items fit in budget tokens (compact JSON, one separator per item)."""
+    used = 0
+    for i, item in enumerate(items):
+        used += estimate_text_tokens(compact_json(item)) + 1
+        if used > budget:
+            return i
+    return len(items)
+
+
+def cap_json(value: Any, max_tokens: int, store: Optional[StoreFn] = None) -> Tuple[Any, Optional[str]]:
+    """
+    (value with its largest list trimmed to max_tokens plus the omitted marker, handle); unchanged if it fits.
+    store(items, page_size) -> handle: keep the full list for fetch_result_page instead of dropping the rest.
+    """
+    key, items = _largest_list(value)
+    if not items or estimate_text_tokens(compact_json(value)) <= max_tokens:
+        return value, None
+    rest = dict(value) if key is not None else {}
+    if key is not None:
+        rest[key] = []
+    overhead = estimate_text_tokens(compact_json(rest)) + 64  # marker fields
+    kept = _fit_items(items, max(0, max_tokens - overhead))
+    handle = None
+    if store is not None:
+        kept = max(1, kept)
+        handle = store(items, kept)
+        pages = -(-len(items) // kept)
+        marker = {
+            "total": len(items), "page": 1, "pages": pages, "handle": handle,
+            "note": paging_summary(handle, len(items), kept, pages),
+        }
+    else:
+        omitted = len(items) - kept
+        marker = {"total": len(items), "omitted": omitted, "note": OMITTED_NOTE.format(omitted=omitted)}
+    # Marker first: it survives if cap_text still has to cut the result
+    if key is None:
+        return {**marker, "items": items[:kept]}, handle
+    rest[key] = items[:kept]
+    return {**marker, **rest}, handle
+
+
+def cap_text(content: str, max_tokens: int, store: Optional[StoreFn] = None) -> Tuple[str, Optional[str]]:
+    """(content cut to about max_tokens with the omitted marker, handle); unchanged if it fits."""
+    tokens = estimate_text_tokens(content)
+    if tokens <= max_tokens:
+        return content, None
+    if store is not None:
+        pieces = split_text(content, -(-tokens // max_tokens))
+        handle = store(pieces, 1)
+        return pieces[0] + _PAGED_NOTE.format(pages=len(pieces), handle=handle), handle
+    keep = int(len(content) * max_tokens / tokens)
+    return content[:keep] + _TRUNCATED_NOTE.format(omitted=tokens - max_tokens), None
+
+
+def _store_for(tool: ToolDefinition) -> Optional[StoreFn]:
+    store = get_result_store()
+    if not store.enabled or tool.name == FETCH_RESULT_PAGE_TOOL:
+        return None
+    owner = result_owner(get_current_context())
+    return lambda items, page_size: store.put(owner, tool.name, items, page_size)
+
+
+def shape_result(tool: ToolDefinition, arguments: Optional[Dict[str, Any]], content: str) -> ShapedResult:
+    """Compact, project and cap one tool result string; oversized results are paged into the result store."""
+    max_tokens = TOOL_RESULT_MAX_TOKENS if tool.result_max_tokens is None else tool.result_max_tokens
+    store = _store_for(tool) if max_tokens > 0 else None
+    handle = None
+    stripped = content.lstrip()
+    if stripped[:1] in ("{", "["):
+        try:
+            value = json.loads(stripped)
+        except ValueError:
+            value = None
+        if value is not None:
+            value = project(value, _fields_for(tool, arguments))
+            if max_tokens > 0:
+                value, handle = cap_json(value, max_tokens, store)
+            content = compact_json(value)
+    if max_tokens > 0:
+        content, text_handle = cap_text(content, max_tokens, store if handle is None else None)
+        handle = handle or text_handle
+    return ShapedResult(content, handle)
@@ -0,0 +1,181 @@
+"""
+Short-lived store of oversized tool results, read back page by page with the built-in fetch_result_page tool
+(registered by the loader next to plugin tools). tools/result_shaping puts the full item list here and gives
+the LLM only a summary, the first page and a handle.
+Entries belong to one conversation (chat_id, else telegram_id of the tool context): a handle from another
+chat is not found. In-memory, per process (the tool-calling loop runs in one process); LRU + TTL eviction.
+TOOL_RESULT_STORE_TTL=0 disables paging (oversized results are only cut, with an omitted marker).
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from tools.base import ToolContext, get_current_context
+from tools.models import ToolDefinition
+
+logger = logging.getLogger(__name__)
+
+TOOL_RESULT_STORE_TTL = int(os.getenv("TOOL_RESULT_STORE_TTL", "900"))
+TOOL_RESULT_STORE_MAX_ENTRIES = int(os.getenv("TOOL_RESULT_STORE_MAX_ENTRIES", "200"))
+
+FETCH_RESULT_PAGE_TOOL = "fetch_result_page"
+CORE_PLUGIN_ID = "core"
+
+
+@dataclass
+class StoredResult:
+    owner: str
+    tool_name: str
+    items: list
+    page_size: int
+    expires_at: float
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-len(self.items) // self.page_size))
+
+
+def result_owner(ctx: Optional[ToolContext]) -> str:
+    """Conversation key of the tool context ("-" without context: API calls, tests)."""
+    if ctx is None:
+        return "-"
+    if ctx.chat_id is not None:
+        return f"chat:{ctx.chat_id}"
+    if ctx.telegram_id is not None:
+        return f"user:{ctx.telegram_id}"
+    return "-"
+
+
+class ResultPageStore:
+    """Thread-safe LRU + TTL store of paged results keyed by handle."""
+
+    def __init__(self, ttl_seconds: int = TOOL_RESULT_STORE_TTL, max_entries: int = TOOL_RESULT_STORE_MAX_ENTRIES) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def put(self, owner: str, tool_name: str, items: list, page_size: int) -> str:
+        """Store items split into pages of page_size; returns the handle."""
+        handle = uuid.uuid4().hex[:12]
+        entry = StoredResult(owner, tool_name, list(items), max(1, page_size), time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[handle] = entry
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        logger.info("Tool %s result stored: handle=%s items=%d pages=%d", tool_name, handle, len(items), entry.pages)
+        return handle
+
+    def get(self, owner: str, handle: str) -> Optional[StoredResult]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            if entry.expires_at <= now:
+                del self._entries[handle]
+                return None
+            if entry.owner != owner:
+                return None
+            self._entries.move_to_end(handle)
+            return entry
+
+    def page(self, owner: str, handle: str, page: int) -> Optional[dict]:
+        """Page (1-based) of a stored result as {handle, page, pages, total, items}; None if unknown/expired."""
+        entry = self.get(owner, handle)
+        if entry is None:
+            return None
+        page = min(max(1, page), entry.pages)
+        start = (page - 1) * entry.page_size
+        out = {
+            "handle": handle,
+            "page": page,
+            "pages": entry.pages,
+            "total": len(entry.items),
+            "items": entry.items[start:start + entry.page_size],
+        }
+        if page < entry.pages:
+            out["next"] = f"{FETCH_RESULT_PAGE_TOOL}(handle={handle}, page={page + 1})"
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_store: Optional[ResultPageStore] = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultPageStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResultPageStore()
+    return _store
+
+
+def paging_summary(handle: str, total: int, page_size: int, pages: int) -> str:
+    """Note for the LLM next to the first page."""
+    shown = min(total, page_size)
+    return (
+        f"Showing {shown} of {total}. The rest is stored: call {FETCH_RESULT_PAGE_TOOL} with handle={handle} "
+        f"and page=2..{pages} only if needed, or refine your query."
+    )
+
+
+def split_text(content: str, pieces: int) -> List[str]:
+    """content in pieces of about equal length."""
+    size = max(1, -(-len(content) // max(1, pieces)))
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+async def fetch_result_page(handle: str, page: int = 2) -> str:
+    """Handler of fetch_result_page: one page of a stored result of this conversation."""
+    try:
+        page_no = int(page)
+    except (TypeError, ValueError):
+        return "Error: page must be a number."
+    out = get_result_store().page(result_owner(get_current_context()), str(handle or "").strip(), page_no)
+    if out is None:
+        return "Error: result handle not found or expired; call the original tool again."
+    return json.dumps(out, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def fetch_result_page_tool() -> ToolDefinition:
+    """Definition of the built-in fetch_result_page tool."""
+    return ToolDefinition(
+        name=FETCH_RESULT_PAGE_TOOL,
+        description=(
+            "Returns another page of a large tool result that was cut to its first page. "
+            "Pass the handle from that result and the page number (2, 3, ...). Use only when the shown page is not enough."
+        ),
+        plugin_id=CORE_PLUGIN_ID,
+        handler=fetch_result_page,
+        parameters={
+            "type": "object",
+            "properties": {
+                "handle": {"type": "string", "description": "Handle from the truncated tool result"},
+                "page": {"type": "integer", "description": "Page number, starting from 2"},
+            },
+            "required": ["handle", "page"],
+        },
+        timeout=5,
+        keywords=["страница", "ещё", "дальше", "следующие"],
+        result_max_tokens=0,
+    )
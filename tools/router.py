@@ -0,0 +1,184 @@
+"""
+Tool router: pre-selects the tools relevant to a user message, so large plugin catalogs do not
+inflate every LLM request. Local BM25 index over tool name, description, keywords and parameter docs
+(no network, no model). Built in load_all_plugins, updated per plugin on load_plugin/reload_plugin.
+"""
+import logging
+import math
+import os
+import re
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tools.models import ToolDefinition
+from tools.registry import ToolRegistry, get_registry
+from tools.schemas import ToolSchemaSet
+
+logger = logging.getLogger(__name__)
+
+# Routing is applied only when more tools than this are enabled; top-k scored tools are sent
+TOOL_ROUTER_TOP_K = int(os.getenv("TOOL_ROUTER_TOP_K", "8"))
+# Tools always sent (comma-separated names), in addition to tools with `pinned: true` in plugin.yaml
+TOOL_ROUTER_PINNED = frozenset(
+    n.strip() for n in os.getenv("TOOL_ROUTER_PINNED", "").split(",") if n.strip()
+)
+
+# BM25 parameters
+_K1 = 1.5
+_B = 0.75
+# Name and keywords count more than prose description
+_STRONG_FIELD_WEIGHT = 3
+# Crude stemming: shared prefix of inflected forms (сотрудник/сотрудника, employee/employees)
+_STEM_LEN = 6
+_SUBSETS_CACHE_SIZE = 64
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens (snake_case split), ё→е, truncated to a common stem prefix."""
+    tokens = []
+    for word in _WORD_RE.findall((text or "").lower().replace("ё", "е")):
+        if len(word) < 2 and not word.isdigit():
+            continue
+        tokens.append(word[:_STEM_LEN])
+    return tokens
+
+
+def _param_docs(schema: dict) -> Iterable[str]:
+    """Parameter names, descriptions and enum values from a JSON schema (nested properties too)."""
+    for name, prop in ((schema or {}).get("properties") or {}).items():
+        yield name
+        if isinstance(prop, dict):
+            yield prop.get("description") or ""
+            for value in prop.get("enum") or []:
+                yield str(value)
+            if prop.get("properties"):
+                yield from _param_docs(prop)
+
+
+@dataclass
+class _Doc:
+    name: str
+    tf: Counter
+    length: int
+    pinned: bool
+
+
+def _build_doc(tool: ToolDefinition) -> _Doc:
+    strong = tokenize(tool.name) + tokenize(" ".join(tool.keywords))
+    weak = tokenize(tool.description) + tokenize(" ".join(_param_docs(tool.parameters)))
+    tf = Counter(weak)
+    for token in strong:
+        tf[token] += _STRONG_FIELD_WEIGHT
+    return _Doc(name=tool.name, tf=tf, length=sum(tf.values()), pinned=tool.pinned)
+
+
+class ToolRouter:
+    """BM25 index of registry tools; select() returns a schema snapshot with the relevant subset."""
+
+    def __init__(self, top_k: int = TOOL_ROUTER_TOP_K, pinned: Iterable[str] = TOOL_ROUTER_PINNED) -> None:
+        self._top_k = top_k
+        self._pinned_names = frozenset(pinned)
+        self._docs: Dict[str, _Doc] = {}
+        self._plugin_of: Dict[str, str] = {}
+        self._idf: Dict[str, float] = {}
+        self._avg_len = 0.0
+        self._lock = threading.Lock()
+        self._subsets: "OrderedDict[Tuple[int, str, Tuple[str, ...]], ToolSchemaSet]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def rebuild(self, registry: ToolRegistry) -> None:
+        """Index all registry tools (load_all_plugins)."""
+        with self._lock:
+            self._docs = {t.name: _build_doc(t) for t in registry.get_all_tools()}
+            self._plugin_of = {t.name: t.plugin_id for t in registry.get_all_tools()}
+            self._recompute()
+        logger.debug("Tool router index built: %d tools", len(self._docs))
+
+    def update_plugin(self, plugin_id: str, registry: ToolRegistry) -> None:
+        """Re-index the tools of one plugin (load/reload); tools removed from the plugin are dropped."""
+        with self._lock:
+            for name in [n for n, p in self._plugin_of.items() if p == plugin_id]:
+                self._docs.pop(name, None)
+                self._plugin_of.pop(name, None)
+            for tool in registry.get_tools_by_plugin(plugin_id):
+                self._docs[tool.name] = _build_doc(tool)
+                self._plugin_of[tool.name] = plugin_id
+            self._recompute()
+
+    def _recompute(self) -> None:
+        n = len(self._docs)
+        df: Counter = Counter()
+        for doc in self._docs.values():
+            df.update(doc.tf.keys())
+        self._idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+        self._avg_len = (sum(d.length for d in self._docs.values()) / n) if n else 0.0
+        self._subsets.clear()
+
+    def score(self, query: str) -> List[Tuple[str, float]]:
+        """(tool name, BM25 score) for tools matching query, best first."""
+        terms = set(tokenize(query))
+        docs, idf, avg_len = self._docs, self._idf, self._avg_len or 1.0
+        scored = []
+        for doc in docs.values():
+            s = 0.0
+            for term in terms:
+                f = doc.tf.get(term)
+                if not f:
+                    continue
+                s += idf.get(term, 0.0) * f * (_K1 + 1) / (f + _K1 * (1 - _B + _B * doc.length / avg_len))
+            if s > 0:
+                scored.append((doc.name, s))
+        scored.sort(key=lambda x: (-x[1], x[0]))
+        return scored
+
+    def select(self, schemas: ToolSchemaSet, query: str, extra: Iterable[str] = ()) -> ToolSchemaSet:
+        """
+        Subset of schemas for query: pinned tools + extra (e.g. tools already called in this turn) + top-k.
+        Small catalogs (<= top_k tools) and queries matching nothing get the full set.
+        """
+        if self._top_k <= 0 or len(schemas) <= self._top_k:
+            return schemas
+        available = set(schemas.names)
+        ranked = [name for name, _ in self.score(query) if name in available]
+        if not ranked:
+            return schemas
+        keep = {n for n in available if n in self._pinned_names or (n in self._docs and self._docs[n].pinned)}
+        keep.update(n for n in extra if n in available)
+        keep.update(ranked[: self._top_k])
+        if len(keep) >= len(available):
+            return schemas
+        key = (schemas.version, schemas.hash, tuple(sorted(keep)))
+        with self._lock:
+            subset = self._subsets.get(key)
+            if subset is None:
+                subset = ToolSchemaSet(
+                    [t for t in schemas.openai if (t.get("function") or {}).get("name") in keep],
+                    version=schemas.version,
+                )
+                self._subsets[key] = subset
+                while len(self._subsets) > _SUBSETS_CACHE_SIZE:
+                    self._subsets.popitem(last=False)
+            else:
+                self._subsets.move_to_end(key)
+        logger.debug("Tool router: %d/%d tools %s", len(subset), len(schemas), subset.names)
+        return subset
+
+
+_routers: "weakref.WeakKeyDictionary[ToolRegistry, ToolRouter]" = weakref.WeakKeyDictionary()
+
+
+def get_tool_router(registry: Optional[ToolRegistry] = None) -> ToolRouter:
+    """Router bound to registry (default: global registry)."""
+    reg = registry or get_registry()
+    router = _routers.get(reg)
+    if router is None:
+        router = ToolRouter()
+        _routers[reg] = router
+    return router
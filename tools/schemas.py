@@ -0,0 +1,109 @@
+"""
+Immutable tool-schema snapshots for LLM requests.
+ToolRegistry builds one snapshot per registry version; provider-specific forms (Anthropic input_schema,
+Gemini FunctionDeclaration) are converted once per snapshot instead of on every request.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Iterator, Optional, Sequence, Tuple
+
+
+def _tool_name(tool: dict) -> str:
+    return (tool.get("function") or {}).get("name") or ""
+
+
+class ToolSchemaSet:
+    """
+    Enabled tools in OpenAI function format, sorted by name (stable request prefix for prompt caching).
+    hash is computed from the canonical JSON, so equal schemas give equal hashes across reloads/processes.
+    Snapshots are shared between requests: treat the contained dicts as read-only.
+    """
+
+    __slots__ = ("_openai", "_version", "_canonical_json", "_hash", "_anthropic", "_google", "_lock")
+
+    def __init__(self, openai_tools: Sequence[dict], version: int = 0) -> None:
+        self._openai: Tuple[dict, ...] = tuple(sorted(openai_tools, key=_tool_name))
+        self._version = version
+        self._canonical_json = json.dumps(
+            list(self._openai), ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+        )
+        self._hash = hashlib.sha256(self._canonical_json.encode("utf-8")).hexdigest()[:16]
+        self._anthropic: Optional[Tuple[dict, ...]] = None
+        self._google: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Registry version the snapshot was built from."""
+        return self._version
+
+    @property
+    def hash(self) -> str:
+        """Stable content hash (prompt-cache keys, answer-cache keys)."""
+        return self._hash
+
+    @property
+    def canonical_json(self) -> str:
+        """Canonical JSON of the OpenAI form (token counting, hashing)."""
+        return self._canonical_json
+
+    @property
+    def openai(self) -> Tuple[dict, ...]:
+        """OpenAI format: {"type": "function", "function": {name, description, parameters}}."""
+        return self._openai
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(_tool_name(t) for t in self._openai)
+
+    def anthropic(self) -> Tuple[dict, ...]:
+        """Anthropic format: {"name", "description", "input_schema"} (built once)."""
+        if self._anthropic is None:
+            with self._lock:
+                if self._anthropic is None:
+                    self._anthropic = tuple(
+                        {
+                            "name": fn.get("name", ""),
+                            "description": fn.get("description") or "",
+                            "input_schema": fn.get("parameters") or {"type": "object", "properties": {}},
+                        }
+                        for fn in ((t.get("function") or {}) for t in self._openai)
+                    )
+        return self._anthropic
+
+    def google(self) -> Any:
+        """Gemini Tool with function declarations (built once; needs google-generativeai)."""
+        if self._google is None:
+            with self._lock:
+                if self._google is None:
+                    from google.generativeai.types import FunctionDeclaration, Tool
+
+                    declarations = []
+                    for t in self._openai:
+                        fn = t.get("function") or {}
+                        declarations.append(FunctionDeclaration(
+                            name=fn.get("name", ""),
+                            description=fn.get("description") or "",
+                            parameters=fn.get("parameters") or {},
+                        ))
+                    self._google = Tool(function_declarations=declarations)
+        return self._google
+
+    def __len__(self) -> int:
+        return len(self._openai)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._openai)
+
+    def __repr__(self) -> str:
+        return f"ToolSchemaSet(version={self._version}, tools={len(self._openai)}, hash={self._hash})"
+
+
+def as_schema_set(tools: Any) -> Optional[ToolSchemaSet]:
+    """Normalize tools argument: snapshot as is, OpenAI-format list wrapped into a snapshot, empty -> None."""
+    if not tools:
+        return None
+    if isinstance(tools, ToolSchemaSet):
+        return tools
+    return ToolSchemaSet(list(tools))